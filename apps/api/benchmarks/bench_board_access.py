@@ -0,0 +1,75 @@
+"""
+Benchmark for the board authorization path.
+
+Compares the old access check (loading the board with every element) with
+BoardAccessService.has_access, uncached and cached, for growing board sizes.
+
+Run from apps/api against a scratch database:
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_board_access
+"""
+import asyncio
+import statistics
+import time
+from typing import Callable, Awaitable, List
+
+from benchmarks.seed import ensure_user, seed_board
+from db.client import prisma, init_db
+from schemas.models import ElementType
+from services.access_service import BoardAccessService
+from services.board_service import BoardService
+
+BOARD_SIZES = [0, 1_000, 5_000, 20_000]
+ITERATIONS = 20
+USER_ID = "bench-user"
+
+
+async def seed_sticky_board(element_count: int) -> str:
+    """Create a board with element_count sticky notes and return its ID"""
+    return await seed_board(
+        element_count, mix={ElementType.STICKY_NOTE.value: 1}, user_id=USER_ID, title=f"bench-{element_count}"
+    )
+
+
+async def time_ms(fn: Callable[[], Awaitable[object]], iterations: int = ITERATIONS) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def main() -> None:
+    await init_db()
+    await ensure_user(USER_ID)
+
+    print(f"{'elements':>10} {'full load (ms)':>16} {'access (ms)':>12} {'cached (ms)':>12}")
+    board_ids = []
+    try:
+        for size in BOARD_SIZES:
+            board_id = await seed_sticky_board(size)
+            board_ids.append(board_id)
+
+            before = await time_ms(
+                lambda: BoardService.get_board_by_id(board_id, USER_ID, include_elements=True)
+            )
+
+            async def uncached():
+                BoardAccessService.clear_cache()
+                return await BoardAccessService.has_access(board_id, USER_ID)
+
+            after = await time_ms(uncached)
+            cached = await time_ms(lambda: BoardAccessService.has_access(board_id, USER_ID))
+
+            print(
+                f"{size:>10} {statistics.median(before):>16.2f} "
+                f"{statistics.median(after):>12.2f} {statistics.median(cached):>12.3f}"
+            )
+    finally:
+        for board_id in board_ids:
+            await BoardService.delete_board(board_id, USER_ID)
+        await prisma.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+Cost of re-analysing a board after a single edit.
+
+    full         derive features for every element and cluster from scratch,
+                 as a stateless analyze_board would on each call
+    incremental  BoardAnalysisState.apply with the one changed row, then report()
+    unchanged    report() with nothing changed since the last analysis
+
+No database is needed. Run from apps/api:
+    python -m benchmarks.bench_board_analysis
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from services.analysis_service import BoardAnalysisState
+
+SIZES = [1_000, 10_000, 50_000]
+REPEAT = 5
+
+
+def make_rows(count: int):
+    now = datetime.now(timezone.utc)
+    return [
+        SimpleNamespace(
+            id=f"element-{i}", type="sticky-note" if i % 4 else "shape",
+            content={"text": f"idea number {i}  for   the roadmap"},
+            # Groups of 25 notes laid out close together, groups far apart
+            x=float((i // 25) % 40) * 2_000 + (i % 5) * 220, y=float(i // 1_000) * 2_000 + (i % 25 // 5) * 170,
+            width=200.0, height=150.0, updatedAt=now,
+        )
+        for i in range(count)
+    ]
+
+
+def full(rows) -> float:
+    started = time.perf_counter()
+    state = BoardAnalysisState()
+    state.rebuild(1, rows)
+    state.report()
+    return time.perf_counter() - started
+
+
+def incremental(state, row, step: int) -> float:
+    edited = SimpleNamespace(**{**vars(row), "x": row.x + step, "updatedAt": row.updatedAt + timedelta(seconds=step)})
+    started = time.perf_counter()
+    state.apply(state.revision + 1, [edited])
+    state.report()
+    return time.perf_counter() - started
+
+
+def unchanged(state) -> float:
+    started = time.perf_counter()
+    state.apply(state.revision, [])
+    state.report()
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    print(f"{'elements':>9} {'full ms':>9} {'incremental ms':>15} {'unchanged ms':>13}")
+    for size in SIZES:
+        rows = make_rows(size)
+        state = BoardAnalysisState()
+        state.rebuild(1, rows)
+        state.report()
+        best_full = min(full(rows) for _ in range(REPEAT))
+        best_incremental = min(incremental(state, rows[size // 2], step) for step in range(1, REPEAT + 1))
+        best_unchanged = min(unchanged(state) for _ in range(REPEAT))
+        print(f"{size:>9} {best_full * 1000:>9.1f} {best_incremental * 1000:>15.2f} {best_unchanged * 1000:>13.3f}")
@@ -0,0 +1,66 @@
+"""
+Payload size and compute time of zoom-aware element reads.
+
+For each board size, compares the full element list with the clustered view
+at a range of zooms:
+
+    bytes        JSON body size (elements plus clusters)
+    elements     elements returned in full
+    clusters     grid clusters returned
+    compute ms   building the view after an edit (cached views cost nothing)
+
+No database is needed. Boards come from benchmarks.seed. Run from apps/api:
+    python -m benchmarks.bench_board_lod
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from benchmarks.seed import generate_elements
+from services.lod_service import BoardLodState, snap_zoom
+from utils.serialization import dumps, element_to_dict
+
+SIZES = [10_000, 50_000]
+ZOOMS = [1.0, 0.25, 0.05, 0.01, 0.002]
+
+
+def make_rows(count: int):
+    now = datetime.now(timezone.utc)
+    rows = []
+    for index, element in enumerate(generate_elements(count)):
+        size = element["size"] or {}
+        rows.append(SimpleNamespace(
+            id=f"element-{index}", type=element["type"], content=element["content"], style=element["style"],
+            x=element["position"]["x"], y=element["position"]["y"],
+            width=size.get("width"), height=size.get("height"), zIndex=element["zIndex"],
+            parentId=None, boardId="bench", revision=1, createdAt=now, updatedAt=now,
+        ))
+    return rows
+
+
+def encode(view) -> bytes:
+    return dumps({**view, "elements": [element_to_dict(element) for element in view["elements"]]})
+
+
+if __name__ == "__main__":
+    print(f"{'elements':>9} {'zoom':>7} {'bytes':>11} {'vs full':>8} {'elements':>9} {'clusters':>9} {'compute ms':>11}")
+    for size in SIZES:
+        rows = make_rows(size)
+        full_bytes = len(dumps([element_to_dict(row) for row in rows]))
+        print(f"{size:>9} {'all':>7} {full_bytes:>11,} {'':>8} {size:>9} {0:>9} {'':>11}")
+
+        state = BoardLodState()
+        state.rebuild(1, rows)
+        for step, zoom in enumerate(ZOOMS, start=1):
+            zoom = snap_zoom(zoom)
+            # An edit clears cached views, so this times a real recompute
+            edited = SimpleNamespace(**{**vars(rows[0]), "x": rows[0].x + step, "updatedAt": rows[0].updatedAt + timedelta(seconds=step)})
+            state.apply(state.revision + 1, [edited])
+            started = time.perf_counter()
+            view = state.select(zoom)
+            elapsed = time.perf_counter() - started
+            body = len(encode(view))
+            print(
+                f"{'':>9} {zoom:>7.4f} {body:>11,} {full_bytes / body:>7.0f}x "
+                f"{len(view['elements']):>9} {len(view['clusters']):>9} {elapsed * 1000:>11.1f}"
+            )
@@ -0,0 +1,70 @@
+"""
+Throughput of the element list response paths.
+
+    default    FastAPI's response_model path: validate every row into
+               BoardElementResponse, jsonable_encoder, then stdlib json
+    adapter    One TypeAdapter validate + dump_json (the non-fast cached path)
+    fast       utils.serialization.encode_elements (FAST_JSON_RESPONSES=1)
+
+No database is needed. Run from apps/api:
+    python -m benchmarks.bench_element_serialization
+"""
+import json
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from schemas.models import BoardElementResponse
+from utils.serialization import encode_elements
+
+SIZES = [1_000, 10_000, 50_000]
+
+_element_list = TypeAdapter(List[BoardElementResponse])
+
+
+def make_rows(count: int):
+    now = datetime.now(timezone.utc)
+    return [
+        SimpleNamespace(
+            id=f"element-{i}", boardId="board-1", type="sticky-note",
+            content={"text": f"note {i}"}, style={"fill": "#ffeb3b", "stroke": "#f9a825"},
+            x=float(i % 100) * 220, y=float(i // 100) * 170, width=200.0, height=150.0,
+            zIndex=i, parentId=None, revision=i, createdAt=now, updatedAt=now,
+        )
+        for i in range(count)
+    ]
+
+
+def default_path(rows) -> bytes:
+    models = [BoardElementResponse.model_validate(row) for row in rows]
+    return json.dumps(jsonable_encoder(models)).encode()
+
+
+def adapter_path(rows) -> bytes:
+    return _element_list.dump_json(_element_list.validate_python(rows, from_attributes=True))
+
+
+def fast_path(rows) -> bytes:
+    return encode_elements(rows)
+
+
+def measure(fn, rows, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn(rows)
+        best = min(best, time.perf_counter() - started)
+    return best, len(body)
+
+
+if __name__ == "__main__":
+    print(f"{'elements':>9} {'path':>8} {'ms':>9} {'elements/s':>12} {'MB':>7}")
+    for size in SIZES:
+        rows = make_rows(size)
+        for name, fn in (("default", default_path), ("adapter", adapter_path), ("fast", fast_path)):
+            seconds, body_size = measure(fn, rows)
+            print(f"{size:>9} {name:>8} {seconds * 1000:>9.1f} {size / seconds:>12,.0f} {body_size / 1e6:>7.2f}")
@@ -0,0 +1,65 @@
+"""
+Microbenchmark for the per-update cost of element geometry.
+
+Before: position/size were JSON-encoded on every write and stored as Json,
+then decoded again and validated as nested models on every response.
+After: position/size map onto float columns and are rebuilt from them.
+
+No database is needed. Run from apps/api:
+    python -m benchmarks.bench_geometry_serialization
+"""
+import json
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+
+from schemas.models import BoardElementResponse
+from services.element_service import prepare_element_data
+
+ITERATIONS = 100_000
+
+UPDATE = {"position": {"x": 412.5, "y": -96.25}, "size": {"width": 200.0, "height": 150.0}}
+
+
+def write_before():
+    # The pre-migration update_element encoding of a drag
+    return {key: json.dumps(value) for key, value in UPDATE.items()}
+
+
+def write_after():
+    return prepare_element_data(UPDATE)
+
+
+_now = datetime.now()
+_common = dict(
+    id="element-1", boardId="board-1", type="sticky-note", content={"text": "hi"},
+    style={"fill": "#ffeb3b"}, zIndex=0, revision=1, createdAt=_now, updatedAt=_now,
+)
+_row_before = SimpleNamespace(**_common, position=json.dumps(UPDATE["position"]), size=json.dumps(UPDATE["size"]))
+_row_after = SimpleNamespace(**_common, x=412.5, y=-96.25, width=200.0, height=150.0)
+
+
+def read_before():
+    # Prisma decoded the Json columns before the response model validated them
+    row = SimpleNamespace(**{
+        **vars(_row_before),
+        "position": json.loads(_row_before.position),
+        "size": json.loads(_row_before.size),
+    })
+    return BoardElementResponse.model_validate(row)
+
+
+def read_after():
+    return BoardElementResponse.model_validate(_row_after)
+
+
+def report(name, fn):
+    seconds = min(timeit.repeat(fn, number=ITERATIONS, repeat=3))
+    print(f"{name:<14} {seconds / ITERATIONS * 1e6:8.2f} us/update")
+
+
+if __name__ == "__main__":
+    report("write before", write_before)
+    report("write after", write_after)
+    report("read before", read_before)
+    report("read after", read_after)
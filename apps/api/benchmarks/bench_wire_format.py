@@ -0,0 +1,100 @@
+"""
+Size and encode/decode cost of the element list wire formats.
+
+    json      utils.serialization.encode_elements (the FAST_JSON_RESPONSES body)
+    msgpack   the same document as MessagePack
+    columns   the columnar MessagePack layout: float32 geometry, int32 numbers,
+              dictionary-encoded types and shared styles
+
+Decoding is what a client does before it can draw: parse the body, and for
+columns also view the packed arrays (np.frombuffer, like a Float32Array).
+Sizes are also given gzipped, as most responses travel compressed.
+
+No database is needed. Boards come from benchmarks.seed. Run from apps/api:
+    python -m benchmarks.bench_wire_format
+"""
+import gzip
+import json
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import msgpack
+import numpy as np
+
+from benchmarks.seed import generate_elements
+from utils.serialization import encode_elements
+from utils.wire_format import COLUMNAR_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, encode_elements_as
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson is optional
+    loads = json.loads
+
+SIZES = [1_000, 10_000, 50_000]
+REPEAT = 3
+
+
+def make_rows(count: int):
+    now = datetime.now(timezone.utc)
+    rows = []
+    for index, element in enumerate(generate_elements(count)):
+        size = element["size"] or {}
+        rows.append(SimpleNamespace(
+            id=f"element-{index:08d}-0000-4000-8000-000000000000", type=element["type"],
+            content=element["content"], style=element["style"],
+            x=element["position"]["x"], y=element["position"]["y"],
+            width=size.get("width"), height=size.get("height"), zIndex=element["zIndex"],
+            parentId=None, boardId="board-0000-4000-8000-000000000000", revision=1,
+            createdAt=now, updatedAt=now,
+        ))
+    return rows
+
+
+def decode_json(body: bytes):
+    return loads(body)
+
+
+def decode_msgpack(body: bytes):
+    return msgpack.unpackb(body, timestamp=3)
+
+
+def decode_columns(body: bytes):
+    columns = msgpack.unpackb(body)
+    columns["geometry"] = np.frombuffer(columns["geometry"], dtype="<f4").reshape(-1, 4)
+    for name in ("zIndex", "revision"):
+        columns[name] = np.frombuffer(columns[name], dtype="<i4")
+    for name in ("type", "boardId", "parentId", "style"):
+        columns[name]["codes"] = np.frombuffer(columns[name]["codes"], dtype="<i4")
+    return columns
+
+
+FORMATS = {
+    "json": (encode_elements, decode_json),
+    "msgpack": (lambda rows: encode_elements_as(MSGPACK_MEDIA_TYPE, rows), decode_msgpack),
+    "columns": (lambda rows: encode_elements_as(COLUMNAR_MEDIA_TYPE, rows), decode_columns),
+}
+
+
+def best_of(fn, value) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn(value)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+if __name__ == "__main__":
+    print(f"{'elements':>9} {'format':>8} {'KB':>9} {'gzip KB':>8} {'vs json':>8} {'encode ms':>10} {'decode ms':>10}")
+    for size in SIZES:
+        rows = make_rows(size)
+        json_size = None
+        for name, (encode, decode) in FORMATS.items():
+            body = encode(rows)
+            json_size = json_size or len(body)
+            print(
+                f"{size:>9} {name:>8} {len(body) / 1024:>9.0f} {len(gzip.compress(body)) / 1024:>8.0f} "
+                f"{len(body) / json_size:>8.0%} {best_of(encode, rows) * 1000:>10.1f} {best_of(decode, body) * 1000:>10.1f}"
+            )
@@ -0,0 +1,239 @@
+"""
+In-process load test that drives the real FastAPI app through httpx's ASGI transport.
+
+Seeds boards with benchmarks.seed, then runs each scenario with a fixed number
+of requests at a fixed concurrency and reports p50/p95/p99 latency and
+throughput:
+
+    board_list    GET /api/boards/ (one page)
+    board_open    GET /api/boards/{id} and GET /api/elements/board/{id} together
+    drag_storm    PUT /api/elements/{id} position updates on random elements
+    ai_generate   POST /api/ai/generate with the fake LLM provider
+
+Results are written as JSON (commit, config, per-scenario numbers, /stats) so
+runs on different commits can be compared with --compare.
+
+Needs Postgres: the services use Postgres-only SQL (jsonb, box overlap, GiST),
+so there is no SQLite stand-in. Run from apps/api against a scratch database
+(boards are deleted afterwards unless --keep is given):
+    DATABASE_URL=postgresql://... python -m benchmarks.load_test --elements 5000 --concurrency 16
+    python -m benchmarks.load_test --compare benchmarks/results/<previous>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+# Set before the app is imported: benchmarks never call a paid LLM unless asked to
+os.environ.setdefault("AI_PROVIDER", "fake")
+
+import httpx
+
+from benchmarks.seed import API_USER_ID, ensure_user, parse_mix, seed_board
+
+SCENARIOS = ("board_list", "board_open", "drag_storm", "ai_generate")
+RESULTS_DIR = Path(__file__).parent / "results"
+# p95 slowdowns beyond this fraction are reported as regressions by --compare
+REGRESSION_THRESHOLD = 0.10
+
+RequestFunction = Callable[[int], Awaitable[List[httpx.Response]]]
+
+def _commit() -> str:
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout
+        return sha + ("-dirty" if dirty.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """Latency percentiles in milliseconds and throughput in requests per second"""
+    ordered = sorted(latencies)
+    if len(ordered) > 1:
+        cuts = statistics.quantiles(ordered, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = ordered[0] if ordered else 0.0
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "p50Ms": round(p50, 3),
+        "p95Ms": round(p95, 3),
+        "p99Ms": round(p99, 3),
+        "meanMs": round(statistics.fmean(ordered), 3) if ordered else 0.0,
+        "maxMs": round(ordered[-1], 3) if ordered else 0.0,
+        "throughputRps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+    }
+
+async def run_scenario(send: RequestFunction, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Issue requests calls of send from concurrency workers and summarize their latencies"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for index in counter:
+            started = time.perf_counter()
+            try:
+                responses = await send(index)
+                failed = any(response.status_code >= 400 for response in responses)
+            except httpx.HTTPError:
+                failed = True
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any], threshold: float) -> List[str]:
+    """Print p95 and throughput changes per scenario and return the scenarios that regressed"""
+    print(f"\nvs. {previous.get('commit')} ({previous.get('createdAt')})")
+    print(f"{'scenario':<14} {'p95 before':>11} {'p95 now':>9} {'change':>8} {'rps before':>11} {'rps now':>9}")
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        change = (now["p95Ms"] - before["p95Ms"]) / before["p95Ms"] if before["p95Ms"] else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(
+            f"{name:<14} {before['p95Ms']:>11.2f} {now['p95Ms']:>9.2f} {change:>+8.1%} "
+            f"{before['throughputRps']:>11.1f} {now['throughputRps']:>9.1f}{flag}"
+        )
+    return regressions
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the API in-process")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset to run")
+    parser.add_argument("--boards", type=int, default=3, help="Boards to seed for board_open")
+    parser.add_argument("--elements", type=int, default=2_000, help="Elements per seeded board")
+    parser.add_argument("--mix", help="Element type weights, e.g. sticky-note=60,shape=40")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded boards")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    mix = parse_mix(args.mix)
+    args.boards = max(1, args.boards)
+
+    import main as api
+    from services.board_service import BoardService
+
+    await api.startup()
+    transport = httpx.ASGITransport(app=api.app)
+    board_ids: List[str] = []
+    try:
+        await ensure_user()
+        for index in range(args.boards):
+            board_ids.append(await seed_board(args.elements, mix, args.seed + index))
+        ai_board = await seed_board(0, mix, args.seed, title="bench-ai")
+        board_ids.append(ai_board)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get(f"/api/elements/board/{board_ids[0]}")
+            element_ids = [element["id"] for element in response.json()]
+            rng = random.Random(args.seed)
+
+            async def board_list(index: int) -> List[httpx.Response]:
+                return [await client.get("/api/boards/", params={"limit": 50})]
+
+            async def board_open(index: int) -> List[httpx.Response]:
+                board_id = board_ids[index % args.boards]
+                return list(await asyncio.gather(
+                    client.get(f"/api/boards/{board_id}"),
+                    client.get(f"/api/elements/board/{board_id}")
+                ))
+
+            async def drag_storm(index: int) -> List[httpx.Response]:
+                element_id = rng.choice(element_ids)
+                position = {"x": rng.uniform(0, 10_000), "y": rng.uniform(0, 10_000)}
+                return [await client.put(f"/api/elements/{element_id}", json={"position": position})]
+
+            async def ai_generate(index: int) -> List[httpx.Response]:
+                # A distinct prompt per request, so the LLM client cache does not answer
+                text = f"sticky note and a rectangle for idea {index}"
+                return [await client.post("/api/ai/generate", json={"text": text, "boardId": ai_board})]
+
+            senders = {
+                "board_list": board_list,
+                "board_open": board_open,
+                "drag_storm": drag_storm,
+                "ai_generate": ai_generate,
+            }
+
+            results: Dict[str, Any] = {}
+            print(f"{'scenario':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>9} {'errors':>7}")
+            for name in scenarios:
+                if name == "drag_storm" and not element_ids:
+                    continue
+                summary = await run_scenario(senders[name], args.requests, args.concurrency)
+                results[name] = summary
+                print(
+                    f"{name:<14} {summary['p50Ms']:>8.2f} {summary['p95Ms']:>8.2f} {summary['p99Ms']:>8.2f} "
+                    f"{summary['throughputRps']:>9.1f} {summary['errors']:>7}"
+                )
+
+            stats = (await client.get("/stats")).json()
+            # Land buffered drags before the boards they belong to are deleted
+            await api.element_write_buffer.flush()
+    finally:
+        if not args.keep:
+            for board_id in board_ids:
+                await BoardService.delete_board(board_id, API_USER_ID)
+        await api.shutdown()
+
+    report = {
+        "commit": _commit(),
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": {
+            "boards": args.boards,
+            "elements": args.elements,
+            "mix": mix,
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "scenarios": results,
+        "stats": stats,
+    }
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{report['commit']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, default=str))
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text())
+        if previous.get("config") != report["config"]:
+            print("Note: the compared run used a different configuration")
+        if compare(report, previous, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,164 @@
+"""
+Seeded synthetic board generator for benchmarks and local load tests.
+
+Elements follow the ElementType enum in schemas/models.py. The same seed,
+count and mix always produce the same elements.
+
+Run from apps/api to seed a scratch database:
+    DATABASE_URL=postgresql://... python -m benchmarks.seed --boards 3 --elements 5000 \
+        --mix sticky-note=60,shape=20,text=15,connector=3,image=2
+"""
+import argparse
+import asyncio
+import math
+import random
+from typing import Any, Dict, List, Optional
+
+from schemas.models import ElementType
+
+# Mix used when none is given: mostly sticky notes, like real boards
+DEFAULT_MIX = {
+    ElementType.STICKY_NOTE.value: 60,
+    ElementType.SHAPE.value: 20,
+    ElementType.TEXT.value: 15,
+    ElementType.CONNECTOR.value: 3,
+    ElementType.IMAGE.value: 2,
+}
+
+# Elements are created in batches of this size
+SEED_CHUNK_SIZE = 1_000
+
+# The mock get_current_user_id in routes/ answers with this user
+API_USER_ID = "user-123"
+
+WORDS = (
+    "idea roadmap launch budget review sprint research customer feedback design "
+    "metric growth risk owner deadline retro goal scope draft follow-up question"
+).split()
+STICKY_COLORS = ("#ffeb3b", "#ff9ff3", "#74b9ff", "#55efc4", "#ffeaa7")
+SHAPES = ("rectangle", "circle", "triangle")
+
+def parse_mix(spec: Optional[str]) -> Dict[str, int]:
+    """Parse "sticky-note=60,shape=40" into weights, checking every type against ElementType"""
+    if not spec:
+        return dict(DEFAULT_MIX)
+
+    valid = {element_type.value for element_type in ElementType}
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in valid:
+            raise ValueError(f"Unknown element type {name!r}; expected one of {', '.join(sorted(valid))}")
+        mix[name] = int(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("Element mix needs at least one positive weight")
+    return mix
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def _element(rng: random.Random, element_type: str, index: int, columns: int) -> Dict[str, Any]:
+    # Lay elements out on a loose grid so spatial queries see a realistic spread
+    x = (index % columns) * 240 + rng.uniform(-20, 20)
+    y = (index // columns) * 190 + rng.uniform(-20, 20)
+
+    if element_type == ElementType.STICKY_NOTE.value:
+        content = {"text": _sentence(rng, rng.randint(2, 12))}
+        size = {"width": 200, "height": 150}
+        style = {"fill": rng.choice(STICKY_COLORS), "stroke": "#f9a825", "strokeWidth": 1, "cornerRadius": 5}
+    elif element_type == ElementType.SHAPE.value:
+        content = {"shape": rng.choice(SHAPES)}
+        side = rng.choice((80, 100, 150))
+        size = {"width": side, "height": side}
+        style = {"fill": "#a29bfe", "stroke": "#6c5ce7", "strokeWidth": 1}
+    elif element_type == ElementType.TEXT.value:
+        content = {"text": _sentence(rng, rng.randint(3, 20))}
+        size = {"width": 300, "height": 50}
+        style = {"fontSize": rng.choice((14, 18, 24)), "fill": "#333333"}
+    elif element_type == ElementType.CONNECTOR.value:
+        content = {"points": [0, 0, rng.uniform(50, 400), rng.uniform(-200, 200)]}
+        size = None
+        style = {"stroke": "#636e72", "strokeWidth": 2}
+    elif element_type == ElementType.GROUP.value:
+        content = {}
+        size = {"width": 480, "height": 360}
+        style = {}
+    elif element_type == ElementType.FRAME.value:
+        content = {"title": _sentence(rng, 2)}
+        size = {"width": 800, "height": 600}
+        style = {"fill": "#ffffff", "stroke": "#b2bec3", "strokeWidth": 1}
+    else:
+        content = {"url": f"https://picsum.photos/seed/{index}/320/240", "alt": _sentence(rng, 3)}
+        size = {"width": 320, "height": 240}
+        style = {}
+
+    return {
+        "type": element_type,
+        "content": content,
+        "position": {"x": round(x, 2), "y": round(y, 2)},
+        "size": size,
+        "style": style,
+        "zIndex": index,
+    }
+
+def generate_elements(count: int, mix: Optional[Dict[str, int]] = None, seed: int = 0) -> List[Dict[str, Any]]:
+    """Build count elements in API form (see BoardElementBase), types drawn from mix"""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    types = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in types]
+    columns = max(1, math.isqrt(count))
+    return [
+        _element(rng, element_type, index, columns)
+        for index, element_type in enumerate(rng.choices(types, weights=weights, k=count))
+    ]
+
+async def ensure_user(user_id: str = API_USER_ID) -> None:
+    from db.client import prisma
+
+    await prisma.user.upsert(
+        where={"id": user_id},
+        data={"create": {"id": user_id, "email": f"{user_id}@example.com"}, "update": {}}
+    )
+
+async def seed_board(
+    element_count: int,
+    mix: Optional[Dict[str, int]] = None,
+    seed: int = 0,
+    user_id: str = API_USER_ID,
+    title: Optional[str] = None
+) -> str:
+    """Create a board through the services, filled with generated elements, and return its ID"""
+    from services.board_service import BoardService
+    from services.element_service import BoardElementService
+
+    board = await BoardService.create_board(user_id, title or f"bench-{element_count}-{seed}")
+    elements = generate_elements(element_count, mix, seed)
+    for start in range(0, len(elements), SEED_CHUNK_SIZE):
+        await BoardElementService.create_elements(board.id, elements[start:start + SEED_CHUNK_SIZE])
+    return board.id
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed boards with synthetic elements")
+    parser.add_argument("--boards", type=int, default=1)
+    parser.add_argument("--elements", type=int, default=1_000, help="Elements per board")
+    parser.add_argument("--mix", help="Type weights, e.g. sticky-note=60,shape=40 (default: 60/20/15/3/2 across the enum)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--user", default=API_USER_ID, help="Board owner")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    from db.client import close_db, init_db
+
+    await init_db()
+    try:
+        await ensure_user(args.user)
+        for index in range(args.boards):
+            board_id = await seed_board(args.elements, mix, args.seed + index, args.user)
+            print(f"{board_id}  {args.elements} elements")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
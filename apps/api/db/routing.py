@@ -0,0 +1,110 @@
+# Read routing between the primary and an optional read replica, with read-your-writes
+
+import os
+import time
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from typing import Any, Dict, Optional
+
+from prisma import Prisma
+
+from db.client import prisma, replica
+from utils.cache import TTLCache
+
+# After a successful write, the writer's reads stay on the primary this long
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("DB_READ_YOUR_WRITES_SECONDS", "5"))
+# Carries the primary pin across API processes that do not share _recent_writers
+PRIMARY_COOKIE = "db_primary_until"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Users who wrote within the window, in this process
+_recent_writers = TTLCache(max_size=100_000, ttl=READ_YOUR_WRITES_SECONDS)
+# Per-request {"user": ..., "primary": ...}; a dict so dependencies can fill it in for the middleware
+_request_state: ContextVar[Optional[Dict[str, Any]]] = ContextVar("db_request_state", default=None)
+_stats = {"replicaReads": 0, "primaryReads": 0, "pinnedReads": 0}
+
+def bind_request_user(user_id: str) -> None:
+    """Record the authenticated user of the current request for read routing"""
+    state = _request_state.get()
+    if state is not None:
+        state["user"] = user_id
+
+def mark_write(user_id: str) -> None:
+    """Pin a user's reads to the primary for the read-your-writes window"""
+    _recent_writers.set(user_id, True)
+
+def reader() -> Prisma:
+    """
+    Client for read-only queries.
+
+    The replica when one is configured and connected, unless the current
+    request's user wrote within READ_YOUR_WRITES_SECONDS.
+    """
+    if replica is None or not replica.is_connected():
+        _stats["primaryReads"] += 1
+        return prisma
+
+    state = _request_state.get()
+    if state is not None and (state["primary"] or (state["user"] and _recent_writers.get(state["user"]))):
+        _stats["pinnedReads"] += 1
+        return prisma
+
+    _stats["replicaReads"] += 1
+    return replica
+
+def routing_stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "replicaConfigured": replica is not None,
+        "replicaConnected": bool(replica and replica.is_connected()),
+        "readYourWritesSeconds": READ_YOUR_WRITES_SECONDS,
+    }
+
+def _cookie_pins_primary(scope: Dict[str, Any]) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"cookie":
+            morsel = SimpleCookie(value.decode("latin-1")).get(PRIMARY_COOKIE)
+            if morsel is not None:
+                try:
+                    return float(morsel.value) > time.time()
+                except ValueError:
+                    return False
+    return False
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware that tracks request users and pins writers to the primary.
+
+    A successful non-GET request marks its user as a recent writer in this
+    process and sets a short-lived cookie, so the pin also holds when the
+    next read lands on another API process.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or replica is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"user": None, "primary": _cookie_pins_primary(scope)}
+        is_write = scope["method"] not in SAFE_METHODS
+
+        async def send_with_pin(message):
+            if is_write and message["type"] == "http.response.start" and message["status"] < 400:
+                if state["user"]:
+                    mark_write(state["user"])
+                cookie = (
+                    f"{PRIMARY_COOKIE}={time.time() + READ_YOUR_WRITES_SECONDS:.3f}; "
+                    f"Max-Age={int(READ_YOUR_WRITES_SECONDS) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        token = _request_state.set(state)
+        try:
+            await self.app(scope, receive, send_with_pin)
+        finally:
+            _request_state.reset(token)
@@ -1,27 +1,50 @@
-from fastapi import FastAPI, Depends
+import asyncio
+
+from fastapi import FastAPI, Depends, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from prisma.errors import PrismaError
 
 # Change relative imports to absolute imports
-from db.client import prisma, init_db
-from routes import boards, elements, ai_router
+from db.client import init_db, close_db, ping_db, pool_stats
+from db.routing import ReadYourWritesMiddleware, routing_stats
+from routes import boards, elements, ai_router, jobs_router, search_router
+from routes.elements import get_current_user_id
+from services.access_service import BoardAccessService
+from services.ai_service import llm_client
+from services.element_service import element_write_buffer
+from services.jobs import RECOVER_ON_STARTUP, job_scheduler
+from services.realtime import board_events
+from utils.logging_config import configure_logging, stop_logging
+from utils.metrics import METRICS_CONTENT_TYPE, MetricsMiddleware, render_metrics
+
+configure_logging()
 
 app = FastAPI(title="Inkspiree API", description="API for Inkspiree infinite canvas application")
 
+# Send reads to the read replica, except for users who just wrote
+app.add_middleware(ReadYourWritesMiddleware)
+
 # Configure CORS with more specific settings for the local environment
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:3001", "http://127.0.0.1:3000", "http://127.0.0.1:3001"],
     allow_credentials=True,  # Set to True for specific origins
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-    allow_headers=["Content-Type", "Authorization", "Accept", "Origin", "X-Requested-With"],
-    expose_headers=["Content-Length", "Content-Type"],
+    allow_headers=["Content-Type", "Authorization", "Accept", "Origin", "X-Requested-With", "If-None-Match", "Prefer"],
+    expose_headers=["Content-Length", "Content-Type", "X-Next-Cursor", "ETag", "Location", "Preference-Applied"],
     max_age=600  # 10 minutes cache for preflight requests
 )
 
+# Outermost, so latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(boards.router)
 app.include_router(elements.router)
 app.include_router(ai_router)
+app.include_router(jobs_router)
+app.include_router(search_router)
 
 @app.get("/")
 def read_root():
@@ -31,13 +54,65 @@ def read_root():
 def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Report whether this process can serve traffic: answers 503 until the database responds"""
+    try:
+        latency = await ping_db()
+    except (asyncio.TimeoutError, PrismaError) as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "database": str(e) or "timed out"}
+        )
+    return {"status": "ready", "databaseLatencyMs": round(latency * 1000, 2)}
+
+@app.get("/stats")
+async def stats():
+    """Runtime counters for tuning"""
+    return {
+        "db": {**await pool_stats(), "routing": routing_stats()},
+        "writeBuffer": element_write_buffer.stats(),
+        "llm": llm_client.stats(),
+        "jobs": job_scheduler.stats()
+    }
+
+@app.get("/metrics")
+def metrics():
+    """Per-route latency, payload, database and element metrics in Prometheus text format"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.websocket("/ws/boards/{board_id}")
+async def board_events_socket(websocket: WebSocket, board_id: str):
+    """Stream element create/update/delete events for a board"""
+    current_user_id = await get_current_user_id()
+    if not await BoardAccessService.has_access(board_id, current_user_id):
+        # 4404 mirrors the 404 returned by the REST routes
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+    await board_events.connect(board_id, websocket)
+    try:
+        # Clients only listen; incoming frames are treated as keepalives
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await board_events.disconnect(board_id, websocket)
+
 @app.on_event("startup")
 async def startup():
     """Initialize database connection on startup"""
     await init_db()
+    if RECOVER_ON_STARTUP:
+        await job_scheduler.store.mark_interrupted()
 
 @app.on_event("shutdown")
 async def shutdown():
     """Disconnect from database on shutdown"""
-    if prisma.is_connected():
-        await prisma.disconnect()
+    await job_scheduler.close()
+    await element_write_buffer.close()
+    await board_events.close()
+    await close_db()
+    stop_logging()
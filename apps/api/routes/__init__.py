@@ -3,3 +3,5 @@
 from routes.boards import router as boards_router
 from routes.elements import router as elements_router
 from routes.ai import router as ai_router
+from routes.jobs import router as jobs_router
+from routes.search import router as search_router
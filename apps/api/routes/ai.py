@@ -1,18 +1,30 @@
 # AI routes for the API
-from typing import Dict, Any, List
+import logging
+from typing import Dict, Any, AsyncIterator, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 
 # Change from relative to absolute imports
+from db.routing import bind_request_user
+from routes.jobs import submit_job, wants_async
+from schemas.models import BoardElementBase
 from services.ai_service import AIService
-from services.board_service import BoardService
+from services.access_service import BoardAccessService
 from services.element_service import BoardElementService
+from services.jobs import JobContext
+from services.llm_provider import LLMTimeoutError
+from utils.serialization import dumps, element_to_dict
+
+logger = logging.getLogger(__name__)
 
 # Mock auth for now - in a real app, you would use proper JWT auth
 async def get_current_user_id():
     # This is a placeholder for actual authentication
-    return "user-123"
+    user_id = "user-123"
+    bind_request_user(user_id)
+    return user_id
 
 # Request model
 class AIGenerateRequest(BaseModel):
@@ -24,60 +36,140 @@ class AIAnalyzeRequest(BaseModel):
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
+def _sse(event: str, data: Any) -> bytes:
+    """Format one server-sent event"""
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+class InvalidModelOutput(Exception):
+    """Raised when the model produced elements but none of them are valid"""
+
+def _valid_element(elem: Any) -> Optional[Dict[str, Any]]:
+    """Validate one generated element; None (and a warning) if the model got it wrong"""
+    try:
+        return BoardElementBase.model_validate(elem).model_dump()
+    except ValidationError as e:
+        logger.warning("Dropping invalid generated element: %s", e)
+        return None
+
+def _valid_elements(elements: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Validate generated elements, dropping the ones the model got wrong.
+
+    Raises:
+        InvalidModelOutput: If there were elements and none was valid
+    """
+    valid = [element for element in map(_valid_element, elements) if element is not None]
+    if elements and not valid:
+        raise InvalidModelOutput(f"The model returned {len(elements)} elements and none were valid")
+    return valid
+
+async def _generate_and_save(text: str, board_id: str) -> List[Any]:
+    """Generate elements and save the valid ones with one create_many"""
+    elements = _valid_elements(await AIService.generate_elements_from_text(text=text, board_id=board_id))
+    if not elements:
+        return []
+    return await BoardElementService.create_elements(board_id, elements)
+
+async def _stream_generated_elements(text: str, board_id: str) -> AsyncIterator[bytes]:
+    """
+    Save each element as the model produces it and send it as an SSE "element" event.
+
+    Ends with "done" and the number saved, or "error" with the number saved so far.
+    """
+    received = saved = 0
+    try:
+        async for elem in AIService.stream_elements_from_text(text=text, board_id=board_id):
+            received += 1
+            element = _valid_element(elem)
+            if element is None:
+                continue
+            for created in await BoardElementService.create_elements(board_id, [element]):
+                saved += 1
+                yield _sse("element", element_to_dict(created))
+        if received and not saved:
+            raise InvalidModelOutput(f"The model returned {received} elements and none were valid")
+        yield _sse("done", {"count": saved})
+    except Exception as e:
+        logger.exception("AI generation failed for board %s", board_id)
+        yield _sse("error", {"detail": str(e), "count": saved})
+
 @router.post("/generate")
 async def generate_elements(
     request: AIGenerateRequest,
+    http_request: Request,
     current_user_id: str = Depends(get_current_user_id)
 ):
-    """Generate board elements from text using AI"""
+    """
+    Generate board elements from text using AI.
+    
+    Elements the model got wrong are dropped; if none is valid the answer is 502.
+    Valid elements are saved in one transaction and returned, or saved by a
+    background job with "Prefer: respond-async". With "Accept: text/event-stream"
+    each element is saved and sent as a server-sent event as soon as the model
+    produces it.
+    """
     # Verify the user has access to this board
-    board = await BoardService.get_board_by_id(request.boardId, current_user_id)
-    if not board:
+    if not await BoardAccessService.has_access(request.boardId, current_user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Board with ID {request.boardId} not found or access denied"
         )
     
-    # Use AI service to generate elements from text
-    elements = await AIService.generate_elements_from_text(
-        text=request.text,
-        board_id=request.boardId
-    )
-    
-    # Create the elements in the database
-    created_elements = []
-    for elem in elements:
-        created = await BoardElementService.create_element(
-            board_id=elem["boardId"],
-            element_type=elem["type"],
-            content=elem["content"],
-            position=elem["position"],
-            size=elem["size"],
-            style=elem["style"],
-            z_index=elem["zIndex"]
+    if "text/event-stream" in http_request.headers.get("accept", ""):
+        return StreamingResponse(
+            _stream_generated_elements(request.text, request.boardId),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
         )
-        created_elements.append(created)
     
-    return created_elements
+    if wants_async(http_request):
+        async def run(job: JobContext):
+            created = await _generate_and_save(request.text, request.boardId)
+            return [element_to_dict(element) for element in created]
+        
+        return await submit_job(current_user_id, "ai.generate", run)
+    
+    # Generate elements and create the valid ones in the database in one transaction
+    try:
+        return await _generate_and_save(request.text, request.boardId)
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except InvalidModelOutput as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
 
 @router.post("/analyze")
 async def analyze_board(
     request: AIAnalyzeRequest,
+    http_request: Request,
     current_user_id: str = Depends(get_current_user_id)
 ):
-    """Analyze a board using AI to provide insights"""
+    """Analyze a board using AI to provide insights; "Prefer: respond-async" runs it as a job"""
     # Verify the user has access to this board
-    board = await BoardService.get_board_by_id(request.boardId, current_user_id)
-    if not board:
+    if not await BoardAccessService.has_access(request.boardId, current_user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Board with ID {request.boardId} not found or access denied"
         )
     
-    # Get all elements for the board
-    elements = await BoardElementService.get_elements_by_board_id(request.boardId)
+    if wants_async(http_request):
+        async def run(job: JobContext):
+            analysis = await AIService.analyze_board(request.boardId)
+            if analysis is None:
+                raise LookupError(f"Board with ID {request.boardId} not found")
+            return analysis
+        
+        return await submit_job(current_user_id, "ai.analyze", run)
+    
+    # Use AI service to analyze the board from its cached element features
+    try:
+        analysis = await AIService.analyze_board(request.boardId)
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
     
-    # Use AI service to analyze the board
-    analysis = await AIService.analyze_board(elements)
+    if analysis is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Board with ID {request.boardId} not found or access denied"
+        )
     
     return analysis
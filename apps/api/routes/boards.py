@@ -1,32 +1,271 @@
 # Board routes for the API
 
-from typing import List
+from typing import List, Optional
 import logging
-import traceback
+import os
+import tempfile
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from prisma.errors import PrismaError
 
 # Change from relative to absolute imports
-from schemas.models import BoardCreate, BoardResponse, BoardUpdate
-from services.board_service import BoardService
+from db.routing import bind_request_user
+from schemas.models import (
+    BoardChangesResponse,
+    BoardCreate,
+    BoardDuplicate,
+    BoardHistoryStepResponse,
+    BoardResponse,
+    BoardRevisionResponse,
+    BoardUpdate
+)
+from services.access_service import BoardAccessService
+from services.board_service import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, BoardService
+from services.history_service import BoardHistoryService
+from routes.jobs import submit_job, wants_async
+from services.jobs import JobContext
+from services.transfer_service import BoardImportError, BoardTransferService, iter_file_chunks, iter_ndjson_lines
+from utils.http_cache import cached_json_response, make_etag
+from utils.serialization import FAST_JSON_RESPONSES, board_to_dict, dumps, element_to_dict, encode_board
+
+logger = logging.getLogger(__name__)
 
 # Mock auth for now - in a real app, you would use proper JWT auth
 async def get_current_user_id():
     # This is a placeholder for actual authentication
-    return "user-123"
+    user_id = "user-123"
+    bind_request_user(user_id)
+    return user_id
+
+# Import bodies queued as jobs are held in memory up to this size, then spill to disk
+IMPORT_SPOOL_MEMORY = int(os.environ.get("BOARD_IMPORT_SPOOL_MEMORY", str(8 * 1024 * 1024)))
 
 router = APIRouter(prefix="/api/boards", tags=["boards"])
 
 @router.get("/", response_model=List[BoardResponse])
-async def get_boards(current_user_id: str = Depends(get_current_user_id)):
-    """Get all boards for the current user"""
-    return await BoardService.get_all_boards(current_user_id)
+async def get_boards(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    include_stats: bool = Query(False, description="Add elementCount and lastEditedAt"),
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Get a page of boards for the current user, most recently updated first"""
+    try:
+        boards, next_cursor = await BoardService.get_all_boards(current_user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    stats = await BoardService.get_board_stats([board.id for board in boards]) if include_stats else {}
+    
+    if FAST_JSON_RESPONSES:
+        body = dumps([{**board_to_dict(board), **stats.get(board.id, {})} for board in boards])
+        return Response(content=body, media_type="application/json", headers=headers)
+    
+    response.headers.update(headers)
+    if not include_stats:
+        return boards
+    
+    return [
+        BoardResponse.model_validate(board).model_copy(update=stats[board.id])
+        for board in boards
+    ]
 
 @router.get("/{board_id}", response_model=BoardResponse)
-async def get_board(board_id: str, current_user_id: str = Depends(get_current_user_id)):
+async def get_board(
+    request: Request,
+    board_id: str,
+    current_user_id: str = Depends(get_current_user_id)
+):
     """Get a single board by ID"""
     board = await BoardService.get_board_by_id(board_id, current_user_id)
+    if not board:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Board with ID {board_id} not found"
+        )
+    
+    # Title/description edits change updatedAt without bumping the revision
+    version = (board.revision, board.updatedAt.isoformat())
+    
+    async def render() -> bytes:
+        if FAST_JSON_RESPONSES:
+            return encode_board(board)
+        return BoardResponse.model_validate(board).model_dump_json().encode()
+    
+    return await cached_json_response(
+        request,
+        key=(board_id, "board", version, None),
+        etag=make_etag("board", board_id, *version),
+        render=render
+    )
+
+@router.get("/{board_id}/changes", response_model=BoardChangesResponse)
+async def get_board_changes(
+    board_id: str,
+    since: int = Query(0, ge=0, description="Last board revision the client has applied"),
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Get elements changed and deleted since a board revision"""
+    if not await BoardAccessService.has_access(board_id, current_user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Board with ID {board_id} not found"
+        )
+    
+    changes = await BoardService.get_changes(board_id, since)
+    if changes is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Board with ID {board_id} not found"
+        )
+    
+    if FAST_JSON_RESPONSES:
+        changes["upserts"] = [element_to_dict(element) for element in changes["upserts"]]
+        return Response(content=dumps(changes), media_type="application/json")
+    return changes
+
+@router.get("/{board_id}/revisions/{revision}", response_model=BoardRevisionResponse)
+async def get_board_at_revision(
+    board_id: str,
+    revision: int,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Get a board's elements as they were at a past revision"""
+    if not await BoardAccessService.has_access(board_id, current_user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Board with ID {board_id} not found"
+        )
+    
+    try:
+        board = await BoardHistoryService.get_board_at_revision(board_id, revision)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    if board is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Board with ID {board_id} not found"
+        )
+    return board
+
+async def _history_step(board_id: str, user_id: str, action: str):
+    if not await BoardAccessService.has_access(board_id, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Board with ID {board_id} not found"
+        )
+    
+    step = BoardHistoryService.undo if action == "undo" else BoardHistoryService.redo
+    result = await step(board_id)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Nothing to {action} on board {board_id}"
+        )
+    return result
+
+@router.post("/{board_id}/undo", response_model=BoardHistoryStepResponse)
+async def undo(board_id: str, current_user_id: str = Depends(get_current_user_id)):
+    """Revert the board's most recent edit that has not been undone"""
+    return await _history_step(board_id, current_user_id, "undo")
+
+@router.post("/{board_id}/redo", response_model=BoardHistoryStepResponse)
+async def redo(board_id: str, current_user_id: str = Depends(get_current_user_id)):
+    """Re-apply the board's most recently undone edit"""
+    return await _history_step(board_id, current_user_id, "redo")
+
+@router.get("/{board_id}/export")
+async def export_board(board_id: str, current_user_id: str = Depends(get_current_user_id)):
+    """Stream a board and its elements as NDJSON"""
+    if not await BoardAccessService.has_access(board_id, current_user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Board with ID {board_id} not found"
+        )
+    
+    return StreamingResponse(
+        BoardTransferService.export_board(board_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="board-{board_id}.ndjson"'}
+    )
+
+@router.post("/import", response_model=BoardResponse, status_code=status.HTTP_201_CREATED)
+async def import_board(request: Request, current_user_id: str = Depends(get_current_user_id)):
+    """
+    Create a board from a streamed NDJSON export.
+    
+    With "Prefer: respond-async" the body is spooled and imported by a background
+    job; the 202 response points at the job to poll.
+    """
+    if wants_async(request):
+        spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MEMORY)
+        async for chunk in request.stream():
+            spool.write(chunk)
+        
+        async def run(job: JobContext):
+            try:
+                board = await BoardTransferService.import_board(
+                    current_user_id,
+                    iter_ndjson_lines(iter_file_chunks(spool)),
+                    on_progress=job.progress
+                )
+            finally:
+                spool.close()
+            return BoardResponse.model_validate(board).model_dump(mode="json")
+        
+        return await submit_job(current_user_id, "board.import", run)
+    
+    try:
+        return await BoardTransferService.import_board(
+            current_user_id,
+            iter_ndjson_lines(request.stream())
+        )
+    except BoardImportError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    except PrismaError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Import failed and was rolled back: {str(e)}"
+        )
+
+@router.post("/{board_id}/duplicate", response_model=BoardResponse, status_code=status.HTTP_201_CREATED)
+async def duplicate_board(
+    request: Request,
+    board_id: str,
+    options: Optional[BoardDuplicate] = None,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Copy a board and all of its elements; "Prefer: respond-async" runs the copy as a job"""
+    title = options.title if options else None
+    
+    if wants_async(request):
+        if not await BoardAccessService.has_access(board_id, current_user_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Board with ID {board_id} not found"
+            )
+        
+        async def run(job: JobContext):
+            board = await BoardService.duplicate_board(board_id, current_user_id, title=title)
+            if not board:
+                raise LookupError(f"Board with ID {board_id} not found")
+            return BoardResponse.model_validate(board).model_dump(mode="json")
+        
+        return await submit_job(current_user_id, "board.duplicate", run)
+    
+    board = await BoardService.duplicate_board(board_id, current_user_id, title=title)
     if not board:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -36,29 +275,20 @@ async def get_board(board_id: str, current_user_id: str = Depends(get_current_us
 
 @router.post("/", response_model=BoardResponse, status_code=status.HTTP_201_CREATED)
 async def create_board(
-    request: Request,
     board: BoardCreate, 
     current_user_id: str = Depends(get_current_user_id)
 ):
     """Create a new board"""
     try:
-        # Log the request body for debugging
-        body = await request.json()
-        print(f"Received create board request: {body}")
-        
-        # Log the current user ID
-        print(f"Current user ID: {current_user_id}")
-        
         result = await BoardService.create_board(
             user_id=current_user_id, 
             title=board.title, 
             description=board.description
         )
-        print(f"Board created: {result}")
+        logger.debug("Board created", extra={"boardId": result.id, "userId": current_user_id})
         return result
     except Exception as e:
-        print(f"Error creating board: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error creating board for user %s", current_user_id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating board: {str(e)}"
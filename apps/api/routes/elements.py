@@ -1,41 +1,147 @@
 # Board element routes for the API
 
-from typing import List
+import logging
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.responses import JSONResponse
+from prisma.errors import PrismaError
+from pydantic import TypeAdapter, ValidationError
 
 # Change from relative to absolute imports
+from db.routing import bind_request_user
 from schemas.models import (
+    BatchOperationType,
+    BoardElementBase,
+    BoardElementBatchOperation,
+    BoardElementBatchRequest,
+    BoardElementBatchResponse,
     BoardElementCreate, 
     BoardElementResponse, 
-    BoardElementUpdate
+    BoardElementUpdate,
+    BoardLodResponse,
+    ElementCopy,
+    ElementTranslate
 )
 from services.element_service import BoardElementService
+from services.access_service import BoardAccessService
 from services.board_service import BoardService
+from services.lod_service import lod_engine, snap_zoom
+from utils.http_cache import cached_json_response, make_etag
+from utils.metrics import record_elements
+from utils.serialization import FAST_JSON_RESPONSES, dumps, element_to_dict, encode_elements
+from utils.wire_format import (
+    JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    encode_document_as,
+    encode_elements_as,
+    negotiate,
+    packb
+)
+
+logger = logging.getLogger(__name__)
 
 # Mock auth for now - in a real app, you would use proper JWT auth
 async def get_current_user_id():
     # This is a placeholder for actual authentication
-    return "user-123"
+    user_id = "user-123"
+    bind_request_user(user_id)
+    return user_id
 
 router = APIRouter(prefix="/api/elements", tags=["elements"])
 
-@router.get("/board/{board_id}", response_model=List[BoardElementResponse])
+_element_list = TypeAdapter(List[BoardElementResponse])
+_lod_view = TypeAdapter(BoardLodResponse)
+# Batch results mix elements with per-operation status, so they have no columnar form
+_BATCH_MEDIA_TYPES = (JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE)
+
+def _parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    """Parse an "x0,y0,x1,y1" viewport rectangle"""
+    try:
+        x0, y0, x1, y1 = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="bbox must be four comma-separated numbers: x0,y0,x1,y1"
+        )
+    if x1 < x0 or y1 < y0:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="bbox must satisfy x0 <= x1 and y0 <= y1"
+        )
+    return x0, y0, x1, y1
+
+@router.get("/board/{board_id}", response_model=Union[List[BoardElementResponse], BoardLodResponse])
 async def get_board_elements(
+    request: Request,
     board_id: str,
+    bbox: Optional[str] = Query(None, description="Only return elements intersecting x0,y0,x1,y1"),
+    zoom: Optional[float] = Query(None, gt=0, description="Screen pixels per board unit; folds tiny elements into clusters"),
     current_user_id: str = Depends(get_current_user_id)
 ):
-    """Get all elements for a board"""
-    # First verify the user has access to this board
+    """
+    Get all elements for a board, or only those inside a viewport.
+
+    With zoom, answers a BoardLodResponse instead: elements too small to see
+    at that zoom are folded into grid clusters. Accept selects JSON,
+    MessagePack or the columnar MessagePack layout (see utils/wire_format.py).
+    """
+    # The board row doubles as the access check and the cache version
     board = await BoardService.get_board_by_id(board_id, current_user_id)
     if not board:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Board with ID {board_id} not found or access denied"
         )
+    viewport = _parse_bbox(bbox) if bbox else None
+    zoom = snap_zoom(zoom) if zoom else None
+    media_type = negotiate(request.headers.get("accept"))
+    
+    async def render_lod() -> bytes:
+        view = await lod_engine.view(board_id, zoom, viewport)
+        if view is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Board with ID {board_id} not found or access denied"
+            )
+        record_elements(len(view["elements"]))
+        if media_type != JSON_MEDIA_TYPE:
+            return encode_document_as(media_type, {**view, "boardId": board_id}, "elements")
+        if FAST_JSON_RESPONSES:
+            return dumps({
+                **view, "boardId": board_id,
+                "elements": [element_to_dict(element) for element in view["elements"]]
+            })
+        return _lod_view.dump_json(_lod_view.validate_python({**view, "boardId": board_id}, from_attributes=True))
+    
+    async def load_elements():
+        if viewport:
+            return await BoardElementService.get_elements_in_bbox(board_id, *viewport)
+        return await BoardElementService.get_elements_by_board_id(board_id)
+    
+    async def render() -> bytes:
+        if zoom:
+            return await render_lod()
+        if media_type != JSON_MEDIA_TYPE:
+            return encode_elements_as(media_type, await load_elements())
+        if FAST_JSON_RESPONSES:
+            return encode_elements(await load_elements())
+        return _element_list.dump_json(
+            _element_list.validate_python(await load_elements(), from_attributes=True)
+        )
+    
+    # Buffered drags are not reflected in the revision yet, so skip caching until they flush
+    if BoardElementService.has_buffered_writes(board_id):
+        return Response(content=await render(), media_type=media_type, headers={"Vary": "Accept"})
     
-    return await BoardElementService.get_elements_by_board_id(board_id)
+    return await cached_json_response(
+        request,
+        key=(board_id, "elements", board.revision, viewport, zoom, media_type),
+        etag=make_etag("elements", board_id, board.revision, viewport, zoom, media_type),
+        render=render,
+        media_type=media_type,
+        vary="Accept"
+    )
 
 @router.post("/", response_model=BoardElementResponse, status_code=status.HTTP_201_CREATED)
 async def create_element(
@@ -44,12 +150,8 @@ async def create_element(
 ):
     """Create a new element on a board"""
     try:
-        # Log the incoming request for debugging
-        print(f"Creating element: {element}")
-        
         # Verify the user has access to the board
-        board = await BoardService.get_board_by_id(element.boardId, current_user_id)
-        if not board:
+        if not await BoardAccessService.has_access(element.boardId, current_user_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Board with ID {element.boardId} not found or access denied"
@@ -67,20 +169,89 @@ async def create_element(
             position=position_dict,
             size=size_dict,
             style=element.style,
-            z_index=element.zIndex
+            z_index=element.zIndex,
+            parent_id=element.parentId
         )
         
-        print(f"Element created successfully: {result}")
+        logger.debug("Element created", extra={"elementId": result.id, "boardId": element.boardId})
         return result
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     except Exception as e:
-        import traceback
-        print(f"Error creating element: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error creating element on board %s", element.boardId)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail=f"Failed to create element: {str(e)}"
         )
 
+def _prepare_batch_operation(index: int, operation: BoardElementBatchOperation) -> Dict[str, Any]:
+    """Validate one batch operation and convert it to the service's dict form"""
+    if operation.op != BatchOperationType.CREATE and not operation.id:
+        raise ValueError(f"Operation {index}: '{operation.op.value}' requires an element id")
+
+    try:
+        if operation.op == BatchOperationType.CREATE:
+            data = BoardElementBase(**(operation.data or {})).dict()
+        elif operation.op == BatchOperationType.UPDATE:
+            data = BoardElementUpdate(**(operation.data or {})).dict(exclude_unset=True)
+        else:
+            data = None
+    except ValidationError as e:
+        raise ValueError(f"Operation {index}: {e}")
+
+    # Created elements always get server-assigned IDs
+    element_id = None if operation.op == BatchOperationType.CREATE else operation.id
+    return {"op": operation.op.value, "id": element_id, "data": data}
+
+@router.post("/batch", response_model=BoardElementBatchResponse)
+async def batch_elements(
+    request: BoardElementBatchRequest,
+    http_request: Request,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Apply a batch of create, update and delete operations to one board.
+
+    Answers MessagePack instead of JSON when Accept asks for application/msgpack.
+    """
+    if not await BoardAccessService.has_access(request.boardId, current_user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Board with ID {request.boardId} not found or access denied"
+        )
+    
+    try:
+        operations = [
+            _prepare_batch_operation(index, operation)
+            for index, operation in enumerate(request.operations)
+        ]
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    
+    try:
+        results = await BoardElementService.apply_batch(request.boardId, operations)
+    except PrismaError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Batch failed and was rolled back: {str(e)}"
+        )
+    
+    if negotiate(http_request.headers.get("accept"), _BATCH_MEDIA_TYPES) == MSGPACK_MEDIA_TYPE:
+        body = packb({
+            "boardId": request.boardId,
+            "results": [
+                {**result, "element": element_to_dict(result["element"]) if result["element"] else None}
+                for result in results
+            ]
+        })
+        return Response(content=body, media_type=MSGPACK_MEDIA_TYPE, headers={"Vary": "Accept"})
+    return {"boardId": request.boardId, "results": results}
+
 @router.put("/{element_id}", response_model=BoardElementResponse)
 async def update_element(
     element_id: str,
@@ -97,24 +268,24 @@ async def update_element(
         )
     
     # Verify the user has access to the board
-    board = await BoardService.get_board_by_id(existing_element.boardId, current_user_id)
-    if not board:
+    if not await BoardAccessService.has_access(existing_element.boardId, current_user_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied to this board"
         )
     
-    # Prepare data for update
+    # Prepare data for update (nested models are already converted to dicts)
     update_data = element.dict(exclude_unset=True)
     
-    # Convert nested Pydantic models to dict if present
-    if 'position' in update_data and update_data['position']:
-        update_data['position'] = update_data['position'].dict()
-    if 'size' in update_data and update_data['size']:
-        update_data['size'] = update_data['size'].dict()
+    # Drags only move or resize; those are coalesced by the write buffer
+    if BoardElementService.accepts_buffered_update(update_data):
+        return BoardElementService.queue_geometry_update(existing_element, update_data)
     
     # Update the element
-    updated_element = await BoardElementService.update_element(element_id, update_data)
+    try:
+        updated_element = await BoardElementService.update_element(element_id, update_data)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     
     if not updated_element:
         raise HTTPException(
@@ -124,27 +295,58 @@ async def update_element(
         
     return updated_element
 
-@router.delete("/{element_id}")
-async def delete_element(
-    element_id: str,
-    current_user_id: str = Depends(get_current_user_id)
-):
-    """Delete an element"""
-    # Get the element
+async def _accessible_element(element_id: str, current_user_id: str):
+    """Load an element, answering 404 if it is missing and 403 if its board is not the user's"""
     element = await BoardElementService.get_element_by_id(element_id)
     if not element:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Element with ID {element_id} not found"
         )
-    
-    # Verify the user has access to the board
-    board = await BoardService.get_board_by_id(element.boardId, current_user_id)
-    if not board:
+    if not await BoardAccessService.has_access(element.boardId, current_user_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied to this board"
         )
+    return element
+
+@router.post("/{element_id}/translate", response_model=BoardElementResponse)
+async def translate_element(
+    element_id: str,
+    offset: ElementTranslate,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Move an element, and everything inside it, by an offset"""
+    await _accessible_element(element_id, current_user_id)
+    element = await BoardElementService.translate_element(element_id, offset.dx, offset.dy)
+    if not element:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Element with ID {element_id} not found"
+        )
+    return element
+
+@router.post("/{element_id}/copy", response_model=List[BoardElementResponse], status_code=status.HTTP_201_CREATED)
+async def copy_element(
+    element_id: str,
+    copy: ElementCopy,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Copy an element and everything inside it; the copied root comes first"""
+    source = await _accessible_element(element_id, current_user_id)
+    parent_id = copy.parentId if "parentId" in copy.model_fields_set else source.parentId
+    try:
+        return await BoardElementService.copy_subtree(element_id, copy.dx, copy.dy, parent_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+@router.delete("/{element_id}")
+async def delete_element(
+    element_id: str,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Delete an element and everything inside it"""
+    await _accessible_element(element_id, current_user_id)
     
     # Delete the element
     success = await BoardElementService.delete_element(element_id)
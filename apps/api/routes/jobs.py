@@ -0,0 +1,62 @@
+# Background job routes for the API
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+
+# Change from relative to absolute imports
+from db.routing import bind_request_user
+from schemas.models import JobResponse
+from services.jobs import QUEUED, RUNNING, Job, JobQueueFullError, JobFunction, job_scheduler
+
+# Mock auth for now - in a real app, you would use proper JWT auth
+async def get_current_user_id():
+    # This is a placeholder for actual authentication
+    user_id = "user-123"
+    bind_request_user(user_id)
+    return user_id
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+def wants_async(request: Request) -> bool:
+    """True when the client sent "Prefer: respond-async" (RFC 7240)"""
+    return "respond-async" in request.headers.get("prefer", "").lower()
+
+async def submit_job(user_id: str, kind: str, fn: JobFunction) -> JSONResponse:
+    """Queue fn and answer 202 Accepted with the job and a Location to poll"""
+    try:
+        job = await job_scheduler.submit(user_id, kind, fn)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=JobResponse.model_validate(job).model_dump(mode="json"),
+        headers={"Location": f"/api/jobs/{job.id}", "Preference-Applied": "respond-async"}
+    )
+
+async def _get_own_job(job_id: str, user_id: str) -> Job:
+    job = await job_scheduler.get(job_id)
+    if not job or job.userId != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with ID {job_id} not found"
+        )
+    return job
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, current_user_id: str = Depends(get_current_user_id)):
+    """Get a job's status, progress and, once finished, its result or error"""
+    return await _get_own_job(job_id, current_user_id)
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(job_id: str, current_user_id: str = Depends(get_current_user_id)):
+    """Cancel a queued or running job; 409 if another API process owns it"""
+    await _get_own_job(job_id, current_user_id)
+    job = await job_scheduler.cancel(job_id)
+    if job.status in (QUEUED, RUNNING):
+        # Queued and running work lives in the process that accepted the job
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job {job_id} is owned by another API process and cannot be cancelled from this one"
+        )
+    return job
@@ -0,0 +1,45 @@
+# Search routes for the API
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+# Change from relative to absolute imports
+from db.routing import bind_request_user
+from schemas.models import SearchResult
+from services.search_service import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, SearchService
+from utils.serialization import FAST_JSON_RESPONSES, dumps
+
+# Mock auth for now - in a real app, you would use proper JWT auth
+async def get_current_user_id():
+    # This is a placeholder for actual authentication
+    user_id = "user-123"
+    bind_request_user(user_id)
+    return user_id
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+@router.get("/", response_model=List[SearchResult])
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=500, description="Search terms"),
+    board_id: Optional[str] = Query(None, alias="boardId", description="Only search this board"),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Search the text of sticky notes and text elements across the current user's boards"""
+    try:
+        results, next_cursor = await SearchService.search(current_user_id, q, limit, cursor, board_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if FAST_JSON_RESPONSES:
+        return Response(content=dumps(results), media_type="application/json", headers=headers)
+    
+    response.headers.update(headers)
+    return results
@@ -5,7 +5,7 @@ from enum import Enum
 from typing import Dict, List, Optional, Union, Any
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 # Element type enum
 class ElementType(str, Enum):
@@ -14,6 +14,8 @@ class ElementType(str, Enum):
     TEXT = "text"
     CONNECTOR = "connector"
     IMAGE = "image"
+    GROUP = "group"
+    FRAME = "frame"
 
 # Base models
 class PositionModel(BaseModel):
@@ -35,11 +37,18 @@ class BoardCreate(BoardBase):
 class BoardUpdate(BoardBase):
     title: Optional[str] = None
 
+class BoardDuplicate(BaseModel):
+    title: Optional[str] = None
+
 class BoardResponse(BoardBase):
     id: str
     createdAt: datetime
     updatedAt: datetime
     userId: str
+    revision: int = 0
+    # Only filled in by the board listing when stats are requested
+    elementCount: Optional[int] = None
+    lastEditedAt: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -48,10 +57,11 @@ class BoardResponse(BoardBase):
 class BoardElementBase(BaseModel):
     type: ElementType
     content: Dict[str, Any]
-    position: PositionModel
+    position: PositionModel  # Relative to the parent when parentId is set
     size: Optional[SizeModel] = None
     style: Optional[Dict[str, Any]] = None
     zIndex: int = 0
+    parentId: Optional[str] = None  # A group or frame on the same board
 
 class BoardElementCreate(BoardElementBase):
     boardId: str
@@ -62,12 +72,146 @@ class BoardElementUpdate(BaseModel):
     size: Optional[SizeModel] = None
     style: Optional[Dict[str, Any]] = None
     zIndex: Optional[int] = None
+    parentId: Optional[str] = None  # null moves the element to the top level
+
+class ElementTranslate(BaseModel):
+    dx: float
+    dy: float
+
+class ElementCopy(BaseModel):
+    dx: float = 0
+    dy: float = 0
+    parentId: Optional[str] = None  # Parent of the copy; defaults to the source's parent
+
+def _read_field(source: Any, name: str) -> Any:
+    return source.get(name) if isinstance(source, dict) else getattr(source, name, None)
 
 class BoardElementResponse(BoardElementBase):
     id: str
     boardId: str
     createdAt: datetime
     updatedAt: datetime
+    revision: int = 0
+
+    class Config:
+        from_attributes = True
+
+    @model_validator(mode="before")
+    @classmethod
+    def geometry_from_columns(cls, source: Any) -> Any:
+        """Rebuild position/size from the x/y/width/height columns of a DB row"""
+        if _read_field(source, "position") is not None or _read_field(source, "x") is None:
+            return source
+
+        values = {name: _read_field(source, name) for name in cls.model_fields}
+        values["position"] = {"x": _read_field(source, "x"), "y": _read_field(source, "y")}
+        width, height = _read_field(source, "width"), _read_field(source, "height")
+        values["size"] = {"width": width, "height": height} if width is not None and height is not None else None
+        return values
+
+class BoardChangesResponse(BaseModel):
+    boardId: str
+    revision: int
+    resync: bool  # History before `since` was compacted; refetch the whole board
+    upserts: List[BoardElementResponse]
+    deletes: List[str]
+
+# Zoomed-out board views
+class BoundsModel(BaseModel):
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+
+class ElementCluster(BaseModel):
+    count: int
+    bounds: BoundsModel  # Board coordinates
+    color: Optional[str] = None  # Most common style.fill among the clustered elements
+
+class BoardLodResponse(BaseModel):
+    boardId: str
+    revision: int
+    zoom: float  # The requested zoom, snapped to the nearest half step of a doubling
+    cellSize: float  # Board units per aggregation cell
+    elements: List[BoardElementResponse]
+    clusters: List[ElementCluster]
+
+# Batch element schemas
+MAX_BATCH_OPERATIONS = 1000
+
+class BatchOperationType(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+class BoardElementBatchOperation(BaseModel):
+    op: BatchOperationType
+    id: Optional[str] = None  # Required for update and delete
+    data: Optional[Dict[str, Any]] = None  # BoardElementBase for create, BoardElementUpdate for update
+
+class BoardElementBatchRequest(BaseModel):
+    boardId: str
+    operations: List[BoardElementBatchOperation] = Field(..., max_length=MAX_BATCH_OPERATIONS)
+
+class BoardElementBatchResult(BaseModel):
+    index: int
+    op: BatchOperationType
+    id: Optional[str] = None
+    ok: bool
+    element: Optional[BoardElementResponse] = None
+    error: Optional[str] = None
+
+class BoardElementBatchResponse(BaseModel):
+    boardId: str
+    results: List[BoardElementBatchResult]
+
+# Board history schemas
+class BoardElementState(BaseModel):
+    """An element as recorded in the operation log and snapshots"""
+    id: str
+    type: str
+    content: Dict[str, Any]
+    position: PositionModel
+    size: Optional[SizeModel] = None
+    style: Optional[Dict[str, Any]] = None
+    zIndex: int = 0
+    parentId: Optional[str] = None
+
+class BoardRevisionResponse(BaseModel):
+    boardId: str
+    revision: int
+    snapshotRevision: int  # Snapshot the reconstruction started from
+    replayed: int  # Logged operations applied on top of it
+    elements: List[BoardElementState]
+
+class BoardHistoryStepResponse(BaseModel):
+    boardId: str
+    action: str  # "undo" or "redo"
+    targetRevision: int  # Revision that was undone or redone
+    results: List[BoardElementBatchResult]
+
+# Background job schemas
+class JobResponse(BaseModel):
+    id: str
+    kind: str  # "ai.generate", "ai.analyze", "board.duplicate", "board.import"
+    status: str  # queued, running, succeeded, failed, cancelled
+    progress: int  # Units of work done, out of total when it is known
+    total: Optional[int] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    createdAt: datetime
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
 
     class Config:
         from_attributes = True
+
+# Search schemas
+class SearchResult(BaseModel):
+    elementId: str
+    boardId: str
+    boardTitle: str
+    type: ElementType
+    text: str
+    snippet: str  # Best matching fragment with matches wrapped in <b></b>
+    rank: float
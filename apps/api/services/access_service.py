@@ -0,0 +1,40 @@
+# Board access service for authorizing requests against board ownership
+
+import os
+
+# Change from relative to absolute imports
+from db.client import prisma
+from utils.cache import TTLCache
+
+# Only successful checks are cached, so a revoked or deleted board is at most
+# one TTL away from being rejected even on another worker
+_access_cache = TTLCache(
+    max_size=int(os.environ.get("BOARD_ACCESS_CACHE_SIZE", "4096")),
+    ttl=float(os.environ.get("BOARD_ACCESS_CACHE_TTL", "30")),
+)
+
+class BoardAccessService:
+    @staticmethod
+    async def has_access(board_id: str, user_id: str) -> bool:
+        """Check that a board exists and belongs to the user without loading its elements"""
+        key = (board_id, user_id)
+        if _access_cache.get(key):
+            return True
+
+        count = await prisma.board.count(
+            where={"id": board_id, "userId": user_id}
+        )
+        allowed = count > 0
+        if allowed:
+            _access_cache.set(key, True)
+        return allowed
+
+    @staticmethod
+    def invalidate_board(board_id: str) -> None:
+        """Drop every cached access decision for a board"""
+        _access_cache.discard_where(lambda key: key[0] == board_id)
+
+    @staticmethod
+    def clear_cache() -> None:
+        """Drop every cached access decision"""
+        _access_cache.clear()
@@ -1,10 +1,36 @@
 """
 AI Service for Inkspiree - handling AI-powered features
 """
-import json
-from typing import Dict, List, Any, Optional
+import os
+from typing import AsyncIterator, Dict, List, Any, Optional
+
+from services.analysis_service import analysis_engine
+from services.llm_provider import LLMClient, load_provider
+
+# Longest board description sent to the model for analysis
+MAX_ANALYSIS_PROMPT_CHARS = 8000
+
+# Shared by every request so the concurrency limit, cache and coalescing are process-wide
+llm_client = LLMClient(
+    load_provider(),
+    max_concurrency=int(os.environ.get("AI_MAX_CONCURRENCY", "4")),
+    timeout=float(os.environ.get("AI_TIMEOUT", "30")),
+    cache_size=int(os.environ.get("AI_CACHE_SIZE", "512")),
+    cache_ttl=float(os.environ.get("AI_CACHE_TTL", "600"))
+)
+
+def describe_board(report: Dict[str, Any]) -> str:
+    """Render an analysis report as a compact, deterministic prompt for the model"""
+    counts = ", ".join(f"{count} {kind}" for kind, count in report["typeCounts"].items())
+    lines = [f"{report['elementCount']} elements ({counts or 'empty board'}), {report['wordCount']} words"]
+    if report["bounds"]:
+        bounds = report["bounds"]
+        lines.append(f"Canvas extent: {bounds['x1'] - bounds['x0']:.0f} x {bounds['y1'] - bounds['y0']:.0f}")
+    lines.append(f"{len(report['clusters'])} clusters of sticky notes, {report['unclusteredNotes']} notes on their own")
+    for index, cluster in enumerate(report["clusters"], start=1):
+        lines.append(f"Cluster {index} ({len(cluster['elementIds'])} notes): " + " | ".join(cluster["sampleText"]))
+    return "\n".join(lines)[:MAX_ANALYSIS_PROMPT_CHARS]
 
-# This is a mock AI service - in a production app, you would integrate with OpenAI/LangChain here
 class AIService:
     @staticmethod
     async def generate_elements_from_text(
@@ -12,8 +38,7 @@ class AIService:
         board_id: str
     ) -> List[Dict[str, Any]]:
         """
-        Generate board elements from text description using AI.
-        In a real implementation, this would call OpenAI's API or another LLM.
+        Generate board elements from text description using the configured LLM provider.
         
         Args:
             text: Text prompt describing what to generate
@@ -21,114 +46,46 @@ class AIService:
             
         Returns:
             A list of generated elements
-        """
-        # Mock implementation - generates elements based on simple text parsing
-        elements = []
-        
-        # Simple parsing logic for demonstration
-        if "sticky" in text.lower() or "note" in text.lower():
-            # Generate sticky notes
-            elements.append({
-                "type": "sticky-note",
-                "content": {"text": text},
-                "position": {"x": 100, "y": 100},
-                "size": {"width": 200, "height": 150},
-                "style": {
-                    "fill": "#ffeb3b",
-                    "stroke": "#f9a825",
-                    "strokeWidth": 1,
-                    "cornerRadius": 5
-                },
-                "zIndex": 0,
-                "boardId": board_id
-            })
-            
-        if "shape" in text.lower() or "rectangle" in text.lower():
-            # Generate a rectangle
-            elements.append({
-                "type": "shape",
-                "content": {"shape": "rectangle"},
-                "position": {"x": 350, "y": 100},
-                "size": {"width": 150, "height": 150},
-                "style": {
-                    "fill": "#a29bfe",
-                    "stroke": "#6c5ce7",
-                    "strokeWidth": 1,
-                    "cornerRadius": 5
-                },
-                "zIndex": 0,
-                "boardId": board_id
-            })
-            
-        if "circle" in text.lower():
-            # Generate a circle
-            elements.append({
-                "type": "shape",
-                "content": {"shape": "circle"},
-                "position": {"x": 550, "y": 100},
-                "size": {"width": 100, "height": 100},
-                "style": {
-                    "fill": "#fd79a8",
-                    "stroke": "#e84393",
-                    "strokeWidth": 1
-                },
-                "zIndex": 0,
-                "boardId": board_id
-            })
-            
-        if "text" in text.lower():
-            # Generate text element
-            elements.append({
-                "type": "text",
-                "content": {"text": text},
-                "position": {"x": 100, "y": 300},
-                "size": {"width": 300, "height": 50},
-                "style": {
-                    "fontSize": 18,
-                    "fill": "#333333"
-                },
-                "zIndex": 0,
-                "boardId": board_id
-            })
             
-        # If no specific elements were mentioned, create a default set
-        if not elements:
-            # Generate a default sticky note with the text content
-            elements.append({
-                "type": "sticky-note",
-                "content": {"text": text},
-                "position": {"x": 100, "y": 100},
-                "size": {"width": 200, "height": 150},
-                "style": {
-                    "fill": "#ffeb3b",
-                    "stroke": "#f9a825",
-                    "strokeWidth": 1,
-                    "cornerRadius": 5
-                },
-                "zIndex": 0,
-                "boardId": board_id
-            })
-        
+        Raises:
+            LLMTimeoutError: If the model call exceeds AI_TIMEOUT
+        """
+        elements = await llm_client.generate_elements(text)
+        for element in elements:
+            element["boardId"] = board_id
         return elements
+    
+    @staticmethod
+    async def stream_elements_from_text(
+        text: str,
+        board_id: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Like generate_elements_from_text, but yield each element as soon as the model produces it.
+        
+        Raises:
+            LLMTimeoutError: If generation does not finish within AI_TIMEOUT
+        """
+        async for element in llm_client.stream_elements(text):
+            element["boardId"] = board_id
+            yield element
         
     @staticmethod
-    async def analyze_board(
-        board_elements: List[Dict[str, Any]]
-    ) -> Dict[str, Any]:
+    async def analyze_board(board_id: str) -> Optional[Dict[str, Any]]:
         """
         Analyze a board and provide insights
         
+        Derived element features are cached per board, so only elements changed
+        since the last analysis are re-processed.
+        
         Args:
-            board_elements: List of elements on the board
+            board_id: ID of the board to analyze
             
         Returns:
-            Analysis results
+            Analysis results with the board features they were based on, or None if the board does not exist
         """
-        # This would be implemented with a real AI in production
-        return {
-            "summary": "This board contains various elements for brainstorming",
-            "suggestions": [
-                "Consider grouping related sticky notes",
-                "Try adding more visual elements"
-            ]
-        }
+        report = await analysis_engine.analyze(board_id)
+        if report is None:
+            return None
+        analysis = await llm_client.analyze_board(describe_board(report))
+        return {**analysis, "features": report}
@@ -0,0 +1,295 @@
+# Incremental board analysis over cached per-element features
+
+import os
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Change from relative to absolute imports
+from services.board_state import IncrementalBoardEngine, IncrementalBoardState
+
+# Notes whose centers fall in the same or neighbouring grid cells of this size are grouped
+CLUSTER_DISTANCE = float(os.environ.get("ANALYSIS_CLUSTER_DISTANCE", "300"))
+# Element types that take part in clustering
+CLUSTERED_TYPES = ("sticky-note",)
+# Texts reported per cluster so the model can name it
+CLUSTER_SAMPLE_SIZE = 5
+
+@dataclass(frozen=True)
+class ElementFeatures:
+    """Everything the analysis needs from one element, derived once per updatedAt"""
+    updated_at: datetime
+    type: str
+    text: str
+    word_count: int
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    # Children of groups and frames are positioned relative to their parent
+    top_level: bool = True
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def extract_features(element: Any) -> ElementFeatures:
+    content = element.content or {}
+    text = content.get("text") if isinstance(content, dict) else None
+    text = normalize_text(text) if isinstance(text, str) else ""
+    width, height = element.width or 0.0, element.height or 0.0
+    return ElementFeatures(
+        updated_at=element.updatedAt,
+        type=element.type,
+        text=text,
+        word_count=len(text.split()),
+        x0=element.x,
+        y0=element.y,
+        x1=element.x + width,
+        y1=element.y + height,
+        top_level=getattr(element, "parentId", None) is None
+    )
+
+def _connected_components(count: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Label nodes 0..count-1 by component given undirected edges a[i]-b[i]"""
+    labels = np.arange(count)
+    while True:
+        merged = labels.copy()
+        np.minimum.at(merged, a, labels[b])
+        np.minimum.at(merged, b, labels[a])
+        # Pointer jumping: follow each label to its own label until stable
+        merged = merged[merged]
+        if np.array_equal(merged, labels):
+            return labels
+        labels = merged
+
+def cluster_points(points: np.ndarray, distance: float) -> np.ndarray:
+    """
+    Group 2D points whose grid cells (of side distance) touch, including diagonally.
+
+    Returns a component label per point. Cost is O(n log n) for n points; no
+    pairwise distance matrix is built.
+    """
+    if len(points) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    cells = np.floor(points / distance).astype(np.int64)
+    cells -= cells.min(axis=0)
+    # One padding cell on each side of y keeps neighbour keys from wrapping into another row
+    stride = int(cells[:, 1].max()) + 3
+    keys = (cells[:, 0] + 1) * stride + (cells[:, 1] + 1)
+    unique_keys, cell_of_point = np.unique(keys, return_inverse=True)
+
+    edges_a, edges_b = [], []
+    for dx, dy in ((1, -1), (1, 0), (1, 1), (0, 1)):
+        neighbours = unique_keys + dx * stride + dy
+        positions = np.searchsorted(unique_keys, neighbours)
+        positions[positions == len(unique_keys)] = 0
+        found = unique_keys[positions] == neighbours
+        edges_a.append(np.nonzero(found)[0])
+        edges_b.append(positions[found])
+
+    cell_labels = _connected_components(len(unique_keys), np.concatenate(edges_a), np.concatenate(edges_b))
+    return cell_labels[cell_of_point]
+
+class BoardAnalysisState(IncrementalBoardState):
+    """
+    Derived features for one board, updated from element changes.
+
+    Type and word counts are maintained per change; bounds and clusters are
+    recomputed with NumPy only when some element's geometry changed. Only
+    top-level elements have board coordinates, so only they count towards
+    bounds and clusters.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.features: Dict[str, ElementFeatures] = {}
+        self.type_counts: Counter = Counter()
+        self.word_count = 0
+        # Dense geometry rows, kept in step with features so clustering never rebuilds them
+        self._ids: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._boxes = np.empty((0, 4), dtype=np.float64)
+        self._clustered = np.empty(0, dtype=bool)
+        self._top = np.empty(0, dtype=bool)
+        self._geometry: Optional[Dict[str, Any]] = None
+        self._report: Optional[Dict[str, Any]] = None
+
+    def _add(self, element_id: str, features: ElementFeatures) -> None:
+        self.features[element_id] = features
+        self.type_counts[features.type] += 1
+        self.word_count += features.word_count
+
+        slot = self._slots.get(element_id)
+        if slot is None:
+            slot = len(self._ids)
+            if slot == len(self._boxes):
+                capacity = max(64, 2 * slot)
+                self._boxes = np.resize(self._boxes, (capacity, 4))
+                self._clustered = np.resize(self._clustered, capacity)
+                self._top = np.resize(self._top, capacity)
+            self._ids.append(element_id)
+            self._slots[element_id] = slot
+        self._boxes[slot] = (features.x0, features.y0, features.x1, features.y1)
+        self._clustered[slot] = features.type in CLUSTERED_TYPES and features.top_level
+        self._top[slot] = features.top_level
+
+    def _remove(self, element_id: str, keep_slot: bool = False) -> Optional[ElementFeatures]:
+        old = self.features.pop(element_id, None)
+        if old is None:
+            return None
+        self.type_counts[old.type] -= 1
+        if not self.type_counts[old.type]:
+            del self.type_counts[old.type]
+        self.word_count -= old.word_count
+
+        if not keep_slot:
+            # Move the last row into the freed slot
+            slot = self._slots.pop(element_id)
+            last_id = self._ids.pop()
+            if last_id != element_id:
+                self._ids[slot] = last_id
+                self._slots[last_id] = slot
+                self._boxes[slot] = self._boxes[len(self._ids)]
+                self._clustered[slot] = self._clustered[len(self._ids)]
+                self._top[slot] = self._top[len(self._ids)]
+        return old
+
+    def apply(self, revision: int, upserts: Iterable[Any] = (), deletes: Iterable[str] = ()) -> int:
+        """Fold element changes into the state and return how many elements were recomputed"""
+        recomputed = 0
+        for element in upserts:
+            current = self.features.get(element.id)
+            if current is not None and current.updated_at == element.updatedAt:
+                continue
+            features = extract_features(element)
+            old = self._remove(element.id, keep_slot=True)
+            self._add(element.id, features)
+            recomputed += 1
+            if old is None or (old.x0, old.y0, old.x1, old.y1, old.type, old.top_level) != (
+                features.x0, features.y0, features.x1, features.y1, features.type, features.top_level
+            ):
+                self._geometry = None
+            self._report = None
+
+        for element_id in deletes:
+            if self._remove(element_id) is not None:
+                self._geometry = None
+                self._report = None
+
+        if revision > self.revision:
+            self.revision = revision
+            self._report = None
+        return recomputed
+
+    def rebuild(self, revision: int, elements: Iterable[Any]) -> int:
+        """Replace the state with a full element list, reusing features whose updatedAt is unchanged"""
+        previous = self.features
+        self.features, self.type_counts, self.word_count = {}, Counter(), 0
+        self._ids, self._slots = [], {}
+        self._geometry = self._report = None
+
+        recomputed = 0
+        for element in elements:
+            features = previous.get(element.id)
+            if features is None or features.updated_at != element.updatedAt:
+                features = extract_features(element)
+                recomputed += 1
+            self._add(element.id, features)
+
+        self.loaded = True
+        self.revision = revision
+        return recomputed
+
+    def _compute_geometry(self) -> Dict[str, Any]:
+        ids = self._ids
+        if not ids:
+            return {"bounds": None, "clusters": [], "unclusteredNotes": 0}
+
+        boxes = self._boxes[:len(ids)]
+        clustered = self._clustered[:len(ids)]
+        top_boxes = boxes[self._top[:len(ids)]]
+        bounds = {
+            "x0": float(top_boxes[:, 0].min()), "y0": float(top_boxes[:, 1].min()),
+            "x1": float(top_boxes[:, 2].max()), "y1": float(top_boxes[:, 3].max()),
+        } if len(top_boxes) else None
+
+        note_index = np.nonzero(clustered)[0]
+        note_boxes = boxes[note_index]
+        centers = (note_boxes[:, :2] + note_boxes[:, 2:]) / 2
+        labels = cluster_points(centers, CLUSTER_DISTANCE)
+
+        clusters = []
+        unclustered = 0
+        if len(labels):
+            order = np.argsort(labels, kind="stable")
+            sorted_labels = labels[order]
+            starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+            sizes = np.diff(np.r_[starts, len(order)])
+            sorted_boxes = note_boxes[order]
+            lows = np.minimum.reduceat(sorted_boxes[:, :2], starts)
+            highs = np.maximum.reduceat(sorted_boxes[:, 2:], starts)
+            members = note_index[order].tolist()
+
+            grouped = sizes >= 2
+            unclustered = int(np.count_nonzero(~grouped))
+            for start, size, (x0, y0), (x1, y1) in zip(
+                starts[grouped].tolist(), sizes[grouped].tolist(), lows[grouped].tolist(), highs[grouped].tolist()
+            ):
+                clusters.append({
+                    "elementIds": [ids[i] for i in members[start:start + size]],
+                    "bounds": {"x0": x0, "y0": y0, "x1": x1, "y1": y1},
+                })
+            clusters.sort(key=lambda cluster: len(cluster["elementIds"]), reverse=True)
+
+        return {"bounds": bounds, "clusters": clusters, "unclusteredNotes": unclustered}
+
+    def report(self) -> Dict[str, Any]:
+        """Board-level features, cached until the next change"""
+        if self._report is None:
+            if self._geometry is None:
+                self._geometry = self._compute_geometry()
+            self._report = {
+                "revision": self.revision,
+                "elementCount": len(self.features),
+                "typeCounts": dict(sorted(self.type_counts.items())),
+                "wordCount": self.word_count,
+                **self._geometry,
+                "clusters": [
+                    {**cluster, "sampleText": self._sample_text(cluster["elementIds"])}
+                    for cluster in self._geometry["clusters"]
+                ],
+            }
+        return self._report
+
+    def _sample_text(self, element_ids: List[str], limit: int = CLUSTER_SAMPLE_SIZE) -> List[str]:
+        texts = (self.features[element_id].text for element_id in element_ids)
+        return list(islice(filter(None, texts), limit))
+
+class BoardAnalysisEngine(IncrementalBoardEngine):
+    """Keeps one BoardAnalysisState per recently analysed board and refreshes it from revisions"""
+
+    state_class = BoardAnalysisState
+
+    def __init__(self, max_boards: int = 64, ttl: float = 3600.0):
+        super().__init__(max_boards, ttl)
+
+    async def analyze(self, board_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the board's feature report, re-deriving only elements changed
+        since the previous analysis.
+
+        Returns:
+            The report, or None if the board does not exist
+        """
+        return await self.read(board_id, BoardAnalysisState.report)
+
+analysis_engine = BoardAnalysisEngine(
+    max_boards=int(os.environ.get("ANALYSIS_CACHE_BOARDS", "64")),
+    ttl=float(os.environ.get("ANALYSIS_CACHE_TTL", "3600"))
+)
@@ -1,33 +1,121 @@
 # Board service for handling board operations
 
-from typing import List, Optional
+import base64
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
 from prisma.errors import PrismaError
 from prisma.models import Board, BoardElement
 
 # Change from relative to absolute imports
 from db.client import prisma
+from db.routing import reader
+from services.access_service import BoardAccessService
+from services.operation_log import SNAPSHOT_INTERVAL, write_snapshot
+from utils.http_cache import response_cache
+from utils.metrics import record_elements
+
+logger = logging.getLogger(__name__)
+
+# Delta sync keeps at least this many revisions of delete history per board
+HISTORY_RETENTION_REVISIONS = int(os.environ.get("HISTORY_RETENTION_REVISIONS", "10000"))
+# Tombstones are compacted once the history grows this far past the retention window
+HISTORY_COMPACTION_INTERVAL = 1000
+
+# Board listing page sizes
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def encode_board_cursor(board: Board) -> str:
+    """Encode a board's (updatedAt, id) sort key as an opaque cursor"""
+    raw = json.dumps([board.updatedAt.isoformat(), board.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_board_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor from encode_board_cursor, raising ValueError if it is malformed"""
+    try:
+        updated_at, board_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(updated_at), str(board_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
 class BoardService:
     @staticmethod
-    async def get_all_boards(user_id: str) -> List[Board]:
-        """Get all boards for a user"""
-        return await prisma.board.find_many(
-            where={"userId": user_id},
-            order={"updatedAt": "desc"}
+    async def get_all_boards(
+        user_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Board], Optional[str]]:
+        """
+        Get a page of a user's boards, most recently updated first.
+        
+        Args:
+            user_id: Owner of the boards
+            limit: Page size, capped at MAX_PAGE_SIZE
+            cursor: Cursor returned with the previous page, if any
+            
+        Returns:
+            The boards and the cursor for the next page (None on the last page)
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        where_clause: Dict[str, Any] = {"userId": user_id}
+        if cursor:
+            updated_at, board_id = decode_board_cursor(cursor)
+            # Keyset on (updatedAt, id) so deep pages cost the same as the first
+            where_clause["OR"] = [
+                {"updatedAt": {"lt": updated_at}},
+                {"updatedAt": updated_at, "id": {"lt": board_id}},
+            ]
+        
+        boards = await reader().board.find_many(
+            where=where_clause,
+            order=[{"updatedAt": "desc"}, {"id": "desc"}],
+            take=limit + 1
+        )
+        next_cursor = encode_board_cursor(boards[limit - 1]) if len(boards) > limit else None
+        return boards[:limit], next_cursor
+    
+    @staticmethod
+    async def get_board_stats(board_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get element counts and last element edit times for boards in one grouped query"""
+        stats = {board_id: {"elementCount": 0, "lastEditedAt": None} for board_id in board_ids}
+        if not board_ids:
+            return stats
+        
+        groups = await reader().boardelement.group_by(
+            by=["boardId"],
+            where={"boardId": {"in": board_ids}},
+            count={"_all": True},
+            max={"updatedAt": True}
         )
+        for group in groups:
+            stats[group["boardId"]] = {
+                "elementCount": group["_count"]["_all"],
+                "lastEditedAt": group["_max"]["updatedAt"],
+            }
+        return stats
     
     @staticmethod
-    async def get_board_by_id(board_id: str, user_id: Optional[str] = None) -> Optional[Board]:
+    async def get_board_by_id(
+        board_id: str,
+        user_id: Optional[str] = None,
+        include_elements: bool = False
+    ) -> Optional[Board]:
         """Get a board by ID, optionally filtering by user_id"""
         where_clause = {"id": board_id}
         if user_id:
             where_clause["userId"] = user_id
             
-        return await prisma.board.find_first(
+        board = await reader().board.find_first(
             where=where_clause,
-            include={"elements": True}
+            include={"elements": True} if include_elements else None
         )
+        if board and include_elements:
+            record_elements(len(board.elements or []))
+        return board
     
     @staticmethod
     async def create_board(user_id: str, title: str, description: Optional[str] = None) -> Board:
@@ -40,21 +128,88 @@ class BoardService:
                     "description": description
                 }
             )
-        except PrismaError as e:
-            print(f"Database error creating board: {str(e)}")
+        except PrismaError:
+            logger.exception("Database error creating board for user %s", user_id)
             raise
     
+    @staticmethod
+    async def duplicate_board(board_id: str, user_id: str, title: Optional[str] = None) -> Optional[Board]:
+        """
+        Copy a board and all of its elements without pulling them into Python.
+        
+        Elements are copied with a single INSERT ... SELECT that assigns new IDs
+        and points parentId and connector fromElementId/toElementId at the
+        copied elements.
+        
+        Args:
+            board_id: ID of the board to copy
+            user_id: Owner of the source board and of the copy
+            title: Title for the copy, defaulting to "<title> (copy)"
+            
+        Returns:
+            The new board, or None if the source board was not found
+        """
+        source = await prisma.board.find_first(where={"id": board_id, "userId": user_id})
+        if not source:
+            return None
+        
+        async with prisma.tx() as transaction:
+            board = await transaction.board.create(
+                data={
+                    "userId": user_id,
+                    "title": title or f"{source.title} (copy)",
+                    "description": source.description,
+                    "revision": 1
+                }
+            )
+            await transaction.execute_raw(
+                '''
+                WITH mapping AS (
+                    SELECT "id" AS old_id, gen_random_uuid()::text AS new_id
+                    FROM "BoardElement"
+                    WHERE "boardId" = $1
+                )
+                INSERT INTO "BoardElement" (
+                    "id", "type", "content", "style", "zIndex",
+                    "x", "y", "width", "height", "revision", "boardId", "parentId", "createdAt", "updatedAt"
+                )
+                SELECT
+                    m.new_id,
+                    e."type",
+                    CASE WHEN f.new_id IS NULL AND t.new_id IS NULL THEN e."content"
+                    ELSE e."content"
+                        || CASE WHEN f.new_id IS NULL THEN '{}'::jsonb
+                                ELSE jsonb_build_object('fromElementId', f.new_id) END
+                        || CASE WHEN t.new_id IS NULL THEN '{}'::jsonb
+                                ELSE jsonb_build_object('toElementId', t.new_id) END
+                    END,
+                    e."style", e."zIndex", e."x", e."y", e."width", e."height",
+                    1, $2, p.new_id, now(), now()
+                FROM "BoardElement" e
+                JOIN mapping m ON m.old_id = e."id"
+                LEFT JOIN mapping p ON p.old_id = e."parentId"
+                LEFT JOIN mapping f ON e."type" = 'connector' AND f.old_id = e."content"->>'fromElementId'
+                LEFT JOIN mapping t ON e."type" = 'connector' AND t.old_id = e."content"->>'toElementId'
+                ''',
+                board_id, board.id
+            )
+            # The copy's history starts here rather than replaying the source's log
+            await write_snapshot(transaction, board.id)
+        return board
+    
     @staticmethod
     async def update_board(board_id: str, user_id: str, data: dict) -> Optional[Board]:
         """Update a board"""
         try:
-            return await prisma.board.update(
+            board = await prisma.board.update(
                 where={
                     "id": board_id,
                     "userId": user_id,
                 },
                 data=data
             )
+            response_cache.invalidate_board(board_id)
+            return board
         except PrismaError:
             return None
     
@@ -68,6 +223,89 @@ class BoardService:
                     "userId": user_id,
                 }
             )
+            BoardAccessService.invalidate_board(board_id)
+            response_cache.invalidate_board(board_id)
             return True
         except PrismaError:
             return False
+    
+    @staticmethod
+    async def bump_revision(board_id: str, client=prisma) -> Board:
+        """Increment a board's revision, returning the updated board"""
+        return await client.board.update(
+            where={"id": board_id},
+            data={"revision": {"increment": 1}}
+        )
+    
+    @staticmethod
+    async def compact_history_if_needed(board: Board) -> None:
+        """Drop tombstones older than the retention window once enough have accumulated"""
+        if board.revision - board.compactedRevision < HISTORY_RETENTION_REVISIONS + HISTORY_COMPACTION_INTERVAL:
+            return
+        
+        compact_to = board.revision - HISTORY_RETENTION_REVISIONS
+        async with prisma.tx() as transaction:
+            await transaction.boardelementtombstone.delete_many(
+                where={"boardId": board.id, "revision": {"lte": compact_to}}
+            )
+            await transaction.board.update(
+                where={"id": board.id},
+                data={"compactedRevision": compact_to}
+            )
+    
+    @staticmethod
+    async def snapshot_if_needed(board: Board) -> None:
+        """Snapshot the board once SNAPSHOT_INTERVAL revisions have been logged since the last one"""
+        if board.revision - board.snapshotRevision < SNAPSHOT_INTERVAL:
+            return
+        
+        async with prisma.tx() as transaction:
+            # Lock the board row so no element write can land between reading the rows and the revision
+            rows = await transaction.query_raw(
+                'SELECT "revision", "snapshotRevision" FROM "Board" WHERE "id" = $1 FOR UPDATE',
+                board.id
+            )
+            if rows and rows[0]["revision"] - rows[0]["snapshotRevision"] >= SNAPSHOT_INTERVAL:
+                await write_snapshot(transaction, board.id)
+    
+    @staticmethod
+    async def get_changes(board_id: str, since: int, client=None) -> Optional[Dict[str, Any]]:
+        """
+        Get the element changes made to a board after a revision.
+        
+        Args:
+            board_id: ID of the board
+            since: Last revision the client has applied
+            client: Database client to read from; defaults to reader()
+            
+        Returns:
+            The board's current revision, upserted elements and deleted element IDs,
+            with resync set when history before `since` has been compacted away
+        """
+        # One client for every query, so the revision and the rows come from the same database
+        client = client or reader()
+        board = await client.board.find_unique(where={"id": board_id})
+        if not board:
+            return None
+        
+        changes = {
+            "boardId": board_id,
+            "revision": board.revision,
+            "resync": since < board.compactedRevision,
+            "upserts": [],
+            "deletes": [],
+        }
+        if changes["resync"] or since >= board.revision:
+            return changes
+        
+        changes["upserts"] = await client.boardelement.find_many(
+            where={"boardId": board_id, "revision": {"gt": since}},
+            order={"revision": "asc"}
+        )
+        tombstones = await client.boardelementtombstone.find_many(
+            where={"boardId": board_id, "revision": {"gt": since}},
+            order={"revision": "asc"}
+        )
+        changes["deletes"] = [tombstone.elementId for tombstone in tombstones]
+        record_elements(len(changes["upserts"]))
+        return changes
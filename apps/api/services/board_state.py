@@ -0,0 +1,90 @@
+# Per-board state derived from elements and kept current from board revisions
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Iterable, Optional, Type
+
+# Change from relative to absolute imports
+from db.routing import reader
+from services.board_service import BoardService
+from utils.cache import TTLCache
+
+class IncrementalBoardState(ABC):
+    """
+    State derived from one board's elements.
+
+    Subclasses implement rebuild() from a full element list and apply() for
+    the changes since the last revision; IncrementalBoardEngine picks which.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.revision = 0
+        self.lock = asyncio.Lock()
+
+    @abstractmethod
+    def apply(self, revision: int, upserts: Iterable[Any] = (), deletes: Iterable[str] = ()) -> int:
+        """Fold element changes into the state and return how many elements changed"""
+
+    @abstractmethod
+    def rebuild(self, revision: int, elements: Iterable[Any]) -> Any:
+        """Replace the state with a full element list, then set loaded and revision"""
+
+class IncrementalBoardEngine:
+    """
+    Keeps one state per recently used board and brings it up to the board's
+    revision before every read.
+
+    A cold state is rebuilt from a single element query; a warm one applies
+    only the change feed since its revision, or rebuilds when that history
+    has been compacted away.
+    """
+
+    state_class: Type[IncrementalBoardState]
+
+    def __init__(self, max_boards: int, ttl: float):
+        self._states = TTLCache(max_size=max_boards, ttl=ttl)
+
+    async def read(self, board_id: str, query: Callable[[Any], Any]) -> Optional[Any]:
+        """
+        Refresh a board's state and run query on it while holding the state's lock.
+
+        Returns:
+            The query's result, or None if the board does not exist
+        """
+        state = self._states.get(board_id)
+        if state is None:
+            state = self.state_class()
+            self._states.set(board_id, state)
+
+        async with state.lock:
+            if not await self._refresh(board_id, state):
+                self._states.pop(board_id)
+                return None
+            return query(state)
+
+    async def _refresh(self, board_id: str, state: IncrementalBoardState) -> bool:
+        # One client for every query, so the revision and the rows come from the same database
+        client = reader()
+        if state.loaded:
+            changes = await BoardService.get_changes(board_id, state.revision, client=client)
+            if changes is None:
+                return False
+            if not changes["resync"]:
+                state.apply(changes["revision"], changes["upserts"], changes["deletes"])
+                return True
+            revision = changes["revision"]
+        else:
+            # Not the change feed: from revision 0 it would load every element just to be thrown away
+            board = await client.board.find_unique(where={"id": board_id})
+            if board is None:
+                return False
+            revision = board.revision
+
+        # The revision was read before the rows, so anything newer is just re-applied next time
+        elements = await client.boardelement.find_many(where={"boardId": board_id})
+        state.rebuild(revision, elements)
+        return True
+
+    def forget(self, board_id: str) -> None:
+        self._states.pop(board_id)
@@ -1,26 +1,322 @@
 # Board element service for handling elements on boards
 
-from typing import List, Optional, Dict, Any
+import json
+import logging
+import os
+from typing import List, Optional, Dict, Any, Iterable, Set
+from uuid import uuid4
 
 from prisma.errors import PrismaError
 from prisma.models import BoardElement
 
 # Change from relative to absolute imports
 from db.client import prisma
+from db.routing import reader
+from services.board_service import BoardService
+from services.operation_log import (
+    ACTION_EDIT,
+    ELEMENT_STATE_SQL,
+    OP_CREATE,
+    OP_DELETE,
+    OP_NOOP,
+    create_entry,
+    delete_entry,
+    element_state,
+    log_statement,
+    update_entry
+)
+from services.realtime import (
+    ELEMENT_CREATED,
+    ELEMENT_DELETED,
+    ELEMENT_UPDATED,
+    board_events
+)
+from services.write_buffer import ElementWriteBuffer
+from utils.http_cache import response_cache
+from utils.metrics import record_elements, register_write_buffer
+
+logger = logging.getLogger(__name__)
+
+# Columns stored as Prisma Json that must be sent as JSON strings
+JSON_FIELDS = ("content", "style")
+# API fields stored as typed geometry columns instead of JSON
+GEOMETRY_FIELDS = ("position", "size")
+# Element types that can hold other elements; children are positioned relative to them
+CONTAINER_TYPES = ("group", "frame")
+# BoardElement columns read by raw queries (everything but the generated search vector)
+ELEMENT_COLUMNS = (
+    "id", "type", "content", "style", "zIndex", "x", "y", "width", "height",
+    "revision", "createdAt", "updatedAt", "boardId", "parentId"
+)
+
+def _columns(alias: str) -> str:
+    return ", ".join(f'{alias}."{column}"' for column in ELEMENT_COLUMNS)
+
+def _serialize_json_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert dict values of Json columns to JSON strings for Prisma"""
+    processed_data = {}
+    for key, value in data.items():
+        if key in JSON_FIELDS and value is not None:
+            processed_data[key] = json.dumps(value)
+        elif key not in GEOMETRY_FIELDS:
+            processed_data[key] = value
+    return processed_data
+
+def _geometry_columns(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Map API position/size dicts onto the x/y/width/height columns"""
+    columns = {}
+    if data.get("position") is not None:
+        columns["x"] = float(data["position"]["x"])
+        columns["y"] = float(data["position"]["y"])
+    if "size" in data:
+        size = data["size"]
+        columns["width"] = float(size["width"]) if size else None
+        columns["height"] = float(size["height"]) if size else None
+    return columns
+
+def prepare_element_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert API element fields to Prisma column values"""
+    return {**_serialize_json_fields(data), **_geometry_columns(data)}
+
+def prepare_element_update(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Like prepare_element_data, for update(), which sets the parent through the relation"""
+    columns = prepare_element_data(data)
+    if "parentId" in columns:
+        parent_id = columns.pop("parentId")
+        columns["parent"] = {"connect": {"id": parent_id}} if parent_id else {"disconnect": True}
+    return columns
+
+def _with_buffered_geometry(element: Optional[BoardElement]) -> Optional[BoardElement]:
+    """Apply geometry still held in the write buffer to an element read from the database"""
+    if element is None:
+        return None
+    changes = element_write_buffer.pending_changes(element.id)
+    if not changes:
+        return element
+    return element.model_copy(update=_geometry_columns(changes))
+
+async def _existing_elements(
+    element_ids: Iterable[str],
+    board_id: Optional[str] = None,
+    client=None
+) -> Dict[str, BoardElement]:
+    """Load which of the given element IDs exist, optionally restricted to one board"""
+    element_ids = list(set(element_ids))
+    if not element_ids:
+        return {}
+
+    where_clause = {"id": {"in": element_ids}}
+    if board_id:
+        where_clause["boardId"] = board_id
+
+    rows = await (client or prisma).boardelement.find_many(where=where_clause)
+    return {row.id: row for row in rows}
+
+async def _parent_errors(
+    board_id: str,
+    links: Dict[str, Optional[str]],
+    pending_types: Optional[Dict[str, str]] = None,
+    client=prisma
+) -> Dict[str, str]:
+    """
+    Check requested parent links (element ID -> new parent ID, None for top level).
+
+    A parent must be a group or frame on the same board, and an element cannot
+    be moved under itself or one of its descendants. pending_types holds the
+    types of elements created by the same write.
+
+    Returns:
+        An error message per rejected element ID
+    """
+    pending_types = pending_types or {}
+    types: Dict[str, str] = dict(pending_types)
+    parent_of: Dict[str, Optional[str]] = {}
+    targets = list({parent_id for parent_id in links.values() if parent_id and parent_id not in pending_types})
+    if targets:
+        # The new parents and all of their ancestors, in one recursive query
+        rows = await client.query_raw(
+            '''
+            WITH RECURSIVE chain AS (
+                SELECT "id", "parentId", "type" FROM "BoardElement"
+                WHERE "id" = ANY($1::text[]) AND "boardId" = $2
+                UNION
+                SELECT e."id", e."parentId", e."type"
+                FROM "BoardElement" e JOIN chain c ON e."id" = c."parentId"
+            )
+            SELECT "id", "parentId", "type" FROM chain
+            ''',
+            targets, board_id
+        )
+        for row in rows:
+            types[row["id"]] = row["type"]
+            parent_of[row["id"]] = row["parentId"]
+    parent_of.update(links)
+
+    errors = {}
+    for element_id, parent_id in links.items():
+        if parent_id is None:
+            continue
+        if types.get(parent_id) not in CONTAINER_TYPES:
+            errors[element_id] = f"Parent {parent_id} is not a group or frame on this board"
+            continue
+        # Walk up from the new parent; meeting the element itself would close a cycle
+        seen: Set[str] = set()
+        node = parent_id
+        while node is not None and node not in seen:
+            if node == element_id:
+                errors[element_id] = "An element cannot be moved into itself or one of its descendants"
+                break
+            seen.add(node)
+            node = parent_of.get(node)
+
+    # Children of rejected new elements would be left pointing at nothing
+    rejected = True
+    while rejected:
+        rejected = False
+        for element_id, parent_id in links.items():
+            if element_id not in errors and parent_id in errors and parent_id in pending_types:
+                errors[element_id] = f"Parent {parent_id} was not created"
+                rejected = True
+    return errors
+
+async def _descendants(board_id: str, element_ids: List[str], client=None) -> List[BoardElement]:
+    """All elements below the given ones in the group/frame hierarchy"""
+    return await (client or prisma).query_raw(
+        f'''
+        WITH RECURSIVE subtree AS (
+            SELECT {_columns("c")} FROM "BoardElement" c
+            WHERE c."parentId" = ANY($1::text[]) AND c."boardId" = $2
+            UNION ALL
+            SELECT {_columns("c")} FROM "BoardElement" c JOIN subtree s ON c."parentId" = s."id"
+        )
+        SELECT * FROM subtree
+        ''',
+        element_ids, board_id,
+        model=BoardElement
+    )
+
+async def _lock_boards(client, board_ids: Iterable[str]) -> None:
+    """
+    Lock board rows until the transaction ends.
+
+    Element writers bump the board first, so once its row is locked the
+    elements read in the same transaction are the before-images no other
+    writer can change before this one commits. Rows are locked in ID order so
+    two writers on the same boards cannot deadlock.
+    """
+    await client.query_raw(
+        'SELECT "id" FROM "Board" WHERE "id" = ANY($1::text[]) ORDER BY "id" FOR UPDATE',
+        sorted(set(board_ids))
+    )
+
+def _queue_revision_bump(batcher, board_id: str) -> None:
+    """
+    Queue a board revision bump at the start of a batch.
+
+    The bump goes first so the board row stays locked until the batch commits,
+    which keeps revision order equal to commit order for concurrent writers.
+    """
+    batcher.board.update(where={"id": board_id}, data={"revision": {"increment": 1}})
+
+def _queue_revision_stamps(batcher, board_id: str, written_ids: List[str], deleted_ids: List[str]) -> None:
+    """Stamp written elements and record tombstones with the board's bumped revision"""
+    if written_ids:
+        batcher.execute_raw(
+            '''
+            UPDATE "BoardElement"
+            SET "revision" = (SELECT "revision" FROM "Board" WHERE "id" = $1)
+            WHERE "id" = ANY($2::text[])
+            ''',
+            board_id, written_ids
+        )
+    if deleted_ids:
+        batcher.execute_raw(
+            '''
+            INSERT INTO "BoardElementTombstone" ("id", "elementId", "boardId", "revision", "deletedAt")
+            SELECT gen_random_uuid()::text, deleted_id, $1,
+                   (SELECT "revision" FROM "Board" WHERE "id" = $1), now()
+            FROM unnest($2::text[]) AS deleted_id
+            ''',
+            board_id, deleted_ids
+        )
 
 class BoardElementService:
     @staticmethod
     async def get_elements_by_board_id(board_id: str) -> List[BoardElement]:
         """Get all elements for a board"""
-        return await prisma.boardelement.find_many(
+        elements = await reader().boardelement.find_many(
             where={"boardId": board_id},
             order={"zIndex": "asc"}
         )
+        record_elements(len(elements))
+        return [_with_buffered_geometry(element) for element in elements]
+    
+    @staticmethod
+    async def get_elements_in_bbox(
+        board_id: str,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float
+    ) -> List[BoardElement]:
+        """
+        Get the elements of a board whose bounding box intersects a viewport rectangle.
+
+        Child positions are relative to their parent, so only top-level elements
+        are tested against the viewport; each one that intersects brings its
+        whole subtree along.
+        """
+        # The && overlap test is served by the GiST index on (boardId, box(...))
+        elements = await reader().query_raw(
+            f'''
+            WITH RECURSIVE visible AS (
+                SELECT {_columns("e")} FROM "BoardElement" e
+                WHERE e."boardId" = $1 AND e."parentId" IS NULL
+                  AND box(point(e."x", e."y"), point(e."x" + COALESCE(e."width", 0), e."y" + COALESCE(e."height", 0)))
+                      && box(point($2::float8, $3::float8), point($4::float8, $5::float8))
+                UNION ALL
+                SELECT {_columns("c")} FROM "BoardElement" c JOIN visible v ON c."parentId" = v."id"
+            )
+            SELECT * FROM visible
+            ORDER BY "zIndex" ASC
+            ''',
+            board_id, x0, y0, x1, y1,
+            model=BoardElement
+        )
+        record_elements(len(elements))
+        return [_with_buffered_geometry(element) for element in elements]
     
     @staticmethod
     async def get_element_by_id(element_id: str) -> Optional[BoardElement]:
         """Get an element by ID"""
-        return await prisma.boardelement.find_unique(where={"id": element_id})
+        element = await prisma.boardelement.find_unique(where={"id": element_id})
+        return _with_buffered_geometry(element)
+    
+    @staticmethod
+    def has_buffered_writes(board_id: str) -> bool:
+        """Whether a board has geometry updates not yet written to the database"""
+        return element_write_buffer.has_pending_for_board(board_id)
+    
+    @staticmethod
+    def buffered_elements(board_id: str, elements: Dict[str, BoardElement]) -> List[BoardElement]:
+        """Copies of the given elements (by ID) whose geometry is still in the write buffer, with it applied"""
+        buffered = []
+        for element_id, changes in element_write_buffer.pending_for_board(board_id).items():
+            element = elements.get(element_id)
+            if element is not None:
+                buffered.append(element.model_copy(update=_geometry_columns(changes)))
+        return buffered
+    
+    @staticmethod
+    def accepts_buffered_update(data: dict) -> bool:
+        """Whether an update can go through the write-behind buffer"""
+        return element_write_buffer.accepts(data)
+    
+    @staticmethod
+    def queue_geometry_update(element: BoardElement, data: dict) -> BoardElement:
+        """Buffer a position/size-only update and return the element as readers will now see it"""
+        element_write_buffer.add(element.id, element.boardId, data)
+        return _with_buffered_geometry(element)
     
     @staticmethod
     async def create_element(
@@ -30,91 +326,512 @@ class BoardElementService:
         position: Dict[str, float],
         size: Optional[Dict[str, float]] = None,
         style: Optional[Dict[str, Any]] = None,
-        z_index: int = 0
+        z_index: int = 0,
+        parent_id: Optional[str] = None
     ) -> BoardElement:
-        """Create a new element on a board"""
+        """
+        Create a new element on a board.
+
+        Raises:
+            ValueError: If parent_id is not a group or frame on the board
+        """
+        element_id = str(uuid4())
+        if parent_id:
+            errors = await _parent_errors(board_id, {element_id: parent_id})
+            if errors:
+                raise ValueError(errors[element_id])
         try:
-            import json
-            
             # Convert Python dictionaries to proper JSON strings for Prisma
             content_json = json.dumps(content)
-            position_json = json.dumps(position)
-            
-            # Handle optional fields
-            size_json = json.dumps(size) if size else None
             style_json = json.dumps(style) if style else None
             
-            # Create element with explicit Json field handling
-            element = await prisma.boardelement.create(
-                data={
-                    "board": {"connect": {"id": board_id}},  # Use proper connect syntax
-                    "type": element_type,
-                    "content": content_json,
-                    "position": position_json,
-                    "size": size_json,
-                    "style": style_json,
-                    "zIndex": z_index
-                }
-            )
+            entry = create_entry(element_id, {
+                "type": element_type, "content": content, "position": position,
+                "size": size, "style": style, "zIndex": z_index, "parentId": parent_id
+            })
+            
+            async with prisma.tx() as transaction:
+                board = await BoardService.bump_revision(board_id, client=transaction)
+                
+                # Create element with explicit Json field handling
+                element = await transaction.boardelement.create(
+                    data={
+                        "id": element_id,
+                        "board": {"connect": {"id": board_id}},  # Use proper connect syntax
+                        **({"parent": {"connect": {"id": parent_id}}} if parent_id else {}),
+                        "type": element_type,
+                        "content": content_json,
+                        "style": style_json,
+                        "zIndex": z_index,
+                        "revision": board.revision,
+                        **_geometry_columns({"position": position, "size": size})
+                    }
+                )
+                await transaction.execute_raw(*log_statement(board_id, [entry]))
+            response_cache.invalidate_board(board_id)
+            await BoardService.snapshot_if_needed(board)
+            await board_events.publish(board_id, ELEMENT_CREATED, element)
             return element
-        except Exception as e:
-            print(f"Error in create_element: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
+        except Exception:
+            logger.exception("Error creating element on board %s", board_id)
             raise
     
     @staticmethod
     async def update_element(element_id: str, data: dict) -> Optional[BoardElement]:
-        """Update an element"""
+        """
+        Update an element.
+
+        Raises:
+            ValueError: If a new parentId is not a group or frame on the board,
+                or would put the element inside its own subtree
+        """
         try:
-            import json
-            
-            # Process JSON fields
-            processed_data = {}
-            for key, value in data.items():
-                if key in ['content', 'position', 'size', 'style'] and value is not None:
-                    # Convert dict to JSON string for these fields
-                    processed_data[key] = json.dumps(value)
-                else:
-                    processed_data[key] = value
-            
-            # Update with processed data
-            return await prisma.boardelement.update(
-                where={"id": element_id},
-                data=processed_data
-            )
-        except Exception as e:
-            print(f"Error in update_element: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
+            # Let an in-flight flush land first, and fold in buffered geometry so it
+            # cannot be flushed over this write later
+            await element_write_buffer.settle([element_id])
+            # Taken geometry goes back into the buffer if the write fails
+            with element_write_buffer.taken(element_id) as buffered:
+                data = {**buffered, **data}
+                
+                # Process JSON fields
+                processed_data = prepare_element_update(data)
+                
+                async with prisma.tx() as transaction:
+                    existing = await transaction.boardelement.find_unique(where={"id": element_id})
+                    if not existing:
+                        return None
+                    board = await BoardService.bump_revision(existing.boardId, client=transaction)
+                    # Read again now that the bump serializes writers on this board: the
+                    # first read only found the board, and its before-image may be stale
+                    existing = await transaction.boardelement.find_unique(where={"id": element_id})
+                    if not existing:
+                        return None
+                    if data.get("parentId") and data["parentId"] != existing.parentId:
+                        # Checked after the bump, which serializes writers on this board
+                        errors = await _parent_errors(
+                            existing.boardId, {element_id: data["parentId"]}, client=transaction
+                        )
+                        if errors:
+                            raise ValueError(errors[element_id])
+                
+                    # Update with processed data
+                    element = await transaction.boardelement.update(
+                        where={"id": element_id},
+                        data={**processed_data, "revision": board.revision}
+                    )
+                    entry = update_entry(element_id, element_state(existing), data)
+                    if entry:
+                        await transaction.execute_raw(*log_statement(existing.boardId, [entry]))
+            response_cache.invalidate_board(element.boardId)
+            await BoardService.snapshot_if_needed(board)
+            await board_events.publish(element.boardId, ELEMENT_UPDATED, element)
+            return element
+        except ValueError:
+            raise
+        except Exception:
+            logger.exception("Error updating element %s", element_id)
             return None
     
     @staticmethod
-    async def delete_element(element_id: str) -> bool:
-        """Delete an element"""
+    async def delete_element(element_id: str) -> int:
+        """
+        Delete an element and everything inside it, leaving tombstones for delta sync.
+
+        The subtree is found, deleted, tombstoned and logged (deepest elements
+        first, so undo recreates parents before children) in one statement.
+
+        Returns:
+            The number of elements deleted, 0 if the element does not exist
+        """
         try:
-            await prisma.boardelement.delete(where={"id": element_id})
-            return True
+            async with prisma.tx() as transaction:
+                element = await transaction.boardelement.find_unique(where={"id": element_id})
+                if not element:
+                    return 0
+                board = await BoardService.bump_revision(element.boardId, client=transaction)
+                rows = await transaction.query_raw(
+                    f'''
+                    WITH RECURSIVE subtree AS (
+                        SELECT "id", 0 AS "depth" FROM "BoardElement" WHERE "id" = $1
+                        UNION ALL
+                        SELECT c."id", s."depth" + 1
+                        FROM "BoardElement" c JOIN subtree s ON c."parentId" = s."id"
+                    ),
+                    deleted AS (
+                        DELETE FROM "BoardElement" e USING subtree s
+                        WHERE e."id" = s."id"
+                        RETURNING e."id", s."depth", {ELEMENT_STATE_SQL} - 'id' AS "state"
+                    ),
+                    tombstones AS (
+                        INSERT INTO "BoardElementTombstone" ("id", "elementId", "boardId", "revision", "deletedAt")
+                        SELECT gen_random_uuid()::text, d."id", $2, $3, now() FROM deleted d
+                    ),
+                    logged AS (
+                        INSERT INTO "BoardOperation" (
+                            "id", "boardId", "revision", "seq", "elementId", "op", "before", "after",
+                            "action", "targetRevision", "createdAt"
+                        )
+                        SELECT gen_random_uuid()::text, $2, $3,
+                               ROW_NUMBER() OVER (ORDER BY d."depth" DESC, d."id"), d."id", $4,
+                               d."state", NULL::jsonb, $5, NULL::int, now()
+                        FROM deleted d
+                    )
+                    SELECT "id" FROM deleted
+                    ''',
+                    element_id, element.boardId, board.revision, OP_DELETE, ACTION_EDIT
+                )
         except PrismaError:
-            return False
+            logger.exception("Error deleting element %s", element_id)
+            return 0
+
+        deleted_ids = [row["id"] for row in rows]
+        element_write_buffer.discard(deleted_ids)
+        response_cache.invalidate_board(element.boardId)
+        await BoardService.compact_history_if_needed(board)
+        await BoardService.snapshot_if_needed(board)
+        for deleted_id in deleted_ids:
+            await board_events.publish(element.boardId, ELEMENT_DELETED, element_id=deleted_id)
+        return len(deleted_ids)
+    
+    @staticmethod
+    async def translate_element(element_id: str, dx: float, dy: float) -> Optional[BoardElement]:
+        """
+        Move an element by an offset.
+
+        Children are stored relative to their parent, so moving a group or
+        frame moves its whole subtree with a single-row update.
+        """
+        element = await BoardElementService.get_element_by_id(element_id)
+        if not element:
+            return None
+        return await BoardElementService.update_element(
+            element_id, {"position": {"x": element.x + dx, "y": element.y + dy}}
+        )
     
+    @staticmethod
+    async def copy_subtree(
+        element_id: str,
+        dx: float = 0,
+        dy: float = 0,
+        parent_id: Optional[str] = None
+    ) -> List[BoardElement]:
+        """
+        Copy an element and everything inside it on the same board.
+
+        The copy's root is offset by (dx, dy) and placed under parent_id;
+        descendants keep their relative positions, and connectors between
+        copied elements are rewired to the copies. Everything is inserted and
+        logged (parents first) in one statement.
+
+        Returns:
+            The new elements, the copied root first; empty if the element does not exist
+
+        Raises:
+            ValueError: If parent_id is not a group or frame on the board
+        """
+        source = await prisma.boardelement.find_unique(where={"id": element_id})
+        if not source:
+            return []
+        if parent_id:
+            # Keyed by a fresh ID: copying into the source's own subtree is allowed
+            copy_id = str(uuid4())
+            errors = await _parent_errors(source.boardId, {copy_id: parent_id})
+            if errors:
+                raise ValueError(errors[copy_id])
+
+        async with prisma.tx() as transaction:
+            board = await BoardService.bump_revision(source.boardId, client=transaction)
+            rows = await transaction.query_raw(
+                f'''
+                WITH RECURSIVE subtree AS (
+                    SELECT {_columns("e")}, 0 AS "depth" FROM "BoardElement" e WHERE e."id" = $1
+                    UNION ALL
+                    SELECT {_columns("c")}, s."depth" + 1
+                    FROM "BoardElement" c JOIN subtree s ON c."parentId" = s."id"
+                ),
+                mapping AS (
+                    SELECT "id" AS old_id, gen_random_uuid()::text AS new_id, "depth" FROM subtree
+                ),
+                inserted AS (
+                    INSERT INTO "BoardElement" AS e (
+                        "id", "type", "content", "style", "zIndex", "x", "y", "width", "height",
+                        "revision", "boardId", "parentId", "createdAt", "updatedAt"
+                    )
+                    SELECT m.new_id, s."type",
+                           CASE WHEN s."type" = 'connector'
+                                THEN s."content" || jsonb_strip_nulls(
+                                    jsonb_build_object('fromElementId', f.new_id, 'toElementId', t.new_id)
+                                )
+                                ELSE s."content" END,
+                           s."style", s."zIndex",
+                           s."x" + CASE WHEN s."depth" = 0 THEN $3::float8 ELSE 0 END,
+                           s."y" + CASE WHEN s."depth" = 0 THEN $4::float8 ELSE 0 END,
+                           s."width", s."height", $6, s."boardId",
+                           CASE WHEN s."depth" = 0 THEN $5 ELSE p.new_id END,
+                           now(), now()
+                    FROM subtree s
+                    JOIN mapping m ON m.old_id = s."id"
+                    LEFT JOIN mapping p ON p.old_id = s."parentId"
+                    LEFT JOIN mapping f ON s."type" = 'connector' AND f.old_id = s."content"->>'fromElementId'
+                    LEFT JOIN mapping t ON s."type" = 'connector' AND t.old_id = s."content"->>'toElementId'
+                    RETURNING e."id", {ELEMENT_STATE_SQL} - 'id' AS "state"
+                ),
+                logged AS (
+                    INSERT INTO "BoardOperation" (
+                        "id", "boardId", "revision", "seq", "elementId", "op", "before", "after",
+                        "action", "targetRevision", "createdAt"
+                    )
+                    SELECT gen_random_uuid()::text, $2, $6,
+                           ROW_NUMBER() OVER (ORDER BY m."depth", i."id"), i."id", $7,
+                           NULL::jsonb, i."state", $8, NULL::int, now()
+                    FROM inserted i JOIN mapping m ON m.new_id = i."id"
+                )
+                SELECT i."id" FROM inserted i JOIN mapping m ON m.new_id = i."id"
+                ORDER BY m."depth", i."id"
+                ''',
+                element_id, source.boardId, dx, dy, parent_id, board.revision, OP_CREATE, ACTION_EDIT
+            )
+        new_ids = [row["id"] for row in rows]
+        response_cache.invalidate_board(source.boardId)
+        await BoardService.snapshot_if_needed(board)
+
+        elements_by_id = {
+            element.id: element
+            for element in await prisma.boardelement.find_many(where={"id": {"in": new_ids}})
+        }
+        copies = [elements_by_id[new_id] for new_id in new_ids if new_id in elements_by_id]
+        for element in copies:
+            await board_events.publish(source.boardId, ELEMENT_CREATED, element)
+        return copies
+
     @staticmethod
     async def batch_update_elements(elements: List[Dict[str, Any]]) -> List[BoardElement]:
-        """Update multiple elements in batch"""
-        results = []
+        """Update multiple elements in one transaction, skipping unknown IDs"""
+        requested = [element for element in elements if element.get("id")]
+        # Only finds the boards to lock; the before-images are read again under the locks
+        found = await _existing_elements(element["id"] for element in requested)
+        if not found:
+            return []
+
+        async with prisma.tx() as transaction:
+            await _lock_boards(transaction, (row.boardId for row in found.values()))
+            existing = await _existing_elements(found, client=transaction)
+            updates = [
+                (element["id"], {k: v for k, v in element.items() if k != "id"})
+                for element in requested
+                if element["id"] in existing
+            ]
+            if not updates:
+                return []
+
+            ids_by_board: Dict[str, List[str]] = {}
+            entries_by_board: Dict[str, List[Dict[str, Any]]] = {}
+            states = {element_id: element_state(row) for element_id, row in existing.items()}
+            for element_id, data in updates:
+                board_id = existing[element_id].boardId
+                ids_by_board.setdefault(board_id, []).append(element_id)
+                entry = update_entry(element_id, states[element_id], data)
+                if entry:
+                    entries_by_board.setdefault(board_id, []).append(entry)
+
+            async with transaction.batch_() as batcher:
+                for board_id in ids_by_board:
+                    _queue_revision_bump(batcher, board_id)
+                for element_id, data in updates:
+                    batcher.boardelement.update(where={"id": element_id}, data=prepare_element_data(data))
+                for board_id, element_ids in ids_by_board.items():
+                    _queue_revision_stamps(batcher, board_id, element_ids, [])
+                    if board_id in entries_by_board:
+                        batcher.execute_raw(*log_statement(board_id, entries_by_board[board_id]))
+        for board_id in ids_by_board:
+            response_cache.invalidate_board(board_id)
+        for board in await prisma.board.find_many(where={"id": {"in": list(ids_by_board)}}):
+            await BoardService.snapshot_if_needed(board)
+
+        updated = await prisma.boardelement.find_many(
+            where={"id": {"in": list(existing)}}
+        )
+        for element in updated:
+            await board_events.publish(element.boardId, ELEMENT_UPDATED, element)
+        return updated
+
+    @staticmethod
+    async def create_elements(board_id: str, elements: List[Dict[str, Any]]) -> List[BoardElement]:
+        """Create many elements on a board with one create_many in one transaction"""
+        results = await BoardElementService.apply_batch(
+            board_id,
+            [{"op": "create", "id": None, "data": element} for element in elements]
+        )
+        return [result["element"] for result in results]
+
+    @staticmethod
+    async def apply_batch(
+        board_id: str,
+        operations: List[Dict[str, Any]],
+        action: str = ACTION_EDIT,
+        target_revision: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Apply create, update and delete operations to one board in a single transaction.
         
-        for element in elements:
-            element_id = element.pop("id", None)
-            if not element_id:
-                continue
-                
-            try:
-                updated = await prisma.boardelement.update(
-                    where={"id": element_id},
-                    data=element
+        The whole batch counts as one board revision and is written to the
+        operation log in the same transaction. Deleting a group or frame also
+        deletes everything inside it.
+        
+        Args:
+            board_id: ID of the board every operation targets
+            operations: Dicts with "op" ("create", "update" or "delete"), "id" and "data";
+                creates get a new ID unless one is given
+            action: How the revision is recorded in the log ("edit", "undo" or "redo")
+            target_revision: For undo/redo, the revision being undone or redone
+            
+        Returns:
+            One result dict per operation, in order, with "index", "op", "id", "ok",
+            "element" and "error" keys
+        """
+        results = [
+            {"index": index, "op": operation["op"], "id": operation.get("id"),
+             "ok": False, "element": None, "error": None}
+            for index, operation in enumerate(operations)
+        ]
+        target_ids = [
+            operation["id"] for operation in operations
+            if operation["op"] != "create" and operation.get("id")
+        ]
+        # Buffered positions already being flushed must not land after this batch
+        await element_write_buffer.settle(target_ids)
+        # Buffered changes taken into this batch, put back if it fails
+        taken: Dict[str, Dict[str, Any]] = {}
+        try:
+            async with prisma.tx() as transaction:
+                # Lock first, so the rows read next stay the before-images until this commits
+                await _lock_boards(transaction, [board_id])
+                existing = await _existing_elements(target_ids, board_id=board_id, client=transaction)
+
+                # Parent links are checked together, before anything is written
+                links: Dict[str, Optional[str]] = {}
+                pending_types: Dict[str, str] = {}
+                for result, operation in zip(results, operations):
+                    data = operation.get("data") or {}
+                    if operation["op"] == "create":
+                        result["id"] = result["id"] or str(uuid4())
+                        pending_types[result["id"]] = data.get("type")
+                        if data.get("parentId"):
+                            links[result["id"]] = data["parentId"]
+                    elif operation["op"] == "update" and "parentId" in data and result["id"] in existing:
+                        links[result["id"]] = data["parentId"]
+                parent_errors = (
+                    await _parent_errors(board_id, links, pending_types, client=transaction) if links else {}
                 )
-                results.append(updated)
-            except PrismaError:
-                continue
-                
+
+                creates, updates, deletes = [], [], []
+                entries: List[Dict[str, Any]] = []
+                delete_entries: Dict[str, Dict[str, Any]] = {}
+                states = {element_id: element_state(row) for element_id, row in existing.items()}
+                deleted: Set[str] = set()
+                for result, operation in zip(results, operations):
+                    if result["id"] in parent_errors and operation["op"] != "delete":
+                        result["error"] = parent_errors[result["id"]]
+                        continue
+                    if operation["op"] == "create":
+                        creates.append({
+                            **prepare_element_data(operation["data"]),
+                            "id": result["id"],
+                            "boardId": board_id
+                        })
+                        entries.append(create_entry(result["id"], operation["data"]))
+                    elif result["id"] not in existing or result["id"] in deleted:
+                        result["error"] = f"Element with ID {result['id']} not found on this board"
+                        continue
+                    elif operation["op"] == "update":
+                        taken[result["id"]] = element_write_buffer.take(result["id"])
+                        data = {**taken[result["id"]], **operation["data"]}
+                        updates.append((result["id"], prepare_element_update(data)))
+                        entry = update_entry(result["id"], states[result["id"]], data)
+                        if entry:
+                            entries.append(entry)
+                    else:
+                        taken[result["id"]] = element_write_buffer.take(result["id"])
+                        deletes.append(result["id"])
+                        deleted.add(result["id"])
+                        delete_entries[result["id"]] = delete_entry(result["id"], states[result["id"]])
+                    result["ok"] = True
+
+                cascaded: List[str] = []
+                if deletes:
+                    parents = {element_id: existing[element_id].parentId for element_id in deletes}
+                    for row in await _descendants(board_id, deletes, client=transaction):
+                        parents[row.id] = row.parentId
+                        if row.id not in deleted:
+                            taken[row.id] = element_write_buffer.take(row.id)
+                            deleted.add(row.id)
+                            cascaded.append(row.id)
+                            delete_entries[row.id] = delete_entry(row.id, states.get(row.id) or element_state(row))
+
+                    def depth(element_id: str) -> int:
+                        parent_id = parents.get(element_id)
+                        return depth(parent_id) + 1 if parent_id in deleted else 0
+
+                    # Deepest first, so undo recreates parents before their children
+                    entries.extend(
+                        delete_entries[element_id]
+                        for element_id in sorted(delete_entries, key=depth, reverse=True)
+                    )
+                    deletes.extend(cascaded)
+
+                written_ids = list({r["id"] for r in results if r["ok"] and r["op"] != "delete"} - deleted)
+                # Undo and redo always take a revision, so the log shows they happened even if nothing was left to change
+                changed = bool(creates or updates or deletes) or action != ACTION_EDIT
+                if changed:
+                    async with transaction.batch_() as batcher:
+                        _queue_revision_bump(batcher, board_id)
+                        if creates:
+                            batcher.boardelement.create_many(data=creates)
+                        for element_id, data in updates:
+                            batcher.boardelement.update(where={"id": element_id}, data=data)
+                        if deletes:
+                            batcher.boardelement.delete_many(where={"id": {"in": deletes}})
+                        _queue_revision_stamps(batcher, board_id, written_ids, deletes)
+                        batcher.execute_raw(*log_statement(
+                            board_id,
+                            entries or [{"op": OP_NOOP, "elementId": None, "before": None, "after": None}],
+                            action,
+                            target_revision
+                        ))
+        except BaseException:
+            for element_id, changes in taken.items():
+                element_write_buffer.restore(element_id, board_id, changes)
+            raise
+        if changed:
+            response_cache.invalidate_board(board_id)
+
+            board = await prisma.board.find_unique(where={"id": board_id})
+            if board:
+                if deletes:
+                    await BoardService.compact_history_if_needed(board)
+                await BoardService.snapshot_if_needed(board)
+
+        if written_ids:
+            rows = await prisma.boardelement.find_many(where={"id": {"in": written_ids}})
+            elements_by_id = {row.id: row for row in rows}
+            for result in results:
+                if result["ok"] and result["op"] != "delete":
+                    result["element"] = elements_by_id.get(result["id"])
+
+        event_types = {"create": ELEMENT_CREATED, "update": ELEMENT_UPDATED, "delete": ELEMENT_DELETED}
+        for result in results:
+            if result["ok"]:
+                await board_events.publish(
+                    board_id, event_types[result["op"]], result["element"], element_id=result["id"]
+                )
+        for element_id in cascaded:
+            await board_events.publish(board_id, ELEMENT_DELETED, element_id=element_id)
+
         return results
+
+# Process-wide buffer; flushed by its own timer and on shutdown
+element_write_buffer = ElementWriteBuffer(
+    flush=BoardElementService.batch_update_elements,
+    window=float(os.environ.get("WRITE_BUFFER_WINDOW_MS", "75")) / 1000
+)
+register_write_buffer(element_write_buffer.stats)
@@ -0,0 +1,185 @@
+# Board history: reconstruction at past revisions, undo and redo from the operation log
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from weakref import WeakValueDictionary
+
+# Change from relative to absolute imports
+from db.client import prisma
+from services.element_service import BoardElementService
+from services.operation_log import (
+    ACTION_EDIT,
+    ACTION_REDO,
+    ACTION_UNDO,
+    OP_CREATE,
+    OP_DELETE,
+    OP_UPDATE,
+    replay
+)
+
+# Revision groups read per query while looking for the undo/redo target
+HISTORY_SCAN_PAGE_SIZE = 200
+
+# Serializes undo/redo per board within this process so two requests cannot pick the same target
+_board_locks: "WeakValueDictionary[str, asyncio.Lock]" = WeakValueDictionary()
+
+async def _revision_actions(board_id: str) -> AsyncIterator[Tuple[int, str, Optional[int]]]:
+    """Yield (revision, action, targetRevision) for each logged revision, newest first"""
+    before = 2 ** 31 - 1
+    while True:
+        rows = await prisma.query_raw(
+            '''
+            SELECT DISTINCT "revision", "action", "targetRevision" FROM "BoardOperation"
+            WHERE "boardId" = $1 AND "revision" < $2
+            ORDER BY "revision" DESC
+            LIMIT $3
+            ''',
+            board_id, before, HISTORY_SCAN_PAGE_SIZE
+        )
+        for row in rows:
+            yield row["revision"], row["action"], row["targetRevision"]
+        if len(rows) < HISTORY_SCAN_PAGE_SIZE:
+            return
+        before = rows[-1]["revision"]
+
+async def _undo_target(board_id: str) -> Optional[int]:
+    """
+    The edit revision an undo should revert.
+
+    Edits and redos push onto the undo stack and undos pop it, so scanning
+    backwards each undo cancels the next push; the first uncancelled push is the top.
+    """
+    pending_undos = 0
+    async for revision, action, target in _revision_actions(board_id):
+        if action == ACTION_UNDO:
+            pending_undos += 1
+        elif pending_undos:
+            pending_undos -= 1
+        else:
+            return target if action == ACTION_REDO else revision
+    return None
+
+async def _redo_target(board_id: str) -> Optional[int]:
+    """The edit revision a redo should re-apply; any new edit after an undo clears the redo stack"""
+    pending_redos = 0
+    async for _, action, target in _revision_actions(board_id):
+        if action == ACTION_EDIT:
+            return None
+        if action == ACTION_REDO:
+            pending_redos += 1
+        elif pending_redos:
+            pending_redos -= 1
+        else:
+            return target
+    return None
+
+def _inverse_operations(operations: List[Any]) -> List[Dict[str, Any]]:
+    inverse = []
+    for operation in reversed(operations):
+        if operation.op == OP_CREATE:
+            inverse.append({"op": "delete", "id": operation.elementId, "data": None})
+        elif operation.op == OP_UPDATE:
+            inverse.append({"op": "update", "id": operation.elementId, "data": operation.before})
+        elif operation.op == OP_DELETE:
+            inverse.append({"op": "create", "id": operation.elementId, "data": operation.before})
+    return inverse
+
+def _forward_operations(operations: List[Any]) -> List[Dict[str, Any]]:
+    forward = []
+    for operation in operations:
+        if operation.op == OP_CREATE:
+            forward.append({"op": "create", "id": operation.elementId, "data": operation.after})
+        elif operation.op == OP_UPDATE:
+            forward.append({"op": "update", "id": operation.elementId, "data": operation.after})
+        elif operation.op == OP_DELETE:
+            forward.append({"op": "delete", "id": operation.elementId, "data": None})
+    return forward
+
+class BoardHistoryService:
+    @staticmethod
+    async def get_board_at_revision(board_id: str, revision: int) -> Optional[Dict[str, Any]]:
+        """
+        Reconstruct a board's elements as they were at a revision.
+
+        Starts from the latest snapshot at or before the revision and replays
+        only the operations logged after it.
+
+        Args:
+            board_id: ID of the board
+            revision: Board revision to reconstruct
+
+        Returns:
+            The board ID, revision, snapshot revision used, number of operations
+            replayed and the elements, or None if the board does not exist
+
+        Raises:
+            ValueError: If the revision is in the future or older than the board's history
+        """
+        board = await prisma.board.find_unique(where={"id": board_id})
+        if not board:
+            return None
+        if revision > board.revision:
+            raise ValueError(f"Board is at revision {board.revision}; revision {revision} does not exist yet")
+        if revision < board.historyStartRevision:
+            raise ValueError(f"History for this board starts at revision {board.historyStartRevision}")
+
+        snapshot = await prisma.boardsnapshot.find_first(
+            where={"boardId": board_id, "revision": {"lte": revision}},
+            order={"revision": "desc"}
+        )
+        base_revision = snapshot.revision if snapshot else 0
+        operations = await prisma.boardoperation.find_many(
+            where={"boardId": board_id, "revision": {"gt": base_revision, "lte": revision}},
+            order=[{"revision": "asc"}, {"seq": "asc"}]
+        )
+
+        state = replay(snapshot.elements if snapshot else [], operations)
+        return {
+            "boardId": board_id,
+            "revision": revision,
+            "snapshotRevision": base_revision,
+            "replayed": len(operations),
+            "elements": sorted(state.values(), key=lambda element: (element.get("zIndex") or 0, element["id"])),
+        }
+
+    @staticmethod
+    async def undo(board_id: str) -> Optional[Dict[str, Any]]:
+        """Revert the most recent edit not already undone; None when there is nothing to undo"""
+        return await BoardHistoryService._step(board_id, ACTION_UNDO)
+
+    @staticmethod
+    async def redo(board_id: str) -> Optional[Dict[str, Any]]:
+        """Re-apply the most recently undone edit; None when there is nothing to redo"""
+        return await BoardHistoryService._step(board_id, ACTION_REDO)
+
+    @staticmethod
+    async def _step(board_id: str, action: str) -> Optional[Dict[str, Any]]:
+        lock = _board_locks.setdefault(board_id, asyncio.Lock())
+        async with lock:
+            find_target = _undo_target if action == ACTION_UNDO else _redo_target
+            target = await find_target(board_id)
+            if target is None:
+                return None
+
+            operations = await prisma.boardoperation.find_many(
+                where={"boardId": board_id, "revision": target},
+                order={"seq": "asc"}
+            )
+            batch = _inverse_operations(operations) if action == ACTION_UNDO else _forward_operations(operations)
+
+            # Elements edited or deleted since are changed as far as they still can be:
+            # updates and deletes of missing elements fail per item, and restoring an
+            # element that exists again is skipped
+            restore_ids = [operation["id"] for operation in batch if operation["op"] == "create"]
+            if restore_ids:
+                present = await prisma.boardelement.find_many(where={"id": {"in": restore_ids}})
+                present_ids = {element.id for element in present}
+                batch = [
+                    operation for operation in batch
+                    if not (operation["op"] == "create" and operation["id"] in present_ids)
+                ]
+
+            results = await BoardElementService.apply_batch(
+                board_id, batch, action=action, target_revision=target
+            )
+            return {"boardId": board_id, "action": action, "targetRevision": target, "results": results}
@@ -0,0 +1,306 @@
+# Background jobs: an in-process asyncio scheduler with a pluggable persistent store
+
+import asyncio
+import contextvars
+import importlib
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+from uuid import uuid4
+
+# Change from relative to absolute imports
+from db.client import prisma
+from db.routing import mark_write
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+@dataclass
+class Job:
+    userId: str
+    kind: str
+    id: str = field(default_factory=lambda: str(uuid4()))
+    status: str = QUEUED
+    progress: int = 0
+    total: Optional[int] = None
+    result: Any = None
+    error: Optional[str] = None
+    createdAt: datetime = field(default_factory=_now)
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
+
+class JobStore(ABC):
+    """Where job records live; the scheduler itself only keeps queued and running work"""
+
+    @abstractmethod
+    async def save(self, job: Job) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    async def mark_interrupted(self) -> int:
+        """Fail jobs a previous process left queued or running; returns how many"""
+        return 0
+
+class InMemoryJobStore(JobStore):
+    """Keeps records for JOB_RETENTION seconds in this process only"""
+
+    def __init__(self, max_jobs: int = 10000, retention: float = 86400.0):
+        self._jobs = TTLCache(max_size=max_jobs, ttl=retention)
+
+    async def save(self, job: Job) -> None:
+        # Store a copy so readers never see a half-updated record
+        self._jobs.set(job.id, replace(job))
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        return replace(job) if job else None
+
+class PrismaJobStore(JobStore):
+    """Persists job records in the Job table so status survives restarts and is shared by workers"""
+
+    async def save(self, job: Job) -> None:
+        data = {
+            "userId": job.userId,
+            "kind": job.kind,
+            "status": job.status,
+            "progress": job.progress,
+            "total": job.total,
+            "result": json.dumps(job.result, default=str) if job.result is not None else None,
+            "error": job.error,
+            "startedAt": job.startedAt,
+            "finishedAt": job.finishedAt,
+        }
+        await prisma.job.upsert(
+            where={"id": job.id},
+            data={"create": {**data, "id": job.id, "createdAt": job.createdAt}, "update": data}
+        )
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        row = await prisma.job.find_unique(where={"id": job_id})
+        if not row:
+            return None
+        return Job(
+            id=row.id, userId=row.userId, kind=row.kind, status=row.status,
+            progress=row.progress, total=row.total, result=row.result, error=row.error,
+            createdAt=row.createdAt, startedAt=row.startedAt, finishedAt=row.finishedAt
+        )
+
+    async def mark_interrupted(self) -> int:
+        return await prisma.job.update_many(
+            where={"status": {"in": [QUEUED, RUNNING]}},
+            data={"status": FAILED, "error": "Interrupted by a server restart", "finishedAt": _now()}
+        )
+
+def load_store(spec: Optional[str] = None) -> JobStore:
+    """
+    Build the job store named by spec or JOB_STORE_BACKEND.
+
+    "memory" selects InMemoryJobStore, "prisma" selects PrismaJobStore; anything
+    else is a "package.module:ClassName" path to a JobStore subclass.
+    """
+    spec = spec or os.environ.get("JOB_STORE_BACKEND", "memory")
+    if spec == "memory":
+        return InMemoryJobStore(retention=float(os.environ.get("JOB_RETENTION", "86400")))
+    if spec == "prisma":
+        return PrismaJobStore()
+
+    module_name, _, class_name = spec.partition(":")
+    store_class = getattr(importlib.import_module(module_name), class_name)
+    return store_class()
+
+class JobContext:
+    """Handed to a running job so it can report progress"""
+
+    def __init__(self, job: Job, store: JobStore):
+        self.job = job
+        self._store = store
+
+    async def progress(self, done: int, total: Optional[int] = None) -> None:
+        self.job.progress = done
+        if total is not None:
+            self.job.total = total
+        await self._store.save(self.job)
+
+JobFunction = Callable[[JobContext], Awaitable[Any]]
+
+class JobQueueFullError(Exception):
+    """Raised when a user already has the maximum number of queued jobs"""
+
+class JobScheduler:
+    """
+    Runs submitted coroutines on a fixed number of worker tasks.
+
+    Each user has their own FIFO queue and workers take from the users in
+    round-robin order, so one user submitting many jobs cannot starve the rest.
+    Workers start on the first submit.
+
+    Queued and running work lives in this process only. With several API
+    processes sharing a store, a job can only be cancelled by the process that
+    accepted it.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int = 4, max_queued_per_user: int = 100):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_queued_per_user = max_queued_per_user
+        self._queues: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._pending: Dict[str, tuple] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._workers: list = []
+        self._stats = {"submitted": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+
+    def _start(self) -> None:
+        if self._workers:
+            return
+        self._ready = asyncio.Semaphore(0)
+        # Workers start inside the first submitting request; an empty context keeps
+        # that request's routing and metrics state out of every later job
+        self._workers = [
+            contextvars.Context().run(asyncio.create_task, self._work()) for _ in range(self.max_workers)
+        ]
+
+    async def submit(self, user_id: str, kind: str, fn: JobFunction, total: Optional[int] = None) -> Job:
+        """Queue fn for background execution and return its record"""
+        queue = self._queues.get(user_id)
+        if queue is not None and len(queue) >= self.max_queued_per_user:
+            raise JobQueueFullError(f"User already has {len(queue)} queued jobs")
+
+        job = Job(userId=user_id, kind=kind, total=total)
+        await self.store.save(job)
+
+        self._start()
+        self._pending[job.id] = (job, fn)
+        self._queues.setdefault(user_id, deque()).append(job.id)
+        self._stats["submitted"] += 1
+        self._ready.release()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.store.get(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued or running job; finished jobs are returned unchanged.
+
+        Only jobs submitted to this scheduler can be cancelled. A job another
+        process is running comes back still queued or running.
+        """
+        pending = self._pending.pop(job_id, None)
+        if pending is not None:
+            job, _ = pending
+            queue = self._queues.get(job.userId)
+            if queue is not None:
+                queue.remove(job_id)
+                if not queue:
+                    del self._queues[job.userId]
+            await self._finish(job, CANCELLED)
+            return job
+
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+            # _run records the cancellation before the task completes
+            await asyncio.wait([task])
+
+        return await self.store.get(job_id)
+
+    def _next_job(self) -> Optional[str]:
+        if not self._queues:
+            return None
+        user_id, queue = self._queues.popitem(last=False)
+        job_id = queue.popleft()
+        if queue:
+            # Back of the line until every other user with queued work has had a turn
+            self._queues[user_id] = queue
+        return job_id
+
+    async def _work(self) -> None:
+        while True:
+            await self._ready.acquire()
+            job_id = self._next_job()
+            if job_id is None:
+                # Its job was cancelled while queued
+                continue
+            job, fn = self._pending.pop(job_id)
+            task = asyncio.create_task(self._run(job, fn))
+            self._running[job_id] = task
+            try:
+                # wait() rather than await, so cancelling the job does not stop the worker
+                await asyncio.wait([task])
+            finally:
+                self._running.pop(job_id, None)
+
+    async def _run(self, job: Job, fn: JobFunction) -> None:
+        job.status = RUNNING
+        job.startedAt = _now()
+        await self.store.save(job)
+        try:
+            job.result = await fn(JobContext(job, self.store))
+        except asyncio.CancelledError:
+            await self._finish(job, CANCELLED)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            job.error = str(e)
+            await self._finish(job, FAILED)
+        else:
+            if job.total is not None:
+                job.progress = job.total
+            # Jobs write outside the submitting request, so the user's next reads need pinning here
+            mark_write(job.userId)
+            await self._finish(job, SUCCEEDED)
+
+    async def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finishedAt = _now()
+        self._stats[status] += 1
+        await self.store.save(job)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self._stats,
+            "queued": len(self._pending),
+            "running": len(self._running),
+            "workers": self.max_workers,
+        }
+
+    async def close(self) -> None:
+        """Cancel running jobs and stop the workers; queued jobs are marked cancelled"""
+        for job_id in list(self._pending):
+            await self.cancel(job_id)
+        for task in list(self._running.values()):
+            task.cancel()
+        if self._running:
+            await asyncio.wait(list(self._running.values()))
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+# Fail records left queued or running by a previous process on startup. Turn off
+# when several API processes share a persistent store.
+RECOVER_ON_STARTUP = os.environ.get("JOB_RECOVER_ON_STARTUP", "1").lower() in ("1", "true", "yes")
+
+job_scheduler = JobScheduler(
+    load_store(),
+    max_workers=int(os.environ.get("JOB_WORKERS", "4")),
+    max_queued_per_user=int(os.environ.get("JOB_MAX_QUEUED_PER_USER", "100"))
+)
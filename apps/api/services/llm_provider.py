@@ -0,0 +1,367 @@
+"""
+LLM providers for the AI service, plus a client that makes them safe under load
+"""
+import asyncio
+import copy
+import importlib
+import json
+import logging
+import os
+import re
+import unicodedata
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional
+
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class LLMProvider(ABC):
+    """A model backend that turns prompts into board elements and board insights"""
+
+    @abstractmethod
+    async def generate_elements(self, text: str) -> List[Dict[str, Any]]:
+        """Return element specs (type, content, position, size, style, zIndex) for a prompt"""
+
+    async def stream_elements(self, text: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield element specs one at a time as the model produces them.
+
+        The default waits for generate_elements; providers that can stream override it.
+        """
+        for element in await self.generate_elements(text):
+            yield element
+
+    @abstractmethod
+    async def analyze_board(self, description: str) -> Dict[str, Any]:
+        """Return {"summary": str, "suggestions": [str]} for a textual board description"""
+
+class FakeLLMProvider(LLMProvider):
+    """Deterministic keyword-matching provider for local development and tests"""
+
+    async def generate_elements(self, text: str) -> List[Dict[str, Any]]:
+        lowered = text.lower()
+        elements = []
+
+        if "sticky" in lowered or "note" in lowered:
+            elements.append({
+                "type": "sticky-note",
+                "content": {"text": text},
+                "position": {"x": 100, "y": 100},
+                "size": {"width": 200, "height": 150},
+                "style": {"fill": "#ffeb3b", "stroke": "#f9a825", "strokeWidth": 1, "cornerRadius": 5},
+                "zIndex": 0
+            })
+
+        if "shape" in lowered or "rectangle" in lowered:
+            elements.append({
+                "type": "shape",
+                "content": {"shape": "rectangle"},
+                "position": {"x": 350, "y": 100},
+                "size": {"width": 150, "height": 150},
+                "style": {"fill": "#a29bfe", "stroke": "#6c5ce7", "strokeWidth": 1, "cornerRadius": 5},
+                "zIndex": 0
+            })
+
+        if "circle" in lowered:
+            elements.append({
+                "type": "shape",
+                "content": {"shape": "circle"},
+                "position": {"x": 550, "y": 100},
+                "size": {"width": 100, "height": 100},
+                "style": {"fill": "#fd79a8", "stroke": "#e84393", "strokeWidth": 1},
+                "zIndex": 0
+            })
+
+        if "text" in lowered:
+            elements.append({
+                "type": "text",
+                "content": {"text": text},
+                "position": {"x": 100, "y": 300},
+                "size": {"width": 300, "height": 50},
+                "style": {"fontSize": 18, "fill": "#333333"},
+                "zIndex": 0
+            })
+
+        # If no specific elements were mentioned, create a sticky note with the text
+        if not elements:
+            elements.append({
+                "type": "sticky-note",
+                "content": {"text": text},
+                "position": {"x": 100, "y": 100},
+                "size": {"width": 200, "height": 150},
+                "style": {"fill": "#ffeb3b", "stroke": "#f9a825", "strokeWidth": 1, "cornerRadius": 5},
+                "zIndex": 0
+            })
+
+        return elements
+
+    async def analyze_board(self, description: str) -> Dict[str, Any]:
+        return {
+            "summary": "This board contains various elements for brainstorming",
+            "suggestions": [
+                "Consider grouping related sticky notes",
+                "Try adding more visual elements"
+            ]
+        }
+
+GENERATE_SYSTEM_PROMPT = (
+    "You design elements for an infinite canvas whiteboard. Reply with a JSON object "
+    '{"elements": [...]} where each element has "type" (sticky-note, shape, text), '
+    '"content", "position" {x, y}, "size" {width, height}, "style" and "zIndex".'
+)
+ANALYZE_SYSTEM_PROMPT = (
+    "You review whiteboards. Reply with a JSON object "
+    '{"summary": string, "suggestions": [string]} for the board described by the user.'
+)
+
+class StreamedArrayParser:
+    """
+    Pulls the items of one array field out of a JSON object that arrives in pieces.
+
+    feed() returns each object in the array as soon as its closing brace has
+    arrived; anything else in the array is skipped.
+    """
+
+    def __init__(self, field: str):
+        self._opening = re.compile(r'"' + re.escape(field) + r'"\s*:\s*\[')
+        self._buffer = ""
+        self._position = 0
+        self._in_array = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = 0
+
+    def feed(self, text: str) -> Iterator[Any]:
+        if self._finished:
+            return
+        self._buffer += text
+        if not self._in_array:
+            match = self._opening.search(self._buffer)
+            if match is None:
+                return
+            self._in_array = True
+            self._position = match.end()
+
+        buffer = self._buffer
+        for position in range(self._position, len(buffer)):
+            char = buffer[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._item_start = position
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # The array itself closed
+                    self._finished = True
+                    self._buffer = ""
+                    return
+                self._depth -= 1
+                if self._depth == 0 and char == "}":
+                    yield json.loads(buffer[self._item_start:position + 1])
+
+        # Keep only the item still being received
+        keep_from = self._item_start if self._depth else len(buffer)
+        self._buffer = buffer[keep_from:]
+        self._item_start -= keep_from
+        self._position = len(buffer) - keep_from
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions in JSON mode; needs the optional openai package and OPENAI_API_KEY"""
+
+    def __init__(self, model: Optional[str] = None):
+        from openai import AsyncOpenAI
+
+        self.model = model or os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+        self._client = AsyncOpenAI()
+
+    async def _complete_json(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        response = await self._client.chat.completions.create(
+            model=self.model,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+        )
+        return json.loads(response.choices[0].message.content or "{}")
+
+    async def generate_elements(self, text: str) -> List[Dict[str, Any]]:
+        result = await self._complete_json(GENERATE_SYSTEM_PROMPT, text)
+        return list(result.get("elements", []))
+
+    async def stream_elements(self, text: str) -> AsyncIterator[Dict[str, Any]]:
+        stream = await self._client.chat.completions.create(
+            model=self.model,
+            response_format={"type": "json_object"},
+            stream=True,
+            messages=[
+                {"role": "system", "content": GENERATE_SYSTEM_PROMPT},
+                {"role": "user", "content": text},
+            ],
+        )
+        parser = StreamedArrayParser("elements")
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                for element in parser.feed(delta):
+                    yield element
+
+    async def analyze_board(self, description: str) -> Dict[str, Any]:
+        result = await self._complete_json(ANALYZE_SYSTEM_PROMPT, description)
+        return {
+            "summary": str(result.get("summary", "")),
+            "suggestions": [str(item) for item in result.get("suggestions", [])],
+        }
+
+def load_provider(spec: Optional[str] = None) -> LLMProvider:
+    """
+    Build the provider named by spec or AI_PROVIDER.
+
+    "fake" (default) selects FakeLLMProvider, "openai" selects OpenAIProvider;
+    anything else is a "package.module:ClassName" path to an LLMProvider subclass.
+    """
+    spec = spec or os.environ.get("AI_PROVIDER", "fake")
+    logger.info("Using LLM provider %s", spec)
+    if spec == "fake":
+        return FakeLLMProvider()
+    if spec == "openai":
+        return OpenAIProvider()
+
+    module_name, _, class_name = spec.partition(":")
+    provider_class = getattr(importlib.import_module(module_name), class_name)
+    return provider_class()
+
+class LLMTimeoutError(Exception):
+    """Raised when a model call does not finish within the client's timeout"""
+
+def normalize_prompt(text: str) -> str:
+    """Cache key form of a prompt: Unicode NFC with whitespace collapsed"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+class LLMClient:
+    """
+    Wraps a provider with the protections a shared model backend needs.
+
+    - at most max_concurrency provider calls run at once
+    - results are cached by (operation, normalized prompt) with TTL and LRU eviction
+    - identical concurrent prompts share a single in-flight call
+    - every call is bounded by a timeout and cancelled when it expires
+    """
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        max_concurrency: int = 4,
+        timeout: float = 30.0,
+        cache_size: int = 512,
+        cache_ttl: float = 600.0
+    ):
+        self.provider = provider
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache = TTLCache(max_size=cache_size, ttl=cache_ttl)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._stats = {"calls": 0, "cacheHits": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    async def generate_elements(self, text: str) -> List[Dict[str, Any]]:
+        return await self._call("generate", text, self.provider.generate_elements)
+
+    async def analyze_board(self, description: str) -> Dict[str, Any]:
+        return await self._call("analyze", description, self.provider.analyze_board)
+
+    async def stream_elements(self, text: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield generated elements as the provider produces them.
+
+        A cached result for the prompt is replayed. Otherwise the stream holds a
+        concurrency slot until it ends, must finish within the timeout, and is
+        cached once complete. Streams are not coalesced with other calls.
+        """
+        key = ("generate", normalize_prompt(text))
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._stats["cacheHits"] += 1
+            for element in copy.deepcopy(cached):
+                yield element
+            return
+
+        self._stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        stream = self.provider.stream_elements(text)
+        elements = []
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            try:
+                while True:
+                    try:
+                        element = await asyncio.wait_for(stream.__anext__(), max(deadline - loop.time(), 0))
+                    except StopAsyncIteration:
+                        break
+                    elements.append(element)
+                    yield copy.deepcopy(element)
+            finally:
+                self._semaphore.release()
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise LLMTimeoutError(f"Model call timed out after {self.timeout}s")
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            await stream.aclose()
+
+        self._cache.set(key, elements)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "inFlight": len(self._inflight), "cached": len(self._cache)}
+
+    async def _call(self, operation: str, prompt: str, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        key = (operation, normalize_prompt(prompt))
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._stats["cacheHits"] += 1
+            return copy.deepcopy(cached)
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(key, prompt, fn))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self._stats["coalesced"] += 1
+
+        # Shield so one caller disconnecting does not cancel the call others are waiting on
+        return copy.deepcopy(await asyncio.shield(future))
+
+    async def _bounded(self, fn: Callable[[str], Awaitable[Any]], prompt: str) -> Any:
+        async with self._semaphore:
+            return await fn(prompt)
+
+    async def _run(self, key: Hashable, prompt: str, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        self._stats["calls"] += 1
+        try:
+            # The timeout also covers waiting for a concurrency slot
+            result = await asyncio.wait_for(self._bounded(fn, prompt), self.timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise LLMTimeoutError(f"Model call timed out after {self.timeout}s")
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+
+        self._cache.set(key, result)
+        return result
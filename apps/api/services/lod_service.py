@@ -0,0 +1,299 @@
+# Zoom-dependent board views that fold elements too small to see into grid clusters
+
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Change from relative to absolute imports
+from services.board_state import IncrementalBoardEngine, IncrementalBoardState
+from services.element_service import BoardElementService
+
+# Elements drawn smaller than this many pixels on both sides are aggregated
+LOD_MIN_PIXELS = float(os.environ.get("LOD_MIN_PIXELS", "4"))
+# On-screen size of one aggregation cell
+LOD_CELL_PIXELS = float(os.environ.get("LOD_CELL_PIXELS", "64"))
+# Cells holding at most this many small elements return them in full instead of a cluster
+LOD_SPARSE_CELL = int(os.environ.get("LOD_SPARSE_CELL", "3"))
+# Zoom is snapped to this many steps per doubling, so nearby zooms share a cached view
+LOD_ZOOM_STEPS = 2
+
+Viewport = Tuple[float, float, float, float]
+
+def snap_zoom(zoom: float) -> float:
+    """Round a zoom factor to the nearest step of the zoom grid"""
+    return 2.0 ** (round(math.log2(zoom) * LOD_ZOOM_STEPS) / LOD_ZOOM_STEPS)
+
+def _extent(element: Any) -> Tuple[float, float]:
+    """Width and height; connectors without a size use the span of their points"""
+    if element.width is not None and element.height is not None:
+        return element.width, element.height
+    content = element.content
+    points = content.get("points") if isinstance(content, dict) else None
+    if isinstance(points, list) and len(points) >= 4:
+        try:
+            xs, ys = [float(value) for value in points[0::2]], [float(value) for value in points[1::2]]
+        except (TypeError, ValueError):
+            return 0.0, 0.0
+        return max(xs) - min(xs), max(ys) - min(ys)
+    return 0.0, 0.0
+
+def _fill(element: Any) -> Optional[str]:
+    style = element.style
+    fill = style.get("fill") if isinstance(style, dict) else None
+    return fill if isinstance(fill, str) else None
+
+class BoardLodState(IncrementalBoardState):
+    """
+    One board's elements as dense geometry arrays, updated from element changes.
+
+    Views are computed per snapped zoom with NumPy and kept until the next
+    change that touches the board.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.rows: Dict[str, Any] = {}
+        self._ids: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._parents: List[Optional[str]] = []
+        # x, y, width, height per slot
+        self._geometry = np.empty((0, 4), dtype=np.float64)
+        self._colors: List[str] = []
+        self._color_codes: Dict[str, int] = {}
+        self._fills = np.empty(0, dtype=np.int32)
+        self._views: Dict[float, Dict[str, Any]] = {}
+
+    def _color_code(self, fill: Optional[str]) -> int:
+        if fill is None:
+            return -1
+        code = self._color_codes.get(fill)
+        if code is None:
+            code = self._color_codes[fill] = len(self._colors)
+            self._colors.append(fill)
+        return code
+
+    def _add(self, element: Any) -> None:
+        self.rows[element.id] = element
+        slot = self._slots.get(element.id)
+        if slot is None:
+            slot = len(self._ids)
+            if slot == len(self._geometry):
+                capacity = max(64, 2 * slot)
+                self._geometry = np.resize(self._geometry, (capacity, 4))
+                self._fills = np.resize(self._fills, capacity)
+            self._ids.append(element.id)
+            self._parents.append(None)
+            self._slots[element.id] = slot
+        self._parents[slot] = element.parentId
+        self._geometry[slot] = (element.x, element.y, *_extent(element))
+        self._fills[slot] = self._color_code(_fill(element))
+
+    def _remove(self, element_id: str) -> bool:
+        if self.rows.pop(element_id, None) is None:
+            return False
+        # Move the last row into the freed slot
+        slot = self._slots.pop(element_id)
+        last_id = self._ids.pop()
+        last_parent = self._parents.pop()
+        if last_id != element_id:
+            last = len(self._ids)
+            self._ids[slot] = last_id
+            self._parents[slot] = last_parent
+            self._slots[last_id] = slot
+            self._geometry[slot] = self._geometry[last]
+            self._fills[slot] = self._fills[last]
+        return True
+
+    def apply(self, revision: int, upserts: Iterable[Any] = (), deletes: Iterable[str] = ()) -> int:
+        """Fold element changes into the state and return how many elements changed"""
+        changed = 0
+        for element in upserts:
+            current = self.rows.get(element.id)
+            if current is not None and current.updatedAt == element.updatedAt:
+                continue
+            self._add(element)
+            changed += 1
+        for element_id in deletes:
+            changed += self._remove(element_id)
+        if changed:
+            self._views.clear()
+        self.revision = max(self.revision, revision)
+        return changed
+
+    def rebuild(self, revision: int, elements: Iterable[Any]) -> None:
+        """Replace the state with a full element list"""
+        self.rows, self._ids, self._slots, self._parents = {}, [], {}, []
+        self._views.clear()
+        for element in elements:
+            self._add(element)
+        self.loaded = True
+        self.revision = revision
+
+    def view(self, zoom: float) -> Dict[str, Any]:
+        """The board at a snapped zoom, cached until the next change"""
+        view = self._views.get(zoom)
+        if view is None:
+            view = self._views[zoom] = self._compute_view(zoom)
+        return view
+
+    def _compute_view(self, zoom: float) -> Dict[str, Any]:
+        count = len(self._ids)
+        cell_size = LOD_CELL_PIXELS / zoom
+        if not count:
+            return {"cellSize": cell_size, "slots": np.empty(0, dtype=np.int64),
+                    "boxes": np.empty((0, 4)), "clusters": []}
+
+        geometry = self._geometry[:count]
+        fills = self._fills[:count]
+        parents = np.array([self._slots.get(parent_id, -1) if parent_id else -1 for parent_id in self._parents])
+
+        # Positions are relative to the parent: add up offsets along each ancestor chain
+        x, y = geometry[:, 0].copy(), geometry[:, 1].copy()
+        roots = np.arange(count)
+        ancestors = parents.copy()
+        for _ in range(count):
+            nested = ancestors >= 0
+            if not nested.any():
+                break
+            x[nested] += geometry[ancestors[nested], 0]
+            y[nested] += geometry[ancestors[nested], 1]
+            roots[nested] = ancestors[nested]
+            ancestors = np.where(nested, parents[np.maximum(ancestors, 0)], -1)
+        boxes = np.column_stack((x, y, x + geometry[:, 2], y + geometry[:, 3]))
+
+        # Shown in full when big enough on screen and its parent is shown (children need it for placement)
+        large = np.maximum(geometry[:, 2], geometry[:, 3]) * zoom >= LOD_MIN_PIXELS
+        top_level = parents < 0
+        full = large & top_level
+        for _ in range(count):
+            shown = full | (large & ~top_level & full[np.maximum(parents, 0)])
+            if np.array_equal(shown, full):
+                break
+            full = shown
+
+        # Small elements go to the grid cell holding their center
+        small = np.flatnonzero(~full)
+        centers = (boxes[small, :2] + boxes[small, 2:]) / 2
+        cells = np.floor(centers / cell_size).astype(np.int64)
+        # One integer key per cell: much faster than np.unique over rows
+        cells -= cells.min(axis=0, initial=0)
+        keys = cells[:, 0] * (cells[:, 1].max(initial=0) + 1) + cells[:, 1]
+        _, cell_of, cell_counts = np.unique(keys, return_inverse=True, return_counts=True)
+        cell_of = cell_of.reshape(-1)
+        placeable = top_level[small] | full[np.maximum(parents[small], 0)]
+        sparse = (cell_counts[cell_of] <= LOD_SPARSE_CELL) & placeable
+        full[small[sparse]] = True
+
+        clustered, cell_of = small[~sparse], cell_of[~sparse]
+        clusters = []
+        if len(clustered):
+            order = np.argsort(cell_of, kind="stable")
+            members, sorted_cells = clustered[order], cell_of[order]
+            starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+            sizes = np.diff(np.r_[starts, len(order)])
+            lows = np.minimum.reduceat(boxes[members, :2], starts)
+            highs = np.maximum.reduceat(boxes[members, 2:], starts)
+            colors = self._dominant_colors(fills[members], np.repeat(np.arange(len(starts)), sizes))
+            for size, (x0, y0), (x1, y1), color in zip(sizes.tolist(), lows.tolist(), highs.tolist(), colors):
+                clusters.append({
+                    "count": size,
+                    "bounds": {"x0": x0, "y0": y0, "x1": x1, "y1": y1},
+                    "color": color,
+                })
+
+        slots = np.flatnonzero(full)
+        return {
+            "cellSize": cell_size,
+            "slots": slots,
+            # Viewport tests use the top-level ancestor's box, so a shown child always comes with its parent
+            "boxes": boxes[roots[slots]],
+            "clusters": clusters,
+        }
+
+    def _dominant_colors(self, fills: np.ndarray, groups: np.ndarray) -> List[Optional[str]]:
+        """Most common fill per group, ignoring elements without one"""
+        colors: List[Optional[str]] = [None] * (int(groups.max()) + 1 if len(groups) else 0)
+        keep = fills >= 0
+        if not keep.any():
+            return colors
+        palette = len(self._colors)
+        keys, counts = np.unique(groups[keep].astype(np.int64) * palette + fills[keep], return_counts=True)
+        pair_groups, pair_fills = keys // palette, keys % palette
+        # Within each group, the last pair after sorting by count is the most common fill
+        order = np.lexsort((counts, pair_groups))
+        last = np.r_[pair_groups[order[1:]] != pair_groups[order[:-1]], True]
+        for group, code in zip(pair_groups[order[last]].tolist(), pair_fills[order[last]].tolist()):
+            colors[group] = self._colors[code]
+        return colors
+
+    def select(self, zoom: float, viewport: Optional[Viewport] = None, overrides: Sequence[Any] = ()) -> Dict[str, Any]:
+        """
+        Full elements and clusters at a snapped zoom, optionally limited to a viewport.
+
+        overrides replace rows of the state for this call only, like elements
+        whose geometry is still in the write buffer. The view is then computed
+        afresh and the cached views are left alone.
+        """
+        originals = [self.rows[row.id] for row in overrides if row.id in self.rows]
+        if not originals:
+            return self._select(self.view(zoom), viewport)
+        try:
+            for row in overrides:
+                if row.id in self.rows:
+                    self._add(row)
+            return self._select(self._compute_view(zoom), viewport)
+        finally:
+            for row in originals:
+                self._add(row)
+
+    def _select(self, view: Dict[str, Any], viewport: Optional[Viewport]) -> Dict[str, Any]:
+        slots, boxes, clusters = view["slots"], view["boxes"], view["clusters"]
+        if viewport:
+            x0, y0, x1, y1 = viewport
+            inside = (boxes[:, 0] <= x1) & (boxes[:, 2] >= x0) & (boxes[:, 1] <= y1) & (boxes[:, 3] >= y0)
+            slots = slots[inside]
+            clusters = [
+                cluster for cluster in clusters
+                if cluster["bounds"]["x0"] <= x1 and cluster["bounds"]["x1"] >= x0
+                and cluster["bounds"]["y0"] <= y1 and cluster["bounds"]["y1"] >= y0
+            ]
+        elements = sorted((self.rows[self._ids[slot]] for slot in slots.tolist()), key=lambda row: row.zIndex)
+        return {"cellSize": view["cellSize"], "elements": elements, "clusters": clusters}
+
+class BoardLodEngine(IncrementalBoardEngine):
+    """Keeps one BoardLodState per recently viewed board and refreshes it from revisions"""
+
+    state_class = BoardLodState
+
+    def __init__(self, max_boards: int = 32, ttl: float = 900.0):
+        super().__init__(max_boards, ttl)
+
+    async def view(self, board_id: str, zoom: float, viewport: Optional[Viewport] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return the board at a zoom level, applying only the element changes
+        made since the board was last viewed.
+
+        Args:
+            board_id: ID of the board
+            zoom: Screen pixels per board unit; snapped with snap_zoom
+            viewport: Optional x0, y0, x1, y1 rectangle in board coordinates
+
+        Returns:
+            The revision, snapped zoom, cell size, full elements and clusters,
+            or None if the board does not exist
+        """
+        zoom = snap_zoom(zoom)
+
+        def query(state: BoardLodState) -> Dict[str, Any]:
+            # Buffered drags are not in the change feed until they flush
+            buffered = BoardElementService.buffered_elements(board_id, state.rows)
+            return {"revision": state.revision, "zoom": zoom, **state.select(zoom, viewport, buffered)}
+
+        return await self.read(board_id, query)
+
+lod_engine = BoardLodEngine(
+    max_boards=int(os.environ.get("LOD_CACHE_BOARDS", "32")),
+    ttl=float(os.environ.get("LOD_CACHE_TTL", "900"))
+)
@@ -0,0 +1,264 @@
+# Real-time board events: pluggable pub/sub backends and per-board WebSocket fan-out
+
+import asyncio
+import importlib
+import logging
+import os
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from schemas.models import BoardElementResponse
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Event types sent to clients
+ELEMENT_CREATED = "element.created"
+ELEMENT_UPDATED = "element.updated"
+ELEMENTS_UPDATED = "elements.updated"
+ELEMENT_DELETED = "element.deleted"
+
+class PubSubBackend(ABC):
+    """Transport that carries board events between API processes"""
+
+    @abstractmethod
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        ...
+
+    @abstractmethod
+    async def unsubscribe(self, channel: str, handler: MessageHandler) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+class InMemoryPubSub(PubSubBackend):
+    """Single-process backend; events only reach sockets connected to this worker"""
+
+    def __init__(self):
+        self._handlers: Dict[str, Set[MessageHandler]] = {}
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        for handler in list(self._handlers.get(channel, ())):
+            await handler(message)
+
+    async def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        self._handlers.setdefault(channel, set()).add(handler)
+
+    async def unsubscribe(self, channel: str, handler: MessageHandler) -> None:
+        handlers = self._handlers.get(channel)
+        if handlers is not None:
+            handlers.discard(handler)
+            if not handlers:
+                del self._handlers[channel]
+
+def load_backend(spec: Optional[str] = None) -> PubSubBackend:
+    """
+    Build the pub/sub backend named by spec or REALTIME_PUBSUB_BACKEND.
+
+    "memory" selects InMemoryPubSub; anything else is a "package.module:ClassName"
+    path to a PubSubBackend subclass with a no-argument constructor.
+    """
+    spec = spec or os.environ.get("REALTIME_PUBSUB_BACKEND", "memory")
+    if spec == "memory":
+        return InMemoryPubSub()
+
+    module_name, _, class_name = spec.partition(":")
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    return backend_class()
+
+# Close code for subscribers dropped because they could not keep up (1013: try again later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+class _Connection:
+    """A subscribed WebSocket with its bounded outbound queue and the task that drains it"""
+
+    def __init__(self, socket: Any, queue_size: int):
+        self.socket = socket
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=queue_size)
+        self.sender: Optional[asyncio.Task] = None
+        self.dropped = False
+
+class BoardEventHub:
+    """
+    Fans board events out to the WebSockets subscribed to each board.
+
+    Creates and deletes are delivered immediately. Updates are coalesced per
+    element and flushed at most tick_hz times per second, so a drag that emits
+    hundreds of position updates costs each socket one frame per tick.
+
+    Publishing only puts events on each connection's queue of at most
+    queue_size messages; a sender task per connection writes them out. A
+    socket whose queue is full, or whose send takes longer than send_timeout,
+    is dropped and closed, so a slow client never holds up a writer.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[PubSubBackend] = None,
+        tick_hz: float = 30.0,
+        queue_size: int = 256,
+        send_timeout: float = 5.0
+    ):
+        self.backend = backend or load_backend()
+        self.tick_interval = 1.0 / tick_hz
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self._subscribers: Dict[str, Dict[Any, _Connection]] = {}
+        self._pending: Dict[str, "OrderedDict[str, Dict[str, Any]]"] = {}
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+        self._closing: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def channel(board_id: str) -> str:
+        return f"board:{board_id}"
+
+    async def connect(self, board_id: str, socket: Any) -> None:
+        """Subscribe an accepted WebSocket to a board's events"""
+        connections = self._subscribers.setdefault(board_id, {})
+        if not connections:
+            await self.backend.subscribe(self.channel(board_id), self._handle_message)
+        connection = _Connection(socket, self.queue_size)
+        connection.sender = asyncio.create_task(self._send_loop(board_id, connection))
+        connections[socket] = connection
+
+    async def disconnect(self, board_id: str, socket: Any) -> None:
+        """Remove a WebSocket, releasing the board's subscription when it was the last"""
+        connections = self._subscribers.get(board_id)
+        if connections is None:
+            return
+
+        connection = connections.pop(socket, None)
+        if connection is not None and connection.sender is not asyncio.current_task():
+            connection.sender.cancel()
+        if not connections:
+            del self._subscribers[board_id]
+            self._pending.pop(board_id, None)
+            task = self._flush_tasks.pop(board_id, None)
+            if task:
+                task.cancel()
+            await self.backend.unsubscribe(self.channel(board_id), self._handle_message)
+
+    def subscriber_count(self, board_id: str) -> int:
+        return len(self._subscribers.get(board_id, ()))
+
+    async def publish(self, board_id: str, event_type: str, element: Any = None, element_id: Optional[str] = None) -> None:
+        """Publish an element event; failures are logged and never reach the writer"""
+        if event_type == ELEMENT_UPDATED and element is None:
+            return
+
+        message = {"type": event_type, "boardId": board_id}
+        if element is not None:
+            message["element"] = _element_payload(element)
+            element_id = element_id or message["element"]["id"]
+        message["elementId"] = element_id
+
+        try:
+            await self.backend.publish(self.channel(board_id), message)
+        except Exception:
+            logger.exception("Failed to publish %s for board %s", event_type, board_id)
+
+    async def close(self) -> None:
+        """Cancel pending ticks and senders, and close the backend"""
+        for task in self._flush_tasks.values():
+            task.cancel()
+        self._flush_tasks.clear()
+        self._pending.clear()
+        for connections in self._subscribers.values():
+            for connection in connections.values():
+                connection.sender.cancel()
+        for task in self._closing:
+            task.cancel()
+        await self.backend.close()
+
+    async def _handle_message(self, message: Dict[str, Any]) -> None:
+        board_id = message["boardId"]
+        if board_id not in self._subscribers:
+            return
+
+        if message["type"] == ELEMENT_UPDATED:
+            pending = self._pending.setdefault(board_id, OrderedDict())
+            pending[message["elementId"]] = message["element"]
+            pending.move_to_end(message["elementId"])
+            if board_id not in self._flush_tasks:
+                self._flush_tasks[board_id] = asyncio.create_task(self._flush_after_tick(board_id))
+            return
+
+        # Keep ordering: anything coalesced so far goes out before this event
+        self._flush(board_id)
+        self._broadcast(board_id, message)
+
+    async def _flush_after_tick(self, board_id: str) -> None:
+        try:
+            await asyncio.sleep(self.tick_interval)
+        finally:
+            self._flush_tasks.pop(board_id, None)
+        self._flush(board_id)
+
+    def _flush(self, board_id: str) -> None:
+        pending = self._pending.pop(board_id, None)
+        if not pending:
+            return
+
+        self._broadcast(board_id, {
+            "type": ELEMENTS_UPDATED,
+            "boardId": board_id,
+            "elements": list(pending.values()),
+        })
+
+    def _broadcast(self, board_id: str, message: Dict[str, Any]) -> None:
+        """Queue a message for every socket on the board without waiting for any of them"""
+        for connection in list(self._subscribers.get(board_id, {}).values()):
+            if connection.dropped:
+                continue
+            try:
+                connection.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.info("Dropping board %s subscriber with %d unsent events", board_id, self.queue_size)
+                self._drop_later(board_id, connection)
+
+    async def _send_loop(self, board_id: str, connection: _Connection) -> None:
+        while True:
+            message = await connection.queue.get()
+            try:
+                await asyncio.wait_for(connection.socket.send_json(message), self.send_timeout)
+            except Exception as e:
+                logger.info("Dropping board %s subscriber after send failure: %r", board_id, e)
+                await self._drop(board_id, connection)
+                return
+
+    def _drop_later(self, board_id: str, connection: _Connection) -> None:
+        connection.dropped = True
+        task = asyncio.create_task(self._drop(board_id, connection))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _drop(self, board_id: str, connection: _Connection) -> None:
+        """Unsubscribe a socket that fell behind and close it, so its client reconnects and resyncs"""
+        connection.dropped = True
+        await self.disconnect(board_id, connection.socket)
+        try:
+            await asyncio.wait_for(
+                connection.socket.close(code=SLOW_CONSUMER_CLOSE_CODE), self.send_timeout
+            )
+        except Exception:
+            # Already closed or unreachable; either way it gets no more events
+            pass
+
+def _element_payload(element: Any) -> Dict[str, Any]:
+    if isinstance(element, dict):
+        return element
+    return BoardElementResponse.model_validate(element).model_dump(mode="json")
+
+# Process-wide hub used by the services and the WebSocket endpoint
+board_events = BoardEventHub(
+    tick_hz=float(os.environ.get("REALTIME_TICK_HZ", "30")),
+    queue_size=int(os.environ.get("REALTIME_QUEUE_SIZE", "256")),
+    send_timeout=float(os.environ.get("REALTIME_SEND_TIMEOUT", "5"))
+)
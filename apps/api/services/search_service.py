@@ -0,0 +1,106 @@
+# Full-text search over element text across a user's boards
+
+import base64
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+# Change from relative to absolute imports
+from db.routing import reader
+
+# Must match the configuration of the searchVector column (migrations/20261017060000_element_search)
+SEARCH_CONFIG = "english"
+
+# Search result page sizes
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# Best-ranked matches kept per search: pages go this deep at most. Every match is
+# ranked, but only the top candidates are kept in memory while sorting.
+SEARCH_MAX_CANDIDATES = int(os.environ.get("SEARCH_MAX_CANDIDATES", "5000"))
+
+HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxWords=20, MinWords=8, MaxFragments=1"
+
+def encode_search_cursor(rank: float, element_id: str) -> str:
+    """Encode a result's (rank, id) sort key as an opaque cursor"""
+    raw = json.dumps([rank, element_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_search_cursor(cursor: str) -> Tuple[float, str]:
+    """Decode a cursor from encode_search_cursor, raising ValueError if it is malformed"""
+    try:
+        rank, element_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), str(element_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+class SearchService:
+    @staticmethod
+    async def search(
+        user_id: str,
+        query: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        cursor: Optional[str] = None,
+        board_id: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Search the text of a user's sticky notes and text elements, best matches first.
+
+        Args:
+            user_id: Owner of the boards to search
+            query: Search terms; quoted phrases, "or" and -exclusions are supported
+            limit: Page size, capped at MAX_SEARCH_LIMIT
+            cursor: Cursor returned with the previous page, if any
+            board_id: Restrict the search to one of the user's boards
+
+        Returns:
+            The results and the cursor for the next page (None on the last page)
+        """
+        limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+        params: List[Any] = [user_id, query, SEARCH_MAX_CANDIDATES, limit + 1]
+        conditions = []
+        if board_id:
+            params.append(board_id)
+            conditions.append(f'b."id" = ${len(params)}')
+        keyset = ""
+        if cursor:
+            rank, element_id = decode_search_cursor(cursor)
+            params.extend([rank, element_id])
+            keyset = f'WHERE (m."rank", m."id") < (${len(params) - 1}::float8, ${len(params)})'
+
+        # The GIN index on ("boardId", "searchVector") is probed once per board of the user.
+        # All matches are ranked and the best candidates kept in a deterministic order, so
+        # every page cuts the same list; snippets are computed only for the page
+        rows = await reader().query_raw(
+            f'''
+            WITH q AS (SELECT websearch_to_tsquery('{SEARCH_CONFIG}', $2) AS query),
+            matches AS (
+                SELECT e."id", e."boardId", e."type", e."content"->>'text' AS "text",
+                       ts_rank_cd(e."searchVector", q.query)::float8 AS "rank"
+                FROM "BoardElement" e, q
+                WHERE e."boardId" IN (
+                    SELECT b."id" FROM "Board" b WHERE b."userId" = $1 {"AND " + " AND ".join(conditions) if conditions else ""}
+                )
+                  AND e."searchVector" @@ q.query
+                ORDER BY "rank" DESC, e."id" DESC
+                LIMIT $3
+            ),
+            page AS (
+                SELECT m.* FROM matches m
+                {keyset}
+                ORDER BY m."rank" DESC, m."id" DESC
+                LIMIT $4
+            )
+            SELECT p."id" AS "elementId", p."boardId", b."title" AS "boardTitle", p."type", p."text", p."rank",
+                   ts_headline('{SEARCH_CONFIG}', p."text", q.query, '{HEADLINE_OPTIONS}') AS "snippet"
+            FROM page p JOIN "Board" b ON b."id" = p."boardId", q
+            ORDER BY p."rank" DESC, p."id" DESC
+            ''',
+            *params
+        )
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_search_cursor(last["rank"], last["elementId"])
+        return rows[:limit], next_cursor
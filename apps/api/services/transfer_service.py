@@ -0,0 +1,235 @@
+# Board transfer service for streaming NDJSON export and import
+
+import json
+import os
+from datetime import timedelta
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, List, Optional
+from uuid import NAMESPACE_URL, uuid4, uuid5
+
+from prisma.models import Board
+from pydantic import ValidationError
+
+# Change from relative to absolute imports
+from db.client import prisma
+from db.routing import reader
+from schemas.models import BoardBase, BoardElementBase
+from services.element_service import CONTAINER_TYPES, prepare_element_data
+from services.operation_log import write_snapshot
+from utils.metrics import record_elements
+from utils.serialization import dumps, element_to_dict
+
+# Rows read per export query and inserted per create_many on import
+TRANSFER_CHUNK_SIZE = 1000
+# A single NDJSON line larger than this is rejected instead of buffered
+MAX_LINE_BYTES = 1024 * 1024
+IMPORT_TIMEOUT = timedelta(seconds=float(os.environ.get("BOARD_IMPORT_TIMEOUT", "300")))
+
+# Element fields that reference other elements and must follow them to new IDs
+ELEMENT_REFERENCE_FIELDS = ("fromElementId", "toElementId")
+
+class BoardImportError(ValueError):
+    """Raised for malformed import streams; carries the offending line number"""
+
+    def __init__(self, line_number: int, message: str):
+        super().__init__(f"Line {line_number}: {message}")
+        self.line_number = line_number
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines without holding more than one line in memory"""
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if len(line) > MAX_LINE_BYTES:
+                raise BoardImportError(line_number, f"line exceeds {MAX_LINE_BYTES} bytes")
+            yield line
+        # The unfinished line is the next one; reject it before buffering any more of it
+        if len(buffer) > MAX_LINE_BYTES:
+            raise BoardImportError(line_number + 1, f"line exceeds {MAX_LINE_BYTES} bytes")
+    if buffer:
+        yield buffer
+
+async def iter_file_chunks(file: BinaryIO, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """Read a spooled request body back in chunks, from the start"""
+    file.seek(0)
+    while chunk := file.read(chunk_size):
+        yield chunk
+
+def _remap_id(namespace: str, element_id: str) -> str:
+    # Deterministic, so references can be rewritten before their target is seen
+    return str(uuid5(NAMESPACE_URL, f"{namespace}/{element_id}"))
+
+async def _hierarchy_is_valid(client, board_id: str) -> bool:
+    """Whether every parent on a board is a group or frame there and the parent links form no cycle"""
+    # Elements with a missing parent, or caught in a cycle, are unreachable from the top level
+    rows = await client.query_raw(
+        '''
+        WITH RECURSIVE reachable AS (
+            SELECT "id", "type" FROM "BoardElement" WHERE "boardId" = $1 AND "parentId" IS NULL
+            UNION ALL
+            SELECT c."id", c."type" FROM "BoardElement" c JOIN reachable r ON c."parentId" = r."id"
+            WHERE r."type" = ANY($2::text[])
+        )
+        SELECT (SELECT count(*) FROM reachable) = (SELECT count(*) FROM "BoardElement" WHERE "boardId" = $1) AS "valid"
+        ''',
+        board_id, list(CONTAINER_TYPES)
+    )
+    return bool(rows[0]["valid"])
+
+async def _restore_dangling_references(client, board_id: str, references: Dict[str, Dict[str, List[str]]]) -> None:
+    """Put back the original ID of every connector reference whose target never arrived"""
+    # references maps connector id -> field -> [remapped id, original id]
+    await client.execute_raw(
+        '''
+        UPDATE "BoardElement" e SET "content" = e."content" || fix."restored"
+        FROM (
+            SELECT ref.key AS "id", jsonb_object_agg(f.key, f.value->1) AS "restored"
+            FROM jsonb_each($2::jsonb) AS ref(key, value), jsonb_each(ref.value) AS f(key, value)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM "BoardElement" t WHERE t."boardId" = $1 AND t."id" = f.value->>0
+            )
+            GROUP BY ref.key
+        ) fix
+        WHERE e."id" = fix."id" AND e."boardId" = $1
+        ''',
+        board_id, json.dumps(references)
+    )
+
+class BoardTransferService:
+    @staticmethod
+    async def export_board(board_id: str) -> AsyncIterator[bytes]:
+        """
+        Stream a board as NDJSON: one "board" header line, then one line per element.
+
+        Elements are read in keyset pages on id, so memory stays flat for any board size.
+        """
+        # Board and element pages come from one client so they describe the same revision history
+        client = reader()
+        board = await client.board.find_unique(where={"id": board_id})
+        if not board:
+            return
+
+        yield dumps({"kind": "board", "title": board.title, "description": board.description}) + b"\n"
+
+        last_id: Optional[str] = None
+        while True:
+            where_clause: Dict[str, Any] = {"boardId": board_id}
+            if last_id:
+                where_clause["id"] = {"gt": last_id}
+            elements = await client.boardelement.find_many(
+                where=where_clause,
+                order={"id": "asc"},
+                take=TRANSFER_CHUNK_SIZE
+            )
+            if not elements:
+                break
+            record_elements(len(elements))
+
+            yield b"".join(
+                dumps({"kind": "element", **element_to_dict(element)}) + b"\n"
+                for element in elements
+            )
+            last_id = elements[-1].id
+
+    @staticmethod
+    async def import_board(
+        user_id: str,
+        lines: AsyncIterator[bytes],
+        on_progress: Optional[Callable[[int], Awaitable[None]]] = None
+    ) -> Board:
+        """
+        Create a board from an NDJSON stream produced by export_board.
+
+        Elements get new IDs (parentId and connector references follow them;
+        a connector reference to an element not in the stream keeps its
+        original ID, as duplicate_board does) and are inserted in create_many chunks inside one transaction, so a bad
+        line anywhere leaves nothing behind. Children may come before their
+        parents; the hierarchy is checked once everything is in. on_progress, when given, is awaited with the
+        number of elements inserted so far after each chunk.
+
+        Raises:
+            BoardImportError: If the stream is empty, a line is invalid, or a
+                parentId does not point at a group or frame in the stream
+        """
+        namespace = str(uuid4())
+        line_number = 0
+        imported = 0
+        references: Dict[str, Dict[str, List[str]]] = {}
+
+        async with prisma.tx(timeout=IMPORT_TIMEOUT) as transaction:
+            board: Optional[Board] = None
+            chunk: List[Dict[str, Any]] = []
+
+            async for line in lines:
+                line_number += 1
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise BoardImportError(line_number, f"invalid JSON ({e})")
+
+                if board is None:
+                    if record.get("kind") != "board":
+                        raise BoardImportError(line_number, "first line must be the board header")
+                    try:
+                        header = BoardBase(**record)
+                    except ValidationError as e:
+                        raise BoardImportError(line_number, str(e))
+                    board = await transaction.board.create(
+                        data={
+                            "userId": user_id,
+                            "title": header.title,
+                            "description": header.description,
+                            "revision": 1
+                        }
+                    )
+                    continue
+
+                try:
+                    element = BoardElementBase(**record).dict()
+                except ValidationError as e:
+                    raise BoardImportError(line_number, str(e))
+                element_id = _remap_id(namespace, str(record.get("id") or uuid4()))
+                # Targets may come later in the stream, so remap now and undo dangling ones at the end
+                for field in ELEMENT_REFERENCE_FIELDS:
+                    target = element["content"].get(field)
+                    if isinstance(target, str):
+                        element["content"][field] = _remap_id(namespace, target)
+                        references.setdefault(element_id, {})[field] = [element["content"][field], target]
+                if element["parentId"]:
+                    element["parentId"] = _remap_id(namespace, element["parentId"])
+
+                chunk.append({
+                    **prepare_element_data(element),
+                    "id": element_id,
+                    "boardId": board.id,
+                    "revision": 1
+                })
+                if len(chunk) >= TRANSFER_CHUNK_SIZE:
+                    await transaction.boardelement.create_many(data=chunk)
+                    imported += len(chunk)
+                    chunk = []
+                    if on_progress:
+                        await on_progress(imported)
+
+            if board is None:
+                raise BoardImportError(line_number, "stream is empty")
+            if chunk:
+                await transaction.boardelement.create_many(data=chunk)
+                imported += len(chunk)
+                if on_progress:
+                    await on_progress(imported)
+            if references:
+                await _restore_dangling_references(transaction, board.id, references)
+            if not await _hierarchy_is_valid(transaction, board.id):
+                raise BoardImportError(
+                    line_number, "every parentId must name a group or frame in the stream, without cycles"
+                )
+            # History for the new board starts from a snapshot of what was imported
+            await write_snapshot(transaction, board.id)
+
+        return board
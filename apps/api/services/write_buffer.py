@@ -0,0 +1,161 @@
+# Write-behind buffer that coalesces element geometry updates before they hit the database
+
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Only these fields may be buffered; anything else is written through immediately
+BUFFERABLE_FIELDS = frozenset({"position", "size"})
+
+FlushFunction = Callable[[List[Dict[str, Any]]], Awaitable[Any]]
+
+class ElementWriteBuffer:
+    """
+    Merges position/size updates per element for a short window and flushes them in batch.
+
+    A drag that sends twenty PUTs inside one window becomes one row update. Pending
+    values stay visible to readers through pending_changes(), including while a
+    flush is in flight, so clients never read a position older than one they just wrote.
+    """
+
+    def __init__(self, flush: FlushFunction, window: float = 0.075):
+        self._flush_fn = flush
+        self.window = window
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._flushing: Dict[str, Dict[str, Any]] = {}
+        self._board_ids: Dict[str, str] = {}
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._stats = {
+            "updatesReceived": 0,
+            "writesAbsorbed": 0,
+            "rowsFlushed": 0,
+            "flushes": 0,
+            "rowsFailed": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def accepts(self, data: Dict[str, Any]) -> bool:
+        """Whether an update only touches bufferable fields"""
+        return self.enabled and bool(data) and set(data) <= BUFFERABLE_FIELDS
+
+    def add(self, element_id: str, board_id: str, changes: Dict[str, Any]) -> None:
+        """Merge an update into the buffer and make sure a flush is scheduled"""
+        self._stats["updatesReceived"] += 1
+        if element_id in self._pending:
+            self._stats["writesAbsorbed"] += 1
+            self._pending[element_id].update(changes)
+        else:
+            self._pending[element_id] = dict(changes)
+        self._board_ids[element_id] = board_id
+
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    def take(self, element_id: str) -> Dict[str, Any]:
+        """Remove and return an element's buffered changes so a direct write can include them"""
+        changes = self._pending.pop(element_id, {})
+        if element_id not in self._flushing:
+            self._board_ids.pop(element_id, None)
+        return changes
+
+    def restore(self, element_id: str, board_id: str, changes: Dict[str, Any]) -> None:
+        """Put back changes taken for a write that failed; anything buffered since wins over them"""
+        if not changes:
+            return
+        self._pending[element_id] = {**changes, **self._pending.get(element_id, {})}
+        self._board_ids[element_id] = board_id
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    @contextmanager
+    def taken(self, element_id: str) -> Iterator[Dict[str, Any]]:
+        """take() for a direct write, restoring the changes if the block raises"""
+        board_id = self._board_ids.get(element_id)
+        changes = self.take(element_id)
+        try:
+            yield changes
+        except BaseException:
+            if board_id is not None:
+                self.restore(element_id, board_id, changes)
+            raise
+
+    async def settle(self, element_ids: Iterable[str]) -> None:
+        """
+        Wait until no flush in flight includes any of these elements.
+
+        Direct writes call this first, so an older buffered position that is
+        already being written cannot land after them and overwrite them.
+        """
+        element_ids = set(element_ids)
+        while not element_ids.isdisjoint(self._flushing):
+            # flush() holds the lock for as long as its batch is in flight
+            async with self._lock:
+                pass
+
+    def discard(self, element_ids: Iterable[str]) -> None:
+        """Forget buffered changes for elements that are being deleted"""
+        for element_id in element_ids:
+            self.take(element_id)
+
+    def pending_changes(self, element_id: str) -> Dict[str, Any]:
+        """Changes not yet committed for an element, newest last"""
+        return {**self._flushing.get(element_id, {}), **self._pending.get(element_id, {})}
+
+    def pending_for_board(self, board_id: str) -> Dict[str, Dict[str, Any]]:
+        """pending_changes() of every buffered element of a board, by element ID"""
+        return {
+            element_id: self.pending_changes(element_id)
+            for element_id, element_board_id in self._board_ids.items()
+            if element_board_id == board_id
+        }
+
+    def has_pending_for_board(self, board_id: str) -> bool:
+        return any(
+            self._board_ids.get(element_id) == board_id
+            for element_id in (*self._pending, *self._flushing)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "pending": len(self._pending) + len(self._flushing)}
+
+    async def flush(self) -> None:
+        """Write every buffered update in one batch"""
+        async with self._lock:
+            if not self._pending:
+                return
+
+            self._flushing, self._pending = self._pending, {}
+            batch = [{"id": element_id, **changes} for element_id, changes in self._flushing.items()]
+            try:
+                await self._flush_fn(batch)
+                self._stats["rowsFlushed"] += len(batch)
+            except Exception:
+                self._stats["rowsFailed"] += len(batch)
+                logger.exception("Failed to flush %d buffered element updates", len(batch))
+            finally:
+                self._stats["flushes"] += 1
+                for element_id in self._flushing:
+                    if element_id not in self._pending:
+                        self._board_ids.pop(element_id, None)
+                self._flushing = {}
+
+    async def close(self) -> None:
+        """Cancel the timer and flush whatever is still buffered"""
+        if self._timer and not self._timer.done():
+            self._timer.cancel()
+        self._timer = None
+        await self.flush()
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        await self.flush()
+        # Updates that arrived during the flush need their own window
+        if self._pending:
+            self._timer = asyncio.create_task(self._flush_later())
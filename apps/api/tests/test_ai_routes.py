@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("prisma.models", reason="needs the generated Prisma client (prisma generate)")
+
+from fastapi import HTTPException
+
+from routes import ai
+from routes.ai import AIGenerateRequest, InvalidModelOutput, _valid_elements
+
+NOTE = {"type": "sticky-note", "content": {"text": "goals"}, "position": {"x": 0, "y": 0}, "zIndex": 0}
+
+
+class FakeRequest:
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def saved(monkeypatch, make_element):
+    """Replace the model and the database: returns the list of element batches saved"""
+    batches = []
+
+    async def create_elements(board_id, elements):
+        batches.append(elements)
+        return [make_element(f"e{index}", board_id) for index in range(len(elements))]
+
+    async def has_access(board_id, user_id):
+        return True
+
+    monkeypatch.setattr(ai.BoardElementService, "create_elements", create_elements)
+    monkeypatch.setattr(ai.BoardAccessService, "has_access", has_access)
+    return batches
+
+
+def generates(monkeypatch, elements):
+    async def generate(text, board_id):
+        return [dict(element, boardId=board_id) if isinstance(element, dict) else element for element in elements]
+
+    monkeypatch.setattr(ai.AIService, "generate_elements_from_text", generate)
+
+
+def test_invalid_elements_are_dropped():
+    elements = [NOTE, {"type": "hologram", "content": {}, "position": {"x": 0, "y": 0}}, {"type": "text"}, "nonsense"]
+    assert [element["content"] for element in _valid_elements(elements)] == [{"text": "goals"}]
+    assert _valid_elements([]) == []
+
+
+def test_all_invalid_elements_raise():
+    with pytest.raises(InvalidModelOutput):
+        _valid_elements([{"type": "text"}])
+
+
+def test_generate_saves_only_valid_elements(monkeypatch, saved):
+    generates(monkeypatch, [NOTE, {"position": "nowhere"}])
+    created = asyncio.run(ai.generate_elements(AIGenerateRequest(text="goals", boardId="b1"), FakeRequest(), "user-1"))
+    assert len(created) == 1 and len(saved) == 1
+
+
+def test_generate_answers_502_when_nothing_is_valid(monkeypatch, saved):
+    generates(monkeypatch, [{"position": "nowhere"}])
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(ai.generate_elements(AIGenerateRequest(text="goals", boardId="b1"), FakeRequest(), "user-1"))
+    assert raised.value.status_code == 502
+    assert saved == []
+
+
+def streams(monkeypatch, elements, events):
+    """Stream elements from the model, noting in events when each one is produced"""
+    async def stream(text, board_id):
+        for index, element in enumerate(elements):
+            events.append(f"generated {index}".encode())
+            yield dict(element, boardId=board_id) if isinstance(element, dict) else element
+
+    monkeypatch.setattr(ai.AIService, "stream_elements_from_text", stream)
+
+
+def collect_stream(events):
+    async def collect():
+        async for event in ai._stream_generated_elements("goals", "b1"):
+            events.append(event.split(b"\n")[0])
+
+    asyncio.run(collect())
+    return events
+
+
+def test_event_stream_saves_and_sends_each_element_as_it_is_generated(monkeypatch, saved):
+    events = []
+    streams(monkeypatch, [NOTE, {"position": "nowhere"}, NOTE], events)
+    collect_stream(events)
+    assert events == [
+        b"generated 0", b"event: element", b"generated 1", b"generated 2", b"event: element", b"event: done",
+    ]
+    assert [len(batch) for batch in saved] == [1, 1]
+
+
+def test_event_stream_reports_invalid_output(monkeypatch, saved):
+    events = []
+    streams(monkeypatch, ["nonsense"], events)
+    assert collect_stream(events) == [b"generated 0", b"event: error"]
+    assert saved == []
+
+
+def test_event_stream_reports_how_many_were_saved_before_a_failure(monkeypatch, saved):
+    async def stream(text, board_id):
+        yield dict(NOTE, boardId=board_id)
+        raise ai.LLMTimeoutError("Model call timed out after 30s")
+
+    monkeypatch.setattr(ai.AIService, "stream_elements_from_text", stream)
+
+    async def collect():
+        return [event async for event in ai._stream_generated_elements("goals", "b1")]
+
+    events = asyncio.run(collect())
+    assert events[-1].startswith(b"event: error") and b'"count":1' in events[-1]
@@ -0,0 +1,84 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("prisma.models", reason="needs the generated Prisma client (prisma generate)")
+
+from services import board_state
+from services.analysis_service import BoardAnalysisEngine, BoardAnalysisState, cluster_points
+
+
+def test_cluster_points_joins_touching_cells_only():
+    points = np.array([[0, 0], [250, 10], [520, 20], [5000, 5000], [5100, 5290]], dtype=float)
+    labels = cluster_points(points, 300)
+    assert labels[0] == labels[1] == labels[2]
+    assert labels[3] == labels[4]
+    assert labels[0] != labels[3]
+
+
+def test_cluster_points_handles_an_empty_board():
+    assert len(cluster_points(np.empty((0, 2)), 300)) == 0
+
+
+def test_state_updates_counts_and_clusters_incrementally(make_element):
+    state = BoardAnalysisState()
+    state.rebuild(2, [
+        make_element("a", x=0, y=0, content={"text": "launch plan"}),
+        make_element("b", x=150, y=0, content={"text": "budget"}),
+        make_element("c", x=9000, y=9000, type="shape"),
+    ])
+    report = state.report()
+    assert report["elementCount"] == 3
+    assert report["typeCounts"] == {"shape": 1, "sticky-note": 2}
+    assert report["wordCount"] == 4
+    assert [sorted(cluster["elementIds"]) for cluster in report["clusters"]] == [["a", "b"]]
+
+    assert state.apply(3, [make_element("b", revision=3, x=4000, y=0)], ["c"]) == 1
+    report = state.report()
+    assert report["revision"] == 3
+    assert report["typeCounts"] == {"sticky-note": 2}
+    assert report["clusters"] == [] and report["unclusteredNotes"] == 2
+
+
+def test_children_do_not_count_towards_bounds(make_element):
+    state = BoardAnalysisState()
+    state.rebuild(1, [
+        make_element("frame", type="frame", x=100, y=100, width=500, height=500),
+        make_element("child", x=-1000, y=-1000, parentId="frame"),
+    ])
+    assert state.report()["bounds"] == {"x0": 100, "y0": 100, "x1": 600, "y1": 600}
+
+
+def test_cold_start_loads_the_board_once(monkeypatch, fake_db, make_element):
+    fake_db.add_board(revision=2)
+    fake_db.boardelement.rows = [make_element("a"), make_element("b", revision=2)]
+    monkeypatch.setattr(board_state, "reader", lambda: fake_db)
+    engine = BoardAnalysisEngine()
+
+    report = asyncio.run(engine.analyze("b1"))
+
+    assert report["revision"] == 2 and report["elementCount"] == 2
+    assert fake_db.boardelement.calls == ["find_many"]
+    assert fake_db.boardelementtombstone.calls == []
+
+
+def test_warm_state_applies_only_the_changes(monkeypatch, fake_db, make_element):
+    board = fake_db.add_board(revision=1)
+    fake_db.boardelement.rows = [make_element("a")]
+    monkeypatch.setattr(board_state, "reader", lambda: fake_db)
+    engine = BoardAnalysisEngine()
+    asyncio.run(engine.analyze("b1"))
+
+    board.revision = 2
+    fake_db.boardelement.rows.append(make_element("b", revision=2))
+    fake_db.reset_calls()
+    report = asyncio.run(engine.analyze("b1"))
+
+    assert report["elementCount"] == 2
+    assert fake_db.boardelementtombstone.calls == ["find_many"]
+
+
+def test_missing_board_is_forgotten(monkeypatch, fake_db):
+    monkeypatch.setattr(board_state, "reader", lambda: fake_db)
+    assert asyncio.run(BoardAnalysisEngine().analyze("missing")) is None
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("prisma.models", reason="needs the generated Prisma client (prisma generate)")
+
+from services import board_service
+from services.board_service import BoardService, decode_board_cursor, encode_board_cursor
+from conftest import EPOCH
+
+
+class FakeBoards:
+    """board.find_many for the keyset query of get_all_boards"""
+
+    def __init__(self, boards):
+        self.boards = boards
+
+    async def find_many(self, where, order, take):
+        def after_cursor(board):
+            if "OR" not in where:
+                return True
+            older, same_time = where["OR"]
+            return (board.updatedAt < older["updatedAt"]["lt"]
+                    or (board.updatedAt == same_time["updatedAt"] and board.id < same_time["id"]["lt"]))
+
+        rows = [board for board in self.boards if board.userId == where["userId"] and after_cursor(board)]
+        rows.sort(key=lambda board: (board.updatedAt, board.id), reverse=True)
+        return rows[:take]
+
+
+def test_cursor_round_trip():
+    board = SimpleNamespace(id="b1", updatedAt=EPOCH)
+    assert decode_board_cursor(encode_board_cursor(board)) == (EPOCH, "b1")
+
+
+def test_malformed_cursor_raises_value_error():
+    with pytest.raises(ValueError):
+        decode_board_cursor("bm90IGpzb24=")
+
+
+def test_following_cursors_visits_every_board_once(monkeypatch):
+    # Pairs of boards share an updatedAt, so pages must also break ties on id
+    boards = [
+        SimpleNamespace(id=f"b{index:02d}", userId="u1", updatedAt=EPOCH + timedelta(minutes=index // 2))
+        for index in range(11)
+    ] + [SimpleNamespace(id="other", userId="u2", updatedAt=EPOCH)]
+    monkeypatch.setattr(board_service, "reader", lambda: SimpleNamespace(board=FakeBoards(boards)))
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page, cursor = asyncio.run(BoardService.get_all_boards("u1", limit=3, cursor=cursor))
+        seen.extend(board.id for board in page)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert pages == 4
+    assert seen == sorted((board.id for board in boards[:11]), reverse=True)
@@ -0,0 +1,197 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("prisma.models", reason="needs the generated Prisma client (prisma generate)")
+
+from services import element_service
+from services.element_service import BoardElementService
+
+
+class FakeTransaction:
+    """A transaction in which another writer changes the element right after the first read"""
+
+    def __init__(self, reads):
+        self.reads = list(reads)
+        self.last_read = None
+        self.statements = []
+        self.boardelement = SimpleNamespace(find_unique=self._find_unique, update=self._update)
+        self.board = SimpleNamespace(update=self._bump)
+
+    async def _find_unique(self, where):
+        self.last_read = self.reads.pop(0)
+        return self.last_read
+
+    async def _bump(self, where, data):
+        return SimpleNamespace(id=where["id"], revision=5)
+
+    async def _update(self, where, data):
+        return self.last_read.model_copy(update=data)
+
+    async def execute_raw(self, *args):
+        self.statements.append(args)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def transaction(monkeypatch):
+    def install(*reads):
+        tx = FakeTransaction(reads)
+        monkeypatch.setattr(element_service, "prisma", SimpleNamespace(tx=lambda: tx))
+        return tx
+
+    async def no_snapshot(board):
+        return None
+
+    monkeypatch.setattr(element_service.BoardService, "snapshot_if_needed", no_snapshot)
+    return install
+
+
+def test_update_logs_the_state_read_after_the_revision_bump(transaction, make_element):
+    stale = make_element("e1", zIndex=1)
+    current = make_element("e1", zIndex=3)
+    tx = transaction(stale, current)
+
+    asyncio.run(BoardElementService.update_element("e1", {"zIndex": 7}))
+
+    (statement,) = tx.statements
+    (entry,) = json.loads(statement[2])
+    assert entry["before"] == {"zIndex": 3} and entry["after"] == {"zIndex": 7}
+
+
+def test_update_of_an_element_deleted_meanwhile_returns_none(transaction, make_element):
+    tx = transaction(make_element("e1"), None)
+    assert asyncio.run(BoardElementService.update_element("e1", {"zIndex": 7})) is None
+    assert tx.statements == []
+
+
+
+def test_failed_update_puts_buffered_geometry_back(transaction, make_element):
+    buffer = element_service.element_write_buffer
+    tx = transaction(make_element("e1"), make_element("e1"))
+
+    async def fail(where, data):
+        raise RuntimeError("connection lost")
+
+    tx.boardelement.update = fail
+
+    async def scenario():
+        buffer.add("e1", "b1", {"position": {"x": 5, "y": 6}})
+        result = await BoardElementService.update_element("e1", {"zIndex": 7})
+        return result, buffer.take("e1")
+
+    result, still_buffered = asyncio.run(scenario())
+    assert result is None
+    assert still_buffered == {"position": {"x": 5, "y": 6}}
+
+class LockingDatabase:
+    """
+    prisma for the batched writers: reads outside a transaction see stale rows,
+    reads inside one see the current rows, and every step is recorded in order.
+    """
+
+    def __init__(self, stale, current):
+        self.steps = []
+        self.logged = []
+        self.boardelement = SimpleNamespace(find_many=self._rows(stale, "read"))
+        self.board = SimpleNamespace(find_unique=self._board, find_many=self._boards)
+        self._transaction = SimpleNamespace(
+            query_raw=self._lock,
+            boardelement=SimpleNamespace(find_many=self._rows(current, "read in tx")),
+            batch_=self._batch,
+        )
+
+    def _rows(self, rows, step):
+        async def find_many(where, **kwargs):
+            self.steps.append(step)
+            return [row for row in rows if row.id in where["id"]["in"]]
+        return find_many
+
+    async def _board(self, where):
+        return SimpleNamespace(id=where["id"], revision=5, snapshotRevision=5, compactedRevision=0)
+
+    async def _boards(self, where):
+        return [await self._board({"id": board_id}) for board_id in where["id"]["in"]]
+
+    async def _lock(self, query, board_ids):
+        assert "FOR UPDATE" in query
+        self.steps.append(("lock", board_ids))
+        return []
+
+    def _batch(self):
+        database = self
+
+        class Batch:
+            board = SimpleNamespace(update=lambda **kwargs: None)
+            boardelement = SimpleNamespace(update=lambda **kwargs: None, create_many=lambda **kwargs: None)
+
+            def execute_raw(self, query, *args):
+                if '"BoardOperation"' in query:
+                    database.logged.extend(json.loads(args[1]))
+
+            async def __aenter__(self):
+                database.steps.append("write")
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Batch()
+
+    def tx(self):
+        database = self
+
+        class Transaction:
+            async def __aenter__(self):
+                return database._transaction
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Transaction()
+
+
+@pytest.fixture
+def locking_db(monkeypatch):
+    def install(stale, current):
+        database = LockingDatabase(stale, current)
+        monkeypatch.setattr(element_service, "prisma", database)
+        return database
+
+    async def no_snapshot(board):
+        return None
+
+    monkeypatch.setattr(element_service.BoardService, "snapshot_if_needed", no_snapshot)
+    return install
+
+
+def test_apply_batch_reads_before_images_under_the_board_lock(locking_db, make_element):
+    database = locking_db([make_element("e1", zIndex=1)], [make_element("e1", zIndex=3)])
+
+    results = asyncio.run(BoardElementService.apply_batch("b1", [{"op": "update", "id": "e1", "data": {"zIndex": 7}}]))
+
+    assert results[0]["ok"]
+    assert database.steps[:3] == [("lock", ["b1"]), "read in tx", "write"]
+    (entry,) = database.logged
+    assert entry["before"] == {"zIndex": 3} and entry["after"] == {"zIndex": 7}
+
+
+def test_batch_update_reads_before_images_under_the_board_locks(locking_db, make_element):
+    database = locking_db(
+        [make_element("e1", zIndex=1), make_element("e2", board_id="a1", zIndex=1)],
+        [make_element("e1", zIndex=3), make_element("e2", board_id="a1", zIndex=4)],
+    )
+
+    asyncio.run(BoardElementService.batch_update_elements([
+        {"id": "e1", "zIndex": 7}, {"id": "e2", "zIndex": 8}, {"id": "missing", "zIndex": 9},
+    ]))
+
+    assert database.steps[:4] == ["read", ("lock", ["a1", "b1"]), "read in tx", "write"]
+    assert sorted((entry["elementId"], entry["before"]["zIndex"]) for entry in database.logged) == [("e1", 3), ("e2", 4)]
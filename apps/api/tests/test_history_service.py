@@ -0,0 +1,99 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("prisma.models", reason="needs the generated Prisma client (prisma generate)")
+
+from services import history_service
+from services.history_service import _forward_operations, _inverse_operations, _redo_target, _undo_target
+from services.operation_log import (
+    ACTION_EDIT as EDIT, ACTION_REDO as REDO, ACTION_UNDO as UNDO,
+    OP_CREATE, OP_DELETE, OP_UPDATE, log_statement, replay, update_entry,
+)
+
+
+class FakeLog:
+    """Answers _revision_actions' paged query from (revision, action, targetRevision) rows"""
+
+    def __init__(self, *rows):
+        self.rows = sorted(rows, reverse=True)
+        self.pages = 0
+
+    async def query_raw(self, sql, board_id, before, limit):
+        self.pages += 1
+        rows = [row for row in self.rows if row[0] < before][:limit]
+        return [{"revision": revision, "action": action, "targetRevision": target} for revision, action, target in rows]
+
+
+def targets(monkeypatch, *rows, page_size=200):
+    log = FakeLog(*rows)
+    monkeypatch.setattr(history_service, "prisma", log)
+    monkeypatch.setattr(history_service, "HISTORY_SCAN_PAGE_SIZE", page_size)
+    return asyncio.run(_undo_target("b1")), asyncio.run(_redo_target("b1"))
+
+
+def test_empty_history_has_nothing_to_undo_or_redo(monkeypatch):
+    assert targets(monkeypatch) == (None, None)
+
+
+def test_undo_pops_edits_and_redo_follows_undos(monkeypatch):
+    # Edit 1, edit 2, undo 2, undo 1
+    assert targets(monkeypatch, (1, EDIT, None), (2, EDIT, None), (3, UNDO, 2)) == (1, 2)
+    assert targets(monkeypatch, (1, EDIT, None), (2, EDIT, None), (3, UNDO, 2), (4, UNDO, 1)) == (None, 1)
+
+
+def test_redo_is_undone_as_its_target(monkeypatch):
+    # Edit 1, undo 1, redo 1: the next undo reverts revision 1 again, and there is nothing to redo
+    assert targets(monkeypatch, (1, EDIT, None), (2, UNDO, 1), (3, REDO, 1)) == (1, None)
+
+
+def test_new_edit_clears_the_redo_stack(monkeypatch):
+    assert targets(monkeypatch, (1, EDIT, None), (2, UNDO, 1), (3, EDIT, None)) == (3, None)
+
+
+def test_scan_pages_through_long_undo_runs(monkeypatch):
+    edits = [(revision, EDIT, None) for revision in range(1, 11)]
+    undos = [(10 + step, UNDO, 11 - step) for step in range(1, 10)]
+    assert targets(monkeypatch, *edits, *undos, page_size=3) == (1, 2)
+
+
+def operation(op, element_id, before=None, after=None):
+    return SimpleNamespace(op=op, elementId=element_id, before=before, after=after)
+
+
+def test_inverse_and_forward_operations():
+    logged = [
+        operation(OP_CREATE, "a", after={"type": "text"}),
+        operation(OP_UPDATE, "b", before={"zIndex": 1}, after={"zIndex": 2}),
+        operation(OP_DELETE, "c", before={"type": "shape"}),
+    ]
+    assert _inverse_operations(logged) == [
+        {"op": "create", "id": "c", "data": {"type": "shape"}},
+        {"op": "update", "id": "b", "data": {"zIndex": 1}},
+        {"op": "delete", "id": "a", "data": None},
+    ]
+    assert [(step["op"], step["data"]) for step in _forward_operations(logged)] == [
+        ("create", {"type": "text"}), ("update", {"zIndex": 2}), ("delete", None),
+    ]
+
+
+def test_update_entry_logs_only_changed_fields():
+    state = {"type": "text", "content": {"text": "a"}, "position": {"x": 0, "y": 0}, "size": None,
+             "style": None, "zIndex": 0, "parentId": None}
+    entry = update_entry("e1", state, {"zIndex": 0, "position": {"x": 5, "y": 0}})
+    assert entry == {"op": OP_UPDATE, "elementId": "e1",
+                     "before": {"position": {"x": 0, "y": 0}}, "after": {"position": {"x": 5, "y": 0}}}
+    assert update_entry("e1", state, {"position": {"x": 5, "y": 0}}) is None
+
+
+def test_replay_and_log_statement():
+    logged = [operation(OP_CREATE, "b", after={"zIndex": 1}), operation(OP_UPDATE, "a", after={"zIndex": 3}),
+              operation(OP_DELETE, "c")]
+    state = replay([{"id": "a", "zIndex": 0}, {"id": "c", "zIndex": 0}], logged)
+    assert state == {"a": {"id": "a", "zIndex": 3}, "b": {"id": "b", "zIndex": 1}}
+
+    sql, board_id, entries, action, target = log_statement("b1", [{"op": OP_DELETE}], UNDO, 7)
+    assert 'INSERT INTO "BoardOperation"' in sql
+    assert (board_id, json.loads(entries), action, target) == ("b1", [{"op": OP_DELETE}], UNDO, 7)
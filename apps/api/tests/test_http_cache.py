@@ -0,0 +1,60 @@
+import asyncio
+
+from starlette.requests import Request
+
+from utils.http_cache import ResponseCache, cached_json_response, etag_matches, make_etag, response_cache
+
+
+def request_with(if_none_match: str = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_make_etag_is_stable_and_quoted():
+    etag = make_etag("b1", 7, "elements")
+    assert etag == make_etag("b1", 7, "elements")
+    assert etag != make_etag("b1", 8, "elements")
+    assert etag.startswith('"') and etag.endswith('"')
+
+
+def test_etag_matches_lists_wildcards_and_weak_tags():
+    etag = make_etag("b1", 1)
+    assert not etag_matches(request_with(), etag)
+    assert etag_matches(request_with(etag), etag)
+    assert etag_matches(request_with(f'"other", W/{etag}'), etag)
+    assert etag_matches(request_with("*"), etag)
+    assert not etag_matches(request_with(make_etag("b1", 2)), etag)
+
+
+def test_invalidate_board_only_drops_that_board():
+    cache = ResponseCache()
+    cache.set(("b1", "elements", 1, "json"), b"[]")
+    cache.set(("b2", "elements", 1, "json"), b"[]", elements=3)
+    cache.invalidate_board("b1")
+    assert cache.get(("b1", "elements", 1, "json")) is None
+    assert cache.get(("b2", "elements", 1, "json")) == (b"[]", 3)
+
+
+def test_cached_json_response_renders_once_and_answers_304():
+    renders = []
+
+    async def render():
+        renders.append(1)
+        return b'{"ok":true}'
+
+    async def respond(if_none_match=None):
+        return await cached_json_response(request_with(if_none_match), key, etag, render, vary="Accept")
+
+    key, etag = ("b1", "test", 1, "json"), make_etag("b1", "test", 1)
+    response_cache.clear()
+    try:
+        first = asyncio.run(respond())
+        second = asyncio.run(respond())
+        not_modified = asyncio.run(respond(etag))
+    finally:
+        response_cache.clear()
+
+    assert first.body == second.body == b'{"ok":true}'
+    assert len(renders) == 1
+    assert first.headers["etag"] == etag and first.headers["vary"] == "Accept"
+    assert not_modified.status_code == 304 and not_modified.body == b""
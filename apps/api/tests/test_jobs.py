@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("prisma.models", reason="needs the generated Prisma client (prisma generate)")
+
+from services.jobs import CANCELLED, FAILED, RUNNING, SUCCEEDED, InMemoryJobStore, JobQueueFullError, JobScheduler
+
+
+def scheduler(**kwargs) -> JobScheduler:
+    return JobScheduler(InMemoryJobStore(), **kwargs)
+
+
+async def until(condition, timeout: float = 1.0) -> None:
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.001)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_workers_bound_how_many_jobs_run_at_once():
+    async def scenario():
+        jobs = scheduler(max_workers=2)
+        active, most_active = [0], [0]
+
+        async def work(job):
+            active[0] += 1
+            most_active[0] = max(most_active[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+
+        submitted = [await jobs.submit("u1", "test", work) for _ in range(6)]
+        await until(lambda: jobs.stats()["succeeded"] == 6)
+        statuses = [(await jobs.get(job.id)).status for job in submitted]
+        await jobs.close()
+        return most_active[0], statuses
+
+    most_active, statuses = asyncio.run(scenario())
+    assert most_active == 2
+    assert statuses == [SUCCEEDED] * 6
+
+
+def test_users_take_turns():
+    async def scenario():
+        jobs = scheduler(max_workers=1)
+        order = []
+
+        def work(name):
+            async def run(job):
+                order.append(name)
+            return run
+
+        for name in ("a0", "a1", "a2"):
+            await jobs.submit("a", "test", work(name))
+        await jobs.submit("b", "test", work("b0"))
+        await until(lambda: len(order) == 4)
+        await jobs.close()
+        return order
+
+    assert asyncio.run(scenario()) == ["a0", "b0", "a1", "a2"]
+
+
+def test_queue_limit_per_user():
+    async def scenario():
+        jobs = scheduler(max_workers=1, max_queued_per_user=2)
+        release = asyncio.Event()
+
+        async def wait(job):
+            await release.wait()
+
+        await jobs.submit("a", "test", wait)
+        await asyncio.sleep(0)  # the worker takes the first job off the queue
+        await jobs.submit("a", "test", wait)
+        await jobs.submit("a", "test", wait)
+        with pytest.raises(JobQueueFullError):
+            await jobs.submit("a", "test", wait)
+        other = await jobs.submit("b", "test", wait)
+        release.set()
+        await jobs.close()
+        return other
+
+    assert asyncio.run(scenario()).userId == "b"
+
+
+def test_progress_is_saved_and_completes_at_total():
+    async def scenario():
+        jobs = scheduler(max_workers=1)
+        reported, release = asyncio.Event(), asyncio.Event()
+
+        async def work(context):
+            await context.progress(1, total=3)
+            reported.set()
+            await release.wait()
+            return "done"
+
+        job = await jobs.submit("u1", "import", work)
+        await reported.wait()
+        midway = await jobs.get(job.id)
+        release.set()
+        await until(lambda: jobs.stats()["succeeded"] == 1)
+        finished = await jobs.get(job.id)
+        await jobs.close()
+        return midway, finished
+
+    midway, finished = asyncio.run(scenario())
+    assert (midway.status, midway.progress, midway.total) == (RUNNING, 1, 3)
+    assert (finished.status, finished.progress, finished.result) == (SUCCEEDED, 3, "done")
+
+
+def test_failures_are_recorded():
+    async def scenario():
+        jobs = scheduler(max_workers=1)
+
+        async def work(job):
+            raise ValueError("no such board")
+
+        job = await jobs.submit("u1", "test", work)
+        await until(lambda: jobs.stats()["failed"] == 1)
+        failed = await jobs.get(job.id)
+        await jobs.close()
+        return failed
+
+    failed = asyncio.run(scenario())
+    assert (failed.status, failed.error) == (FAILED, "no such board")
+
+
+def test_cancel_queued_and_running_jobs_and_keep_the_worker():
+    async def scenario():
+        jobs = scheduler(max_workers=1)
+        started, ran = asyncio.Event(), []
+
+        async def block(job):
+            started.set()
+            await asyncio.Event().wait()
+
+        async def record(job):
+            ran.append(job.job.id)
+
+        running = await jobs.submit("u1", "test", block)
+        queued = await jobs.submit("u1", "test", record)
+        await started.wait()
+        cancelled_queued = await jobs.cancel(queued.id)
+        cancelled_running = await jobs.cancel(running.id)
+        after = await jobs.submit("u1", "test", record)
+        await until(lambda: ran)
+        await jobs.close()
+        return cancelled_queued.status, cancelled_running.status, ran, after.id
+
+    queued_status, running_status, ran, after_id = asyncio.run(scenario())
+    assert (queued_status, running_status) == (CANCELLED, CANCELLED)
+    # The cancelled queued job never ran, and the worker went on to the next one
+    assert ran == [after_id]
+
+
+def test_close_cancels_everything_and_stops_the_workers():
+    async def scenario():
+        jobs = scheduler(max_workers=1)
+        started = asyncio.Event()
+
+        async def block(job):
+            started.set()
+            await asyncio.Event().wait()
+
+        running = await jobs.submit("u1", "test", block)
+        queued = await jobs.submit("u1", "test", block)
+        await started.wait()
+        workers = list(jobs._workers)
+        await jobs.close()
+        return (await jobs.get(running.id)).status, (await jobs.get(queued.id)).status, workers
+
+    running_status, queued_status, workers = asyncio.run(scenario())
+    assert (running_status, queued_status) == (CANCELLED, CANCELLED)
+    assert all(worker.done() for worker in workers)
+
+
+def test_cancel_route_answers_409_for_a_job_owned_by_another_process(monkeypatch):
+    from fastapi import HTTPException
+
+    from routes import jobs as job_routes
+    from services.jobs import Job
+
+    async def scenario():
+        jobs = scheduler()
+        # Recorded in the shared store by another process, unknown to this scheduler
+        await jobs.store.save(Job(userId="u1", kind="test", status=RUNNING, id="elsewhere"))
+        monkeypatch.setattr(job_routes, "job_scheduler", jobs)
+        await job_routes.cancel_job("elsewhere", "u1")
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(scenario())
+    assert raised.value.status_code == 409
@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest
+
+from services.llm_provider import LLMClient, LLMProvider, LLMTimeoutError, StreamedArrayParser
+
+
+class ScriptedProvider(LLMProvider):
+    """Returns canned elements, optionally after a delay, and counts its calls"""
+
+    def __init__(self, elements=None, delay: float = 0.0):
+        self.elements = elements if elements is not None else [{"type": "text", "content": {"text": "hi"}}]
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.most_active = 0
+
+    async def generate_elements(self, text):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return [dict(element) for element in self.elements]
+
+    async def stream_elements(self, text):
+        self.calls += 1
+        for element in self.elements:
+            await asyncio.sleep(self.delay)
+            yield dict(element)
+
+    async def analyze_board(self, description):
+        self.calls += 1
+        self.active += 1
+        self.most_active = max(self.most_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return {"summary": description, "suggestions": []}
+
+
+def test_parser_yields_each_element_once_it_is_complete():
+    parser = StreamedArrayParser("elements")
+    pieces = ['{"elem', 'ents": [{"type": "text", "content": {"text": "a } ] \\" {"}}', ', {"type"', ': "shape"}', "]}"]
+    yielded = [list(parser.feed(piece)) for piece in pieces]
+    assert yielded == [[], [{"type": "text", "content": {"text": 'a } ] " {'}}], [], [{"type": "shape"}], []]
+
+
+def test_parser_ignores_what_follows_the_array():
+    parser = StreamedArrayParser("elements")
+    assert list(parser.feed('{"elements": [{"id": 1}], "other": [{"id": 2}]}')) == [{"id": 1}]
+
+
+def test_default_stream_yields_the_generated_elements():
+    class OneShotProvider(LLMProvider):
+        async def generate_elements(self, text):
+            return [{"id": 1}, {"id": 2}]
+
+        async def analyze_board(self, description):
+            return {}
+
+    async def collect():
+        return [element async for element in OneShotProvider().stream_elements("x")]
+
+    assert asyncio.run(collect()) == [{"id": 1}, {"id": 2}]
+
+
+def test_streamed_elements_arrive_one_by_one_and_fill_the_cache():
+    provider = ScriptedProvider([{"id": 1}, {"id": 2}])
+    client = LLMClient(provider)
+
+    async def collect():
+        return [element async for element in client.stream_elements("two  things")]
+
+    assert asyncio.run(collect()) == [{"id": 1}, {"id": 2}]
+    assert asyncio.run(collect()) == [{"id": 1}, {"id": 2}]
+    assert provider.calls == 1
+    assert asyncio.run(client.generate_elements("two things")) == [{"id": 1}, {"id": 2}]
+    assert provider.calls == 1
+
+
+def test_stream_timeout_releases_the_concurrency_slot():
+    client = LLMClient(ScriptedProvider([{"id": 1}, {"id": 2}], delay=0.05), max_concurrency=1, timeout=0.08)
+
+    async def scenario():
+        received = []
+        with pytest.raises(LLMTimeoutError):
+            async for element in client.stream_elements("slow"):
+                received.append(element)
+        client.provider.delay = 0
+        return received, await client.analyze_board("next")
+
+    received, analysis = asyncio.run(scenario())
+    assert received == [{"id": 1}]
+    assert analysis["summary"] == "next"
+    assert client.stats()["timeouts"] == 1 and client.stats()["cached"] == 1
+
+
+def test_identical_concurrent_prompts_share_one_call():
+    provider = ScriptedProvider(delay=0.02)
+    client = LLMClient(provider)
+
+    async def scenario():
+        # Whitespace differences normalize to the same prompt
+        return await asyncio.gather(*(client.analyze_board("a  board" if i % 2 else "a board") for i in range(10)))
+
+    results = asyncio.run(scenario())
+    assert provider.calls == 1
+    # The first caller's prompt is the one sent
+    assert all(result == {"summary": "a board", "suggestions": []} for result in results)
+    assert client.stats()["coalesced"] == 9 and client.stats()["inFlight"] == 0
+    # Callers get copies, so one cannot change what the others or the cache see
+    results[0]["suggestions"].append("mine")
+    assert asyncio.run(client.analyze_board("a board"))["suggestions"] == []
+
+
+def test_concurrency_is_bounded():
+    provider = ScriptedProvider(delay=0.02)
+    client = LLMClient(provider, max_concurrency=2)
+
+    async def scenario():
+        await asyncio.gather(*(client.analyze_board(f"board {i}") for i in range(6)))
+
+    asyncio.run(scenario())
+    assert provider.calls == 6
+    assert provider.most_active == 2
+
+
+def test_timeout_raises_and_leaves_nothing_in_flight():
+    provider = ScriptedProvider(delay=1.0)
+    client = LLMClient(provider, timeout=0.02)
+
+    async def scenario():
+        results = await asyncio.gather(
+            client.analyze_board("slow"), client.analyze_board("slow"), return_exceptions=True
+        )
+        provider.delay = 0
+        return results, client.stats(), await client.analyze_board("slow")
+
+    results, stats, retry = asyncio.run(scenario())
+    assert all(isinstance(result, LLMTimeoutError) for result in results)
+    assert stats["timeouts"] == 1 and stats["inFlight"] == 0 and stats["cached"] == 0
+    # The provider call was cancelled, and the next attempt makes a fresh one
+    assert provider.active == 0
+    assert retry["summary"] == "slow" and provider.calls == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    provider = ScriptedProvider(delay=0.03)
+    client = LLMClient(provider)
+
+    async def scenario():
+        first = asyncio.ensure_future(client.analyze_board("shared"))
+        second = asyncio.ensure_future(client.analyze_board("shared"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario())["summary"] == "shared"
+    assert provider.calls == 1
+
+
+def test_least_recently_used_results_are_evicted_at_capacity():
+    provider = ScriptedProvider()
+    client = LLMClient(provider, cache_size=2)
+
+    async def scenario():
+        for prompt in ("a", "b", "a", "c"):
+            await client.analyze_board(prompt)
+        calls = provider.calls
+        # "b" was the least recently used when "c" arrived
+        await client.analyze_board("a")
+        await client.analyze_board("c")
+        cached_calls = provider.calls
+        await client.analyze_board("b")
+        return calls, cached_calls, provider.calls
+
+    assert asyncio.run(scenario()) == (3, 3, 4)
+    assert client.stats()["cached"] == 2
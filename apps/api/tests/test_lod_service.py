@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("prisma.models", reason="needs the generated Prisma client (prisma generate)")
+
+from services import board_state, element_service
+from services.lod_service import LOD_SPARSE_CELL, BoardLodEngine, BoardLodState, snap_zoom
+from services.write_buffer import ElementWriteBuffer
+
+
+def grid(make_element, count: int, spacing: float = 10.0, **fields):
+    return [
+        make_element(f"n{index}", x=(index % 10) * spacing, y=(index // 10) * spacing,
+                     width=8.0, height=8.0, zIndex=index, **fields)
+        for index in range(count)
+    ]
+
+
+def test_snap_zoom_rounds_to_half_doublings():
+    assert snap_zoom(1.0) == 1.0
+    assert snap_zoom(0.26) == 0.25
+    assert snap_zoom(1.3) == pytest.approx(2 ** 0.5)
+
+
+def test_tiny_elements_fold_into_clusters(make_element):
+    state = BoardLodState()
+    state.rebuild(1, grid(make_element, 100, style={"fill": "#ff0000"}))
+
+    close = state.select(1.0)
+    assert len(close["elements"]) == 100 and close["clusters"] == []
+
+    far = state.select(snap_zoom(0.01))
+    assert far["elements"] == []
+    assert sum(cluster["count"] for cluster in far["clusters"]) == 100
+    assert {cluster["color"] for cluster in far["clusters"]} == {"#ff0000"}
+
+
+def test_sparse_cells_return_their_elements(make_element):
+    state = BoardLodState()
+    state.rebuild(1, grid(make_element, LOD_SPARSE_CELL))
+    view = state.select(snap_zoom(0.01))
+    assert len(view["elements"]) == LOD_SPARSE_CELL and view["clusters"] == []
+
+
+def test_children_are_shown_only_with_their_parent(make_element):
+    frame = make_element("frame", type="frame", x=1000, y=1000, width=2000, height=2000)
+    child = make_element("child", x=10, y=10, width=1500, height=1500, parentId="frame", zIndex=1)
+    state = BoardLodState()
+    state.rebuild(1, [frame, child])
+
+    assert [row.id for row in state.select(1.0)["elements"]] == ["frame", "child"]
+    # The viewport test uses the frame's box, so the child comes along
+    inside = state.select(1.0, (2900, 2900, 3100, 3100))
+    assert [row.id for row in inside["elements"]] == ["frame", "child"]
+    assert state.select(1.0, (0, 0, 500, 500))["elements"] == []
+
+
+def test_changes_invalidate_cached_views(make_element):
+    rows = grid(make_element, 2, spacing=1000)
+    state = BoardLodState()
+    state.rebuild(1, rows)
+    assert state.view(1.0) is state.view(1.0)
+
+    moved = rows[0].model_copy(update={"x": 5000.0, "updatedAt": rows[0].updatedAt.replace(year=2027)})
+    assert state.apply(2, [moved], []) == 1
+    assert [row.x for row in state.select(1.0, (4000, -10, 6000, 10))["elements"]] == [5000.0]
+    assert state.apply(3, [], ["n1"]) == 1
+    assert len(state.select(1.0)["elements"]) == 1
+
+
+def test_engine_cold_start_loads_the_board_once(monkeypatch, fake_db, make_element):
+    fake_db.add_board(revision=1)
+    fake_db.boardelement.rows = grid(make_element, 5)
+    monkeypatch.setattr(board_state, "reader", lambda: fake_db)
+    engine = BoardLodEngine()
+
+    view = asyncio.run(engine.view("b1", 1.0))
+
+    assert view["revision"] == 1 and view["zoom"] == 1.0
+    assert len(view["elements"]) == 5
+    assert fake_db.boardelement.calls == ["find_many"]
+    assert asyncio.run(engine.view("missing", 1.0)) is None
+
+
+def test_views_include_buffered_geometry(monkeypatch, fake_db, make_element):
+    fake_db.add_board(revision=1)
+    fake_db.boardelement.rows = grid(make_element, 2, spacing=1000)
+    monkeypatch.setattr(board_state, "reader", lambda: fake_db)
+
+    async def never_flushed(batch):
+        raise AssertionError("the window outlives the test")
+
+    monkeypatch.setattr(element_service, "element_write_buffer", ElementWriteBuffer(never_flushed, window=60))
+    engine = BoardLodEngine()
+
+    async def scenario():
+        before = await engine.view("b1", 1.0)
+        element_service.element_write_buffer.add("n0", "b1", {"position": {"x": 5000, "y": 0}})
+        during = await engine.view("b1", 1.0)
+        element_service.element_write_buffer.discard(["n0"])
+        after = await engine.view("b1", 1.0)
+        return before, during, after
+
+    before, during, after = asyncio.run(scenario())
+    assert [row.x for row in before["elements"]] == [0.0, 1000.0]
+    assert [row.x for row in during["elements"]] == [5000.0, 1000.0]
+    # The override was for one view only
+    assert [row.x for row in after["elements"]] == [0.0, 1000.0]
+    assert after["elements"][0] is before["elements"][0]
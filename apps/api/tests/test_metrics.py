@@ -0,0 +1,84 @@
+import io
+import json
+import logging
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from utils import logging_config
+from utils.metrics import UNMATCHED_ROUTE, MetricsMiddleware, record_elements
+
+LATENCY_COUNT = "inkspiree_http_request_duration_seconds_count"
+
+
+def requests_seen(method: str, route: str, status: str) -> float:
+    labels = {"method": method, "route": route, "status": status}
+    return REGISTRY.get_sample_value(LATENCY_COUNT, labels) or 0.0
+
+
+def test_requests_are_labelled_with_the_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/api/metrics-test/{item_id}")
+    async def item(item_id: str):
+        record_elements(3)
+        return {"id": item_id}
+
+    before = requests_seen("GET", "/api/metrics-test/{item_id}", "200")
+    unmatched_before = requests_seen("GET", UNMATCHED_ROUTE, "404")
+    with TestClient(app) as client:
+        assert client.get("/api/metrics-test/first").status_code == 200
+        assert client.get("/api/metrics-test/second").status_code == 200
+        assert client.get("/api/no-such-route/third").status_code == 404
+
+    assert requests_seen("GET", "/api/metrics-test/{item_id}", "200") == before + 2
+    assert requests_seen("GET", UNMATCHED_ROUTE, "404") == unmatched_before + 1
+    assert requests_seen("GET", "/api/metrics-test/first", "200") == 0
+    elements = REGISTRY.get_sample_value(
+        "inkspiree_http_response_elements_sum", {"method": "GET", "route": "/api/metrics-test/{item_id}"}
+    )
+    assert elements >= 6
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers, root.level
+    yield root
+    logging_config.stop_logging()
+    root.handlers, root.level = handlers, level
+
+
+def test_logging_goes_through_the_queue_and_stops_on_shutdown(monkeypatch, root_logger):
+    output = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", output)
+    monkeypatch.setattr(logging_config, "LOG_FORMAT", "json")
+
+    logging_config.configure_logging("INFO")
+    listener = logging_config._listener
+    (handler,) = root_logger.handlers
+    assert isinstance(handler, logging_config._EnqueueHandler)
+    assert listener._thread is not None and listener._thread.is_alive()
+
+    fields = {"board": "b1"}
+    logging.getLogger("tests").info("saved %(board)s", fields, extra={"elements": 3})
+    logging.getLogger("tests").debug("below the level")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logging.getLogger("tests").exception("failed")
+    # The message was rendered before queueing, so later changes do not leak into it
+    fields["board"] = "changed"
+
+    thread = listener._thread
+    logging_config.stop_logging()
+    assert not thread.is_alive() and logging_config._listener is None
+
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [line["message"] for line in lines] == ["saved b1", "failed"]
+    assert lines[0]["elements"] == 3 and lines[0]["logger"] == "tests"
+    assert "ValueError: boom" in lines[1]["exception"]
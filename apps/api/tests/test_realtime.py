@@ -0,0 +1,171 @@
+import asyncio
+
+from services.realtime import (
+    ELEMENT_CREATED, ELEMENT_DELETED, ELEMENT_UPDATED, ELEMENTS_UPDATED, SLOW_CONSUMER_CLOSE_CODE,
+    BoardEventHub, InMemoryPubSub, load_backend,
+)
+
+
+class FakeSocket:
+    def __init__(self, fail: bool = False):
+        self.sent = []
+        self.fail = fail
+        self.closed_with = None
+
+    async def send_json(self, message):
+        if self.fail:
+            raise ConnectionError("socket closed")
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+class StalledSocket(FakeSocket):
+    """A client that stopped reading: sends never complete"""
+
+    async def send_json(self, message):
+        await asyncio.Event().wait()
+
+
+async def let_senders_run():
+    await asyncio.sleep(0.01)
+
+
+def element(element_id: str, x: float) -> dict:
+    return {"id": element_id, "x": x}
+
+
+def test_load_backend_defaults_to_memory():
+    assert isinstance(load_backend("memory"), InMemoryPubSub)
+    assert isinstance(load_backend("services.realtime:InMemoryPubSub"), InMemoryPubSub)
+
+
+def test_in_memory_pubsub_delivers_until_unsubscribed():
+    async def scenario():
+        backend = InMemoryPubSub()
+        received = []
+
+        async def handler(message):
+            received.append(message)
+
+        await backend.subscribe("board:1", handler)
+        await backend.publish("board:1", {"n": 1})
+        await backend.publish("board:2", {"n": 2})
+        await backend.unsubscribe("board:1", handler)
+        await backend.publish("board:1", {"n": 3})
+        return received
+
+    assert asyncio.run(scenario()) == [{"n": 1}]
+
+
+def test_updates_are_coalesced_per_element_within_a_tick():
+    async def scenario():
+        hub = BoardEventHub(backend=InMemoryPubSub(), tick_hz=100)
+        socket = FakeSocket()
+        await hub.connect("b1", socket)
+        for x in range(5):
+            await hub.publish("b1", ELEMENT_UPDATED, element("e1", x))
+        await hub.publish("b1", ELEMENT_UPDATED, element("e2", 0))
+        assert socket.sent == []
+        await asyncio.sleep(0.05)
+        return socket.sent
+
+    sent = asyncio.run(scenario())
+    assert len(sent) == 1
+    assert sent[0]["type"] == ELEMENTS_UPDATED
+    assert sent[0]["elements"] == [element("e1", 4), element("e2", 0)]
+
+
+def test_pending_updates_flush_before_other_events():
+    async def scenario():
+        hub = BoardEventHub(backend=InMemoryPubSub(), tick_hz=1)
+        socket = FakeSocket()
+        await hub.connect("b1", socket)
+        await hub.publish("b1", ELEMENT_UPDATED, element("e1", 1))
+        await hub.publish("b1", ELEMENT_DELETED, element_id="e1")
+        await let_senders_run()
+        await hub.close()
+        return socket.sent
+
+    sent = asyncio.run(scenario())
+    assert [message["type"] for message in sent] == [ELEMENTS_UPDATED, ELEMENT_DELETED]
+    assert sent[1]["elementId"] == "e1"
+
+
+def test_events_only_reach_the_boards_subscribers():
+    async def scenario():
+        hub = BoardEventHub(backend=InMemoryPubSub())
+        first, second = FakeSocket(), FakeSocket()
+        await hub.connect("b1", first)
+        await hub.connect("b2", second)
+        await hub.publish("b1", ELEMENT_CREATED, element("e1", 0))
+        await let_senders_run()
+        return first.sent, second.sent
+
+    first, second = asyncio.run(scenario())
+    assert [message["elementId"] for message in first] == ["e1"]
+    assert second == []
+
+
+def test_failed_sockets_are_dropped_and_last_disconnect_unsubscribes():
+    async def scenario():
+        backend = InMemoryPubSub()
+        hub = BoardEventHub(backend=backend)
+        healthy, broken = FakeSocket(), FakeSocket(fail=True)
+        await hub.connect("b1", healthy)
+        await hub.connect("b1", broken)
+        await hub.publish("b1", ELEMENT_CREATED, element("e1", 0))
+        await let_senders_run()
+        count = hub.subscriber_count("b1")
+        await hub.disconnect("b1", healthy)
+        return count, healthy.sent, backend._handlers
+
+    count, sent, handlers = asyncio.run(scenario())
+    assert count == 1
+    assert len(sent) == 1
+    assert handlers == {}
+
+
+def test_publish_does_not_wait_for_a_stalled_socket():
+    async def scenario():
+        hub = BoardEventHub(backend=InMemoryPubSub(), send_timeout=60)
+        healthy, stalled = FakeSocket(), StalledSocket()
+        await hub.connect("b1", stalled)
+        await hub.connect("b1", healthy)
+        await asyncio.wait_for(hub.publish("b1", ELEMENT_CREATED, element("e1", 0)), 0.1)
+        await asyncio.wait_for(hub.publish("b1", ELEMENT_CREATED, element("e2", 0)), 0.1)
+        await let_senders_run()
+        await hub.close()
+        return healthy.sent
+
+    assert [message["elementId"] for message in asyncio.run(scenario())] == ["e1", "e2"]
+
+
+def test_subscriber_with_a_full_queue_is_dropped_and_closed():
+    async def scenario():
+        hub = BoardEventHub(backend=InMemoryPubSub(), queue_size=2, send_timeout=60)
+        healthy, stalled = FakeSocket(), StalledSocket()
+        await hub.connect("b1", healthy)
+        await hub.connect("b1", stalled)
+        # One event is stuck in the stalled send, two fill its queue, the fourth overflows it
+        for index in range(4):
+            await hub.publish("b1", ELEMENT_CREATED, element(f"e{index}", 0))
+            await let_senders_run()
+        count = hub.subscriber_count("b1")
+        await hub.close()
+        return count, stalled.closed_with, len(healthy.sent)
+
+    assert asyncio.run(scenario()) == (1, SLOW_CONSUMER_CLOSE_CODE, 4)
+
+
+def test_send_timeout_drops_a_stalled_subscriber():
+    async def scenario():
+        hub = BoardEventHub(backend=InMemoryPubSub(), send_timeout=0.02)
+        stalled = StalledSocket()
+        await hub.connect("b1", stalled)
+        await hub.publish("b1", ELEMENT_CREATED, element("e1", 0))
+        await asyncio.sleep(0.1)
+        return hub.subscriber_count("b1"), stalled.closed_with
+
+    assert asyncio.run(scenario()) == (0, SLOW_CONSUMER_CLOSE_CODE)
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("prisma.models", reason="needs the generated Prisma client (prisma generate)")
+
+from db import routing
+from utils.cache import TTLCache
+
+
+class StandInClient:
+    """A client that only knows whether it is connected"""
+
+    def __init__(self, connected: bool = True):
+        self.connected = connected
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    primary, replica = StandInClient(), StandInClient()
+    monkeypatch.setattr(routing, "prisma", primary)
+    monkeypatch.setattr(routing, "replica", replica)
+    monkeypatch.setattr(routing, "_recent_writers", TTLCache(max_size=100, ttl=60))
+    return primary, replica
+
+
+def run_request(method: str, user_id: str, cookie: str = None):
+    """Send one request through ReadYourWritesMiddleware; returns (client used to read, response headers)"""
+    used = {}
+
+    async def app(scope, receive, send):
+        routing.bind_request_user(user_id)
+        used["client"] = routing.reader()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request"}
+
+    headers = [(b"cookie", cookie.encode())] if cookie else []
+    scope = {"type": "http", "method": method, "headers": headers}
+    asyncio.run(routing.ReadYourWritesMiddleware(app)(scope, receive, send))
+    return used["client"], dict(sent[0]["headers"])
+
+
+def test_reads_use_the_replica_until_the_user_writes(clients):
+    primary, replica = clients
+    assert run_request("GET", "u1")[0] is replica
+
+    client, headers = run_request("POST", "u1")
+    assert client is replica
+    assert headers[b"set-cookie"].startswith(routing.PRIMARY_COOKIE.encode())
+
+    assert run_request("GET", "u1")[0] is primary
+    assert run_request("GET", "u2")[0] is replica
+
+
+def test_cookie_pins_reads_on_another_process(clients):
+    primary, replica = clients
+    _, headers = run_request("PATCH", "u1")
+    pin = headers[b"set-cookie"].decode().split(";")[0]
+
+    # A fresh process has no record of the write, only the cookie
+    routing._recent_writers.clear()
+    assert run_request("GET", "u1", cookie=pin)[0] is primary
+    assert run_request("GET", "u1", cookie=f"{routing.PRIMARY_COOKIE}=0")[0] is replica
+    assert run_request("GET", "u1", cookie=f"{routing.PRIMARY_COOKIE}=soon")[0] is replica
+
+
+def test_disconnected_replica_falls_back_to_primary(clients):
+    primary, replica = clients
+    replica.connected = False
+    assert run_request("GET", "u1")[0] is primary
+    assert routing.reader() is primary
@@ -0,0 +1,70 @@
+import asyncio
+import re
+
+import pytest
+
+pytest.importorskip("prisma.models", reason="needs the generated Prisma client (prisma generate)")
+
+from services import search_service
+from services.search_service import SearchService, decode_search_cursor, encode_search_cursor
+
+
+class FakeReader:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def query_raw(self, sql, *params):
+        self.calls.append((sql, params))
+        return self.rows
+
+
+def result(element_id: str, rank: float) -> dict:
+    return {"elementId": element_id, "boardId": "b1", "rank": rank}
+
+
+def test_cursor_round_trip():
+    cursor = encode_search_cursor(0.25, "element-1")
+    assert decode_search_cursor(cursor) == (0.25, "element-1")
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "e30=", encode_search_cursor(0.5, "x")[:-4]])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_search_cursor(cursor)
+
+
+def test_candidates_are_ordered_before_the_cap(monkeypatch):
+    client = FakeReader([])
+    monkeypatch.setattr(search_service, "reader", lambda: client)
+    asyncio.run(SearchService.search("u1", "roadmap"))
+
+    sql, params = client.calls[0]
+    matches = re.search(r"matches AS \((.*?)\n\s*\),", sql, re.S).group(1)
+    assert re.search(r'ORDER BY "rank" DESC, e\."id" DESC\s+LIMIT \$3', matches)
+    assert params[2] == search_service.SEARCH_MAX_CANDIDATES
+
+
+def test_next_cursor_points_at_the_last_returned_result(monkeypatch):
+    rows = [result(f"e{index}", 1.0 - index / 10) for index in range(3)]
+    client = FakeReader(rows)
+    monkeypatch.setattr(search_service, "reader", lambda: client)
+
+    page, cursor = asyncio.run(SearchService.search("u1", "roadmap", limit=2, board_id="b1"))
+
+    assert [row["elementId"] for row in page] == ["e0", "e1"]
+    assert decode_search_cursor(cursor) == (0.9, "e1")
+    sql, params = client.calls[0]
+    assert params[3] == 3 and params[4] == "b1"
+
+
+def test_cursor_becomes_a_keyset_condition(monkeypatch):
+    client = FakeReader([result("e5", 0.1)])
+    monkeypatch.setattr(search_service, "reader", lambda: client)
+
+    page, cursor = asyncio.run(SearchService.search("u1", "roadmap", limit=2, cursor=encode_search_cursor(0.4, "e4")))
+
+    sql, params = client.calls[0]
+    assert 'WHERE (m."rank", m."id") < ($5::float8, $6)' in sql
+    assert params[4:] == (0.4, "e4")
+    assert cursor is None and len(page) == 1
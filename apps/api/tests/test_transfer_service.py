@@ -0,0 +1,168 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("prisma.models", reason="needs the generated Prisma client (prisma generate)")
+
+from services import transfer_service
+from services.transfer_service import BoardImportError, BoardTransferService, _remap_id, iter_ndjson_lines
+
+
+class FakeImportTransaction:
+    """Keeps created rows and evaluates the hierarchy check the way its recursive query does"""
+
+    def __init__(self):
+        self.elements = []
+        self.statements = []
+        self.board = SimpleNamespace(create=self._create_board)
+        self.boardelement = SimpleNamespace(create_many=self._create_elements)
+
+    async def _create_board(self, data):
+        return SimpleNamespace(id="imported", **data)
+
+    async def _create_elements(self, data):
+        self.elements.extend(data)
+
+    async def query_raw(self, query, board_id, container_types):
+        children = {}
+        for element in self.elements:
+            children.setdefault(element.get("parentId"), []).append(element)
+        reachable, frontier = 0, children.get(None, [])
+        while frontier:
+            reachable += len(frontier)
+            frontier = [
+                child for element in frontier if element["type"] in container_types
+                for child in children.get(element["id"], [])
+            ]
+        return [{"valid": reachable == len(self.elements)}]
+
+    async def execute_raw(self, query, *args):
+        self.statements.append(query)
+        if query.lstrip().startswith('UPDATE "BoardElement"'):
+            self._restore_dangling_references(*args)
+
+    def _restore_dangling_references(self, board_id, references):
+        ids = {element["id"] for element in self.elements}
+        for element in self.elements:
+            fields = json.loads(references).get(element["id"], {})
+            restored = {field: original for field, (remapped, original) in fields.items() if remapped not in ids}
+            if restored:
+                element["content"] = json.dumps({**json.loads(element["content"]), **restored})
+
+    @property
+    def snapshots(self):
+        return sum('INSERT INTO "BoardSnapshot"' in query for query in self.statements)
+
+
+@pytest.fixture
+def transaction(monkeypatch):
+    transaction = FakeImportTransaction()
+
+    class FakeTx:
+        async def __aenter__(self):
+            return transaction
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+    monkeypatch.setattr(transfer_service, "prisma", SimpleNamespace(tx=lambda timeout: FakeTx()))
+    return transaction
+
+
+def element_line(element_id, element_type="sticky-note", parent_id=None, **content):
+    return {
+        "kind": "element", "id": element_id, "type": element_type, "content": content,
+        "position": {"x": 0, "y": 0}, "size": {"width": 10, "height": 10}, "parentId": parent_id,
+    }
+
+
+def import_lines(*records):
+    async def lines():
+        for record in records:
+            yield json.dumps(record).encode()
+
+    return asyncio.run(BoardTransferService.import_board("u1", lines()))
+
+
+HEADER = {"kind": "board", "title": "Imported"}
+
+
+def test_remap_id_is_deterministic_per_import():
+    assert _remap_id("import-1", "e1") == _remap_id("import-1", "e1")
+    assert _remap_id("import-1", "e1") != _remap_id("import-2", "e1")
+
+
+def test_children_may_precede_their_parents(transaction):
+    board = import_lines(
+        HEADER,
+        element_line("child", parent_id="frame"),
+        element_line("arrow", "connector", fromElementId="child", toElementId="frame"),
+        element_line("frame", "frame"),
+    )
+
+    assert board.title == "Imported"
+    rows = {row["type"]: row for row in transaction.elements}
+    assert rows["sticky-note"]["parentId"] == rows["frame"]["id"] != "frame"
+    connector = json.loads(rows["connector"]["content"])
+    assert connector["fromElementId"] == rows["sticky-note"]["id"]
+    assert connector["toElementId"] == rows["frame"]["id"]
+    assert transaction.snapshots == 1
+
+
+def test_connector_references_outside_the_stream_keep_their_ids(transaction):
+    import_lines(
+        HEADER,
+        element_line("arrow", "connector", fromElementId="note", toElementId="elsewhere"),
+        element_line("note"),
+    )
+
+    rows = {row["type"]: row for row in transaction.elements}
+    connector = json.loads(rows["connector"]["content"])
+    assert connector["fromElementId"] == rows["sticky-note"]["id"]
+    assert connector["toElementId"] == "elsewhere"
+
+
+@pytest.mark.parametrize("records", [
+    # Parent missing from the stream
+    [element_line("child", parent_id="missing")],
+    # Parent is not a group or frame
+    [element_line("note"), element_line("child", parent_id="note")],
+    # Parent links form a cycle
+    [element_line("a", "group", parent_id="b"), element_line("b", "group", parent_id="a")],
+])
+def test_invalid_hierarchies_are_rejected(transaction, records):
+    with pytest.raises(BoardImportError, match="parentId"):
+        import_lines(HEADER, *records)
+    assert transaction.snapshots == 0
+
+
+def test_bad_lines_report_their_line_number(transaction):
+    with pytest.raises(BoardImportError) as error:
+        import_lines(HEADER, element_line("ok"), {"kind": "element", "type": "nope"})
+    assert error.value.line_number == 3
+
+    with pytest.raises(BoardImportError, match="board header"):
+        import_lines(element_line("first"))
+
+
+@pytest.mark.parametrize("chunks", [
+    # The long line is still unfinished when it crosses the limit
+    [b"one\ntwo\n", b"x" * 64, b"x" * 64],
+    # The long line arrives complete in one chunk
+    [b"one\ntwo\n" + b"x" * 128 + b"\nfour\n"],
+])
+def test_overlong_lines_report_their_line_number(monkeypatch, chunks):
+    monkeypatch.setattr(transfer_service, "MAX_LINE_BYTES", 100)
+
+    async def collect():
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+
+        return [line async for line in iter_ndjson_lines(stream())]
+
+    with pytest.raises(BoardImportError) as error:
+        asyncio.run(collect())
+    assert error.value.line_number == 3
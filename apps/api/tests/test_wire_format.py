@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import msgpack
+import numpy as np
+import pytest
+
+from utils.wire_format import (
+    COLUMNAR_MEDIA_TYPE, JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE,
+    element_columns, encode_document_as, encode_elements_as, negotiate,
+)
+
+CREATED = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def row(element_id: str, **fields):
+    values = dict(
+        id=element_id, type="sticky-note", content={"text": element_id}, style={"color": "yellow"},
+        x=10.5, y=-20.0, width=100.0, height=50.0, zIndex=1, parentId=None, boardId="b1",
+        revision=2, createdAt=CREATED, updatedAt=CREATED,
+    )
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, JSON_MEDIA_TYPE),
+    ("*/*", JSON_MEDIA_TYPE),
+    ("application/msgpack", MSGPACK_MEDIA_TYPE),
+    ("application/x-msgpack", MSGPACK_MEDIA_TYPE),
+    (f"application/json, {COLUMNAR_MEDIA_TYPE}", JSON_MEDIA_TYPE),
+    (f"application/json;q=0.5, {COLUMNAR_MEDIA_TYPE}", COLUMNAR_MEDIA_TYPE),
+    ("application/msgpack;q=oops", JSON_MEDIA_TYPE),
+    ("text/html", JSON_MEDIA_TYPE),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept) == expected
+
+
+def test_element_columns_pack_geometry_and_share_styles():
+    rows = [row("e1"), row("e2", width=None, type="text", zIndex=3), row("e3", style={"color": "blue"}, parentId="e1")]
+    columns = element_columns(rows)
+
+    geometry = np.frombuffer(columns["geometry"], dtype="<f4").reshape(-1, 4)
+    assert geometry[0].tolist() == [10.5, -20.0, 100.0, 50.0]
+    assert np.isnan(geometry[1, 2:]).all()
+    assert np.frombuffer(columns["zIndex"], dtype="<i4").tolist() == [1, 3, 1]
+    assert columns["type"]["values"] == ["sticky-note", "text"]
+    assert np.frombuffer(columns["type"]["codes"], dtype="<i4").tolist() == [0, 1, 0]
+    assert columns["style"]["values"] == [{"color": "yellow"}, {"color": "blue"}]
+    assert np.frombuffer(columns["parentId"]["codes"], dtype="<i4").tolist() == [-1, -1, 0]
+    assert np.frombuffer(columns["createdAt"], dtype="<f8")[0] == CREATED.timestamp() * 1000
+
+
+def test_msgpack_matches_the_json_document():
+    decoded = msgpack.unpackb(encode_elements_as(MSGPACK_MEDIA_TYPE, [row("e1")]), timestamp=3)
+    assert decoded[0]["position"] == {"x": 10.5, "y": -20.0}
+    assert decoded[0]["size"] == {"width": 100.0, "height": 50.0}
+    assert decoded[0]["createdAt"] == CREATED
+
+
+def test_encode_document_as_columns_only_the_elements_field():
+    document = {"revision": 4, "elements": [row("e1"), row("e2")]}
+    decoded = msgpack.unpackb(encode_document_as(COLUMNAR_MEDIA_TYPE, document, "elements"))
+    assert decoded["revision"] == 4
+    assert decoded["elements"]["count"] == 2
+    assert decoded["elements"]["id"] == ["e1", "e2"]
+
+
+def test_styles_that_compare_equal_across_types_are_not_shared():
+    styles = [{"bold": True}, {"bold": 1}, {"bold": 1.0}, {"bold": True}]
+    rows = [row(f"e{index}", style=style) for index, style in enumerate(styles)]
+    columns = msgpack.unpackb(encode_elements_as(COLUMNAR_MEDIA_TYPE, rows))
+
+    values = columns["style"]["values"]
+    codes = np.frombuffer(columns["style"]["codes"], dtype="<i4").tolist()
+    decoded = [values[code]["bold"] for code in codes]
+    assert codes == [0, 1, 2, 0]
+    assert [type(value) for value in decoded] == [bool, int, float, bool]
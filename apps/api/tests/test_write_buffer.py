@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+from prometheus_client import CollectorRegistry, generate_latest
+
+from services.write_buffer import ElementWriteBuffer
+from utils.metrics import WriteBufferCollector
+
+
+def position(x: float) -> dict:
+    return {"position": {"x": x, "y": 0}}
+
+
+def test_updates_to_one_element_are_merged_into_one_row():
+    batches = []
+
+    async def scenario():
+        buffer = ElementWriteBuffer(flush=lambda batch: _record(batches, batch), window=0.01)
+        for x in range(5):
+            buffer.add("e1", "b1", position(x))
+        buffer.add("e2", "b1", {"size": {"width": 1, "height": 1}})
+        await asyncio.sleep(0.05)
+        return buffer.stats()
+
+    stats = asyncio.run(scenario())
+    assert batches == [[{"id": "e1", **position(4)}, {"id": "e2", "size": {"width": 1, "height": 1}}]]
+    assert stats == {"updatesReceived": 6, "writesAbsorbed": 4, "rowsFlushed": 2, "flushes": 1,
+                     "rowsFailed": 0, "pending": 0}
+
+
+async def _record(batches, batch):
+    batches.append(batch)
+
+
+def test_only_geometry_updates_are_accepted():
+    buffer = ElementWriteBuffer(flush=None)
+    assert buffer.accepts(position(1))
+    assert not buffer.accepts({**position(1), "content": {}})
+    assert not buffer.accepts({})
+    assert not ElementWriteBuffer(flush=None, window=0).accepts(position(1))
+
+
+def test_pending_changes_are_visible_per_element_and_board():
+    async def scenario():
+        buffer = ElementWriteBuffer(flush=None, window=60)
+        buffer.add("e1", "b1", position(1))
+        buffer.add("e2", "b2", position(2))
+        pending = buffer.pending_for_board("b1"), buffer.has_pending_for_board("b2")
+        taken = buffer.take("e1")
+        return pending, taken, buffer.pending_changes("e1"), buffer.has_pending_for_board("b1")
+
+    pending, taken, after_take, still_pending = asyncio.run(scenario())
+    assert pending == ({"e1": position(1)}, True)
+    assert taken == position(1)
+    assert after_take == {} and not still_pending
+
+
+def test_failed_flushes_are_counted():
+    async def failing(batch):
+        raise RuntimeError("database down")
+
+    async def scenario():
+        buffer = ElementWriteBuffer(flush=failing, window=60)
+        buffer.add("e1", "b1", position(1))
+        await buffer.close()
+        return buffer.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rowsFailed"] == 1 and stats["flushes"] == 1 and stats["pending"] == 0
+
+
+def test_direct_writes_wait_for_an_in_flight_flush():
+    writes = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_flush(batch):
+            await release.wait()
+            writes.append(("flush", batch[0]["position"]["x"]))
+
+        buffer = ElementWriteBuffer(flush=slow_flush, window=60)
+        buffer.add("e1", "b1", position(1))
+        flushing = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0)
+        # The flush's older position is still visible while in flight
+        assert buffer.pending_changes("e1") == position(1)
+
+        async def direct_write():
+            await buffer.settle(["e1"])
+            writes.append(("direct", 2))
+
+        direct = asyncio.create_task(direct_write())
+        unrelated = asyncio.create_task(buffer.settle(["e2"]))
+        await asyncio.sleep(0.01)
+        assert unrelated.done() and not direct.done()
+        release.set()
+        await asyncio.gather(flushing, direct)
+
+    asyncio.run(scenario())
+    assert writes == [("flush", 1), ("direct", 2)]
+
+
+def test_buffer_stats_are_exported_to_prometheus():
+    registry = CollectorRegistry()
+    registry.register(WriteBufferCollector(lambda: {
+        "updatesReceived": 7, "writesAbsorbed": 5, "rowsFlushed": 2, "flushes": 1, "rowsFailed": 0, "pending": 3,
+    }))
+    text = generate_latest(registry).decode()
+    assert "inkspiree_write_buffer_absorbed_total 5.0" in text
+    assert 'inkspiree_write_buffer_rows_total{outcome="written"} 2.0' in text
+    assert "inkspiree_write_buffer_pending 3.0" in text
+
+
+def test_changes_taken_by_a_failed_write_are_restored():
+    batches = []
+
+    async def scenario():
+        buffer = ElementWriteBuffer(flush=lambda batch: _record(batches, batch), window=0.01)
+        buffer.add("e1", "b1", {**position(1), "size": {"width": 5, "height": 5}})
+        with pytest.raises(RuntimeError):
+            with buffer.taken("e1") as taken:
+                assert buffer.pending_changes("e1") == {}
+                # A newer drag arrives while the write is in flight
+                buffer.add("e1", "b1", position(2))
+                raise RuntimeError("transaction failed")
+        restored = buffer.pending_for_board("b1")
+
+        with buffer.taken("e1") as committed:
+            pass
+        await asyncio.sleep(0.05)
+        return taken, restored, committed
+
+    taken, restored, committed = asyncio.run(scenario())
+    assert taken == {**position(1), "size": {"width": 5, "height": 5}}
+    # The newer position wins over the restored one
+    assert restored == {"e1": {**position(2), "size": {"width": 5, "height": 5}}}
+    assert committed == restored["e1"] and batches == []
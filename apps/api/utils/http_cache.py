@@ -0,0 +1,90 @@
+# ETag handling and an in-process cache of serialized response bodies
+
+import hashlib
+import os
+from typing import Awaitable, Callable, Hashable, Optional, Tuple
+
+from fastapi import Request, Response, status
+
+from utils.cache import TTLCache
+from utils.metrics import current_request, record_elements
+
+class ResponseCache:
+    """
+    LRU of serialized JSON bodies keyed by (board_id, kind, version, variant),
+    each stored with the number of board elements it holds.
+
+    Keys carry the board version, so a stale body can never be served; the
+    explicit per-board invalidation on writes just frees memory early.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 300.0):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, int]]:
+        return self._cache.get(key)
+
+    def set(self, key: Hashable, body: bytes, elements: int = 0) -> None:
+        self._cache.set(key, (body, elements))
+
+    def invalidate_board(self, board_id: str) -> None:
+        """Drop every cached body for a board"""
+        self._cache.discard_where(lambda key: key[0] == board_id)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+response_cache = ResponseCache(
+    max_size=int(os.environ.get("RESPONSE_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("RESPONSE_CACHE_TTL", "300")),
+)
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the values that determine a response body"""
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match lists the ETag (weak comparison, as RFC 9110 requires)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (value.strip() for value in header.split(","))
+    return etag in (value[2:] if value.startswith("W/") else value for value in candidates)
+
+async def cached_json_response(
+    request: Request,
+    key: Hashable,
+    etag: str,
+    render: Callable[[], Awaitable[bytes]],
+    media_type: str = "application/json",
+    vary: Optional[str] = None
+) -> Response:
+    """
+    Answer 304 when the client has the ETag, otherwise serve the cached or freshly rendered body.
+
+    Routes that pick the body format from a request header pass that header
+    as vary, and include the chosen format in key and etag.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if vary:
+        headers["Vary"] = vary
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    cached = response_cache.get(key)
+    if cached is None:
+        metrics = current_request()
+        elements_before = (metrics.elements or 0) if metrics else 0
+        body = await render()
+        # Remember how many elements the render loaded so cache hits report the same count
+        elements = (metrics.elements or 0) - elements_before if metrics else 0
+        response_cache.set(key, body, elements)
+    else:
+        body, elements = cached
+        if elements:
+            record_elements(elements)
+
+    return Response(content=body, media_type=media_type, headers=headers)
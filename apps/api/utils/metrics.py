@@ -0,0 +1,182 @@
+# Per-request performance instrumentation, exported in Prometheus format at /metrics
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Label for requests that matched no route, so unknown paths cannot grow the label set
+UNMATCHED_ROUTE = "unmatched"
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000, 5000, 25000, 100000)
+
+REQUEST_LATENCY = Histogram(
+    "inkspiree_http_request_duration_seconds", "Time to serve a request",
+    ["method", "route", "status"]
+)
+REQUEST_SIZE = Histogram(
+    "inkspiree_http_request_size_bytes", "Request body size", ["method", "route"], buckets=SIZE_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    "inkspiree_http_response_size_bytes", "Response body size", ["method", "route"], buckets=SIZE_BUCKETS
+)
+REQUEST_DB_QUERIES = Histogram(
+    "inkspiree_http_request_db_queries", "Database queries run while serving a request",
+    ["method", "route"], buckets=COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "inkspiree_http_request_db_seconds", "Time spent waiting on the database while serving a request",
+    ["method", "route"]
+)
+REQUEST_ELEMENTS = Histogram(
+    "inkspiree_http_response_elements", "Board elements returned by a request",
+    ["method", "route"], buckets=COUNT_BUCKETS
+)
+DB_QUERIES = Counter(
+    "inkspiree_db_queries_total", "Database queries, including those run outside requests", ["database"]
+)
+DB_QUERY_TIME = Histogram(
+    "inkspiree_db_query_duration_seconds", "Duration of a single database query", ["database"]
+)
+
+@dataclass
+class RequestMetrics:
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    elements: Optional[int] = None
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+def current_request() -> Optional[RequestMetrics]:
+    """Counters of the request being served, or None outside a request"""
+    return _current.get()
+
+def record_elements(count: int) -> None:
+    """Count board elements returned by the current request"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.elements = (metrics.elements or 0) + count
+
+def instrument_client(client: Any, database: str) -> None:
+    """
+    Time every query a connected Prisma client sends to its query engine.
+
+    Wraps the engine's query method, which transactions and batches created
+    from the client share, so each round trip is counted once.
+    """
+    engine = getattr(client, "_internal_engine", None)
+    if engine is None or getattr(engine, "_inkspiree_instrumented", False):
+        return
+
+    query = engine.query
+    queries = DB_QUERIES.labels(database)
+    durations = DB_QUERY_TIME.labels(database)
+
+    async def timed_query(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await query(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            queries.inc()
+            durations.observe(elapsed)
+            metrics = _current.get()
+            if metrics is not None:
+                metrics.db_queries += 1
+                metrics.db_seconds += elapsed
+
+    engine.query = timed_query
+    engine._inkspiree_instrumented = True
+
+class WriteBufferCollector:
+    """Exports a write buffer's stats() at scrape time, so the write path does no extra work"""
+
+    def __init__(self, stats: Callable[[], Dict[str, int]]):
+        self._stats = stats
+
+    def collect(self):
+        stats = self._stats()
+        yield CounterMetricFamily(
+            "inkspiree_write_buffer_updates", "Geometry updates received by the write buffer",
+            value=stats["updatesReceived"]
+        )
+        yield CounterMetricFamily(
+            "inkspiree_write_buffer_absorbed", "Buffered updates merged into one already pending",
+            value=stats["writesAbsorbed"]
+        )
+        yield CounterMetricFamily(
+            "inkspiree_write_buffer_flushes", "Batches flushed by the write buffer", value=stats["flushes"]
+        )
+        rows = CounterMetricFamily(
+            "inkspiree_write_buffer_rows", "Element rows flushed by the write buffer", labels=["outcome"]
+        )
+        rows.add_metric(["written"], stats["rowsFlushed"])
+        rows.add_metric(["failed"], stats["rowsFailed"])
+        yield rows
+        yield GaugeMetricFamily(
+            "inkspiree_write_buffer_pending", "Elements with buffered updates not yet committed",
+            value=stats["pending"]
+        )
+
+def register_write_buffer(stats: Callable[[], Dict[str, int]]) -> None:
+    """Publish a write buffer's counters on /metrics"""
+    REGISTRY.register(WriteBufferCollector(stats))
+
+def render_metrics() -> bytes:
+    return generate_latest()
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, payload sizes, database work and
+    element counts per route template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        sizes = {"request": 0, "response": 0}
+        status_code = [500]
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+
+            # The router stores the matched route in the scope, giving "/api/boards/{board_id}"
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+            REQUEST_LATENCY.labels(method, route, str(status_code[0])).observe(elapsed)
+            REQUEST_SIZE.labels(method, route).observe(sizes["request"])
+            RESPONSE_SIZE.labels(method, route).observe(sizes["response"])
+            REQUEST_DB_QUERIES.labels(method, route).observe(metrics.db_queries)
+            REQUEST_DB_TIME.labels(method, route).observe(metrics.db_seconds)
+            if metrics.elements is not None:
+                REQUEST_ELEMENTS.labels(method, route).observe(metrics.elements)
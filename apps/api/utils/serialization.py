@@ -0,0 +1,68 @@
+# Fast JSON encoding for trusted database rows
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# Opt-in: read routes skip Pydantic and encode DB rows directly
+FAST_JSON_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "").lower() in ("1", "true", "yes")
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value: Any) -> bytes:
+    """Encode to JSON bytes with orjson when installed, the stdlib otherwise"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+def element_to_dict(element: Any) -> Dict[str, Any]:
+    """
+    Build the BoardElementResponse shape straight from a BoardElement row.
+
+    Rows come from our own database and were validated on the way in, so this
+    skips model validation and only reshapes the geometry columns.
+    """
+    width, height = element.width, element.height
+    return {
+        "id": element.id,
+        "type": element.type,
+        "content": element.content,
+        "position": {"x": element.x, "y": element.y},
+        "size": {"width": width, "height": height} if width is not None and height is not None else None,
+        "style": element.style,
+        "zIndex": element.zIndex,
+        "parentId": element.parentId,
+        "boardId": element.boardId,
+        "createdAt": element.createdAt,
+        "updatedAt": element.updatedAt,
+        "revision": element.revision,
+    }
+
+def board_to_dict(board: Any) -> Dict[str, Any]:
+    """Build the BoardResponse shape straight from a Board row"""
+    return {
+        "id": board.id,
+        "title": board.title,
+        "description": board.description,
+        "userId": board.userId,
+        "createdAt": board.createdAt,
+        "updatedAt": board.updatedAt,
+        "revision": board.revision,
+        "elementCount": None,
+        "lastEditedAt": None,
+    }
+
+def encode_elements(elements: Iterable[Any]) -> bytes:
+    return dumps([element_to_dict(element) for element in elements])
+
+def encode_board(board: Any) -> bytes:
+    return dumps(board_to_dict(board))
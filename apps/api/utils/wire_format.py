@@ -0,0 +1,129 @@
+# Compact binary encodings of element payloads, chosen by content negotiation
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Change from relative to absolute imports
+from utils.serialization import element_to_dict
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is optional
+    msgpack = None
+
+# Always available; binary formats are only offered when msgpack is installed
+JSON_MEDIA_TYPE = "application/json"
+# The JSON document shape, encoded as MessagePack
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Elements as columns: packed geometry and number arrays, shared style objects
+COLUMNAR_MEDIA_TYPE = "application/vnd.inkspiree.columns+msgpack"
+
+_ALIASES = {"application/x-msgpack": MSGPACK_MEDIA_TYPE}
+
+ELEMENT_MEDIA_TYPES = (JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE)
+
+def negotiate(accept: Optional[str], offers: Sequence[str] = ELEMENT_MEDIA_TYPES) -> str:
+    """
+    Pick the media type to answer with from an Accept header.
+
+    Binary types must be named explicitly; wildcards and missing or
+    unsatisfiable headers get JSON.
+    """
+    if not accept or msgpack is None:
+        return JSON_MEDIA_TYPE
+
+    best, best_quality = JSON_MEDIA_TYPE, 0.0
+    for part in accept.split(","):
+        media_type, *params = (piece.strip() for piece in part.split(";"))
+        media_type = _ALIASES.get(media_type.lower(), media_type.lower())
+        if media_type not in offers:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        # Earlier entries win ties
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} cannot be packed")
+
+def packb(value: Any) -> bytes:
+    """MessagePack with timezone-aware datetimes as timestamp extensions"""
+    return msgpack.packb(value, datetime=True, default=_default)
+
+def _dictionary(values: Iterable[Any], key=lambda value: value) -> Dict[str, Any]:
+    """Dictionary-encode values: distinct values once, plus an int32 code per row (-1 for None)"""
+    distinct: List[Any] = []
+    index: Dict[Any, int] = {}
+    codes = []
+    for value in values:
+        if value is None:
+            codes.append(-1)
+            continue
+        value_key = key(value)
+        code = index.get(value_key)
+        if code is None:
+            code = index[value_key] = len(distinct)
+            distinct.append(value)
+        codes.append(code)
+    return {"values": distinct, "codes": np.asarray(codes, dtype="<i4").tobytes()}
+
+def _timestamps(values: Iterable[datetime]) -> bytes:
+    return np.fromiter((value.timestamp() * 1000 for value in values), dtype="<f8").tobytes()
+
+def element_columns(elements: Sequence[Any]) -> Dict[str, Any]:
+    """
+    Lay out BoardElement rows column by column.
+
+    geometry holds little-endian float32 x, y, width, height per element (NaN
+    when there is no size), so positions keep about seven significant digits.
+    zIndex and revision are int32, createdAt and updatedAt float64 epoch
+    milliseconds. type, boardId, parentId and style are dictionary-encoded:
+    each distinct value is sent once, and styles that pack to the same bytes
+    are shared.
+    """
+    geometry = np.empty((len(elements), 4), dtype="<f4")
+    for row, element in enumerate(elements):
+        width, height = element.width, element.height
+        if width is None or height is None:
+            width = height = np.nan
+        geometry[row] = (element.x, element.y, width, height)
+    return {
+        "count": len(elements),
+        "id": [element.id for element in elements],
+        "type": _dictionary(element.type for element in elements),
+        "boardId": _dictionary(element.boardId for element in elements),
+        "parentId": _dictionary(getattr(element, "parentId", None) for element in elements),
+        "geometry": geometry.tobytes(),
+        "zIndex": np.fromiter((element.zIndex for element in elements), dtype="<i4", count=len(elements)).tobytes(),
+        "revision": np.fromiter((element.revision for element in elements), dtype="<i4", count=len(elements)).tobytes(),
+        "createdAt": _timestamps(element.createdAt for element in elements),
+        "updatedAt": _timestamps(element.updatedAt for element in elements),
+        "content": [element.content for element in elements],
+        # Keyed on the packed bytes: as dict keys, True, 1 and 1.0 would be one style
+        "style": _dictionary((element.style for element in elements), key=packb),
+    }
+
+def encode_elements_as(media_type: str, elements: Sequence[Any]) -> bytes:
+    """Encode an element list response in a binary media type"""
+    if media_type == COLUMNAR_MEDIA_TYPE:
+        return packb(element_columns(elements))
+    return packb([element_to_dict(element) for element in elements])
+
+def encode_document_as(media_type: str, document: Dict[str, Any], elements_field: str) -> bytes:
+    """Encode a response object whose elements_field holds BoardElement rows in a binary media type"""
+    elements = document[elements_field]
+    if media_type == COLUMNAR_MEDIA_TYPE:
+        return packb({**document, elements_field: element_columns(elements)})
+    return packb({**document, elements_field: [element_to_dict(element) for element in elements]})
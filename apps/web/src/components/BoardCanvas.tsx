@@ -301,7 +301,7 @@ export default function BoardCanvas({ boardId }: BoardCanvasProps) {
 
     try {
       saveToHistory(elements);
-      await Promise.all(toDelete.map(id => elementsApi.deleteElement(id)));
+      await elementsApi.batchElements(boardId, toDelete.map(id => ({ op: "delete" as const, id })));
       setElements(prev => prev.filter(el => !toDelete.includes(el.id)));
       setSelectedElement(null);
       setSelectedElements([]);
@@ -309,7 +309,7 @@ export default function BoardCanvas({ boardId }: BoardCanvasProps) {
       console.error("Failed to delete elements:", err);
       setError("Failed to delete elements");
     }
-  }, [selectedElement, selectedElements, elements, saveToHistory]);
+  }, [boardId, selectedElement, selectedElements, elements, saveToHistory]);
 
   // Copy/Paste functionality
   const copyElements = useCallback(() => {
@@ -1,15 +1,24 @@
 // API service for communicating with the backend
 
-import { Board, BoardElement } from "@/types";
+import { BatchOperation, BatchResult, Board, BoardElement } from "@/types";
 
 // Use relative URLs when in the browser to leverage Next.js API proxy
 const API_URL = typeof window !== 'undefined' ? '' : (process.env.NEXT_PUBLIC_API_URL || "http://localhost:8001");
 
-// Helper for API requests
-async function fetchAPI<T>(
+// Boards requested per page of the board list (the API caps this at 200)
+const BOARDS_PAGE_SIZE = 50;
+
+// One page of a keyset-paginated list; nextCursor is null on the last page
+export interface Page<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
+// Helper for API requests: resolves with the successful response, throws on errors
+async function fetchResponse(
   endpoint: string,
   options: RequestInit = {}
-): Promise<T> {
+): Promise<Response> {
   const url = `${API_URL}${endpoint}`;
   console.log(`Making request to: ${url} with method: ${options.method || 'GET'}`);
   if (options.body) {
@@ -42,21 +51,59 @@ async function fetchAPI<T>(
       }
     }
 
-    // For DELETE requests that return 204 No Content
-    if (response.status === 204) {
-      return {} as T;
-    }
-
-    return await response.json();
+    return response;
   } catch (error) {
     console.error("API Request Failed:", error);
     throw error;
   }
 }
 
+// Helper for API requests with JSON responses
+async function fetchAPI<T>(
+  endpoint: string,
+  options: RequestInit = {}
+): Promise<T> {
+  const response = await fetchResponse(endpoint, options);
+
+  // For DELETE requests that return 204 No Content
+  if (response.status === 204) {
+    return {} as T;
+  }
+
+  return await response.json();
+}
+
+// One page of boards, most recently updated first; pass nextCursor back for the next page
+async function fetchBoardsPage(
+  cursor?: string | null,
+  limit: number = BOARDS_PAGE_SIZE
+): Promise<Page<Board>> {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) {
+    params.set("cursor", cursor);
+  }
+  const response = await fetchResponse(`/api/boards?${params}`);
+  return {
+    items: await response.json(),
+    nextCursor: response.headers.get("X-Next-Cursor"),
+  };
+}
+
 // Board API methods
 export const boardsApi = {
-  getBoards: () => fetchAPI<Board[]>("/api/boards"),
+  getBoardsPage: fetchBoardsPage,
+
+  // All of the user's boards, following X-Next-Cursor through every page
+  getBoards: async (): Promise<Board[]> => {
+    const boards: Board[] = [];
+    let cursor: string | null = null;
+    do {
+      const page: Page<Board> = await fetchBoardsPage(cursor);
+      boards.push(...page.items);
+      cursor = page.nextCursor;
+    } while (cursor);
+    return boards;
+  },
   
   getBoard: (id: string) => fetchAPI<Board>(`/api/boards/${id}`),
   
@@ -85,7 +132,7 @@ export const elementsApi = {
     
   createElement: (element: Omit<BoardElement, "id" | "createdAt" | "updatedAt">) => {
     // Deep clone to avoid modifying the original object
-    const elementClone = JSON.parse(JSON.stringify(element));
+    const elementClone = structuredClone(element);
     
     // Ensure all data is properly formatted
     const payload = {
@@ -139,6 +186,13 @@ export const elementsApi = {
     fetchAPI(`/api/elements/${id}`, {
       method: "DELETE",
     }),
+
+  // Apply many creates/updates/deletes to one board in a single request
+  batchElements: (boardId: string, operations: BatchOperation[]) =>
+    fetchAPI<{ boardId: string; results: BatchResult[] }>("/api/elements/batch", {
+      method: "POST",
+      body: JSON.stringify({ boardId, operations }),
+    }),
 };
 
 // AI API methods
@@ -83,3 +83,18 @@ export interface ApiResponse<T> {
   data?: T;
   error?: string;
 }
+
+// Batch element mutation types
+export type BatchOperation =
+  | { op: "create"; data: Omit<BoardElement, "id" | "boardId" | "createdAt" | "updatedAt"> }
+  | { op: "update"; id: string; data: Partial<Omit<BoardElement, "id" | "boardId" | "createdAt" | "updatedAt">> }
+  | { op: "delete"; id: string };
+
+export interface BatchResult {
+  index: number;
+  op: BatchOperation["op"];
+  id?: string;
+  ok: boolean;
+  element?: BoardElement;
+  error?: string;
+}
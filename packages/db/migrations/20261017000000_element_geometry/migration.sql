@@ -0,0 +1,22 @@
+-- Denormalize element geometry out of the position/size JSON for viewport queries
+ALTER TABLE "BoardElement"
+  ADD COLUMN "x" DOUBLE PRECISION NOT NULL DEFAULT 0,
+  ADD COLUMN "y" DOUBLE PRECISION NOT NULL DEFAULT 0,
+  ADD COLUMN "width" DOUBLE PRECISION,
+  ADD COLUMN "height" DOUBLE PRECISION;
+
+UPDATE "BoardElement" SET
+  "x" = COALESCE(("position"->>'x')::double precision, 0),
+  "y" = COALESCE(("position"->>'y')::double precision, 0),
+  "width" = ("size"->>'width')::double precision,
+  "height" = ("size"->>'height')::double precision;
+
+CREATE INDEX "BoardElement_boardId_x_y_idx" ON "BoardElement"("boardId", "x", "y");
+
+-- Prisma cannot express expression indexes; this one serves the bbox overlap
+-- test in BoardElementService.get_elements_in_bbox
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+CREATE INDEX "BoardElement_boardId_bbox_idx" ON "BoardElement" USING gist (
+  "boardId",
+  box(point("x", "y"), point("x" + COALESCE("width", 0), "y" + COALESCE("height", 0)))
+);
@@ -0,0 +1,23 @@
+-- Per-board revision counter and element tombstones for delta sync
+ALTER TABLE "Board"
+  ADD COLUMN "revision" INTEGER NOT NULL DEFAULT 0,
+  ADD COLUMN "compactedRevision" INTEGER NOT NULL DEFAULT 0;
+
+ALTER TABLE "BoardElement" ADD COLUMN "revision" INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX "BoardElement_boardId_revision_idx" ON "BoardElement"("boardId", "revision");
+
+CREATE TABLE "BoardElementTombstone" (
+    "id" TEXT NOT NULL,
+    "elementId" TEXT NOT NULL,
+    "revision" INTEGER NOT NULL,
+    "deletedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "boardId" TEXT NOT NULL,
+
+    CONSTRAINT "BoardElementTombstone_pkey" PRIMARY KEY ("id")
+);
+
+CREATE INDEX "BoardElementTombstone_boardId_revision_idx" ON "BoardElementTombstone"("boardId", "revision");
+
+ALTER TABLE "BoardElementTombstone" ADD CONSTRAINT "BoardElementTombstone_boardId_fkey"
+  FOREIGN KEY ("boardId") REFERENCES "Board"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,13 @@
+-- Make x/y/width/height the only source of element geometry.
+-- Backfill again first so rows written before the columns were kept in sync
+-- are not lost when the JSON columns go away.
+UPDATE "BoardElement" SET
+  "x" = COALESCE(("position"->>'x')::double precision, "x"),
+  "y" = COALESCE(("position"->>'y')::double precision, "y"),
+  "width" = COALESCE(("size"->>'width')::double precision, "width"),
+  "height" = COALESCE(("size"->>'height')::double precision, "height")
+WHERE "position" IS NOT NULL OR "size" IS NOT NULL;
+
+ALTER TABLE "BoardElement"
+  DROP COLUMN "position",
+  DROP COLUMN "size";
@@ -0,0 +1,2 @@
+-- Keyset pagination of a user's boards on (updatedAt, id)
+CREATE INDEX "Board_userId_updatedAt_id_idx" ON "Board"("userId", "updatedAt" DESC, "id" DESC);
@@ -0,0 +1,18 @@
+-- Background job records for the prisma job store
+CREATE TABLE "Job" (
+    "id" TEXT NOT NULL,
+    "userId" TEXT NOT NULL,
+    "kind" TEXT NOT NULL,
+    "status" TEXT NOT NULL,
+    "progress" INTEGER NOT NULL DEFAULT 0,
+    "total" INTEGER,
+    "result" JSONB,
+    "error" TEXT,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "startedAt" TIMESTAMP(3),
+    "finishedAt" TIMESTAMP(3),
+
+    CONSTRAINT "Job_pkey" PRIMARY KEY ("id")
+);
+
+CREATE INDEX "Job_status_idx" ON "Job"("status");
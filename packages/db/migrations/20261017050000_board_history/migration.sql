@@ -0,0 +1,57 @@
+-- Element operation log and board snapshots for undo/redo and reconstruction at past revisions
+ALTER TABLE "Board"
+  ADD COLUMN "snapshotRevision" INTEGER NOT NULL DEFAULT 0,
+  ADD COLUMN "historyStartRevision" INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE "BoardOperation" (
+    "id" TEXT NOT NULL,
+    "revision" INTEGER NOT NULL,
+    "seq" INTEGER NOT NULL,
+    "elementId" TEXT,
+    "op" TEXT NOT NULL,
+    "before" JSONB,
+    "after" JSONB,
+    "action" TEXT NOT NULL,
+    "targetRevision" INTEGER,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "boardId" TEXT NOT NULL,
+
+    CONSTRAINT "BoardOperation_pkey" PRIMARY KEY ("id")
+);
+
+CREATE INDEX "BoardOperation_boardId_revision_idx" ON "BoardOperation"("boardId", "revision");
+
+ALTER TABLE "BoardOperation" ADD CONSTRAINT "BoardOperation_boardId_fkey"
+  FOREIGN KEY ("boardId") REFERENCES "Board"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+CREATE TABLE "BoardSnapshot" (
+    "id" TEXT NOT NULL,
+    "revision" INTEGER NOT NULL,
+    "elements" JSONB NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "boardId" TEXT NOT NULL,
+
+    CONSTRAINT "BoardSnapshot_pkey" PRIMARY KEY ("id")
+);
+
+CREATE INDEX "BoardSnapshot_boardId_revision_idx" ON "BoardSnapshot"("boardId", "revision");
+
+ALTER TABLE "BoardSnapshot" ADD CONSTRAINT "BoardSnapshot_boardId_fkey"
+  FOREIGN KEY ("boardId") REFERENCES "Board"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- Existing boards have no log yet: their history starts now, from a snapshot of their current elements
+INSERT INTO "BoardSnapshot" ("id", "boardId", "revision", "elements", "createdAt")
+SELECT gen_random_uuid()::text, b."id", b."revision",
+       COALESCE((
+           SELECT jsonb_agg(jsonb_build_object(
+               'id', e."id", 'type', e."type", 'content', e."content", 'style', e."style", 'zIndex', e."zIndex",
+               'position', jsonb_build_object('x', e."x", 'y', e."y"),
+               'size', CASE WHEN e."width" IS NULL OR e."height" IS NULL THEN NULL
+                            ELSE jsonb_build_object('width', e."width", 'height', e."height") END
+           ) ORDER BY e."zIndex", e."id")
+           FROM "BoardElement" e WHERE e."boardId" = b."id"
+       ), '[]'::jsonb),
+       now()
+FROM "Board" b;
+
+UPDATE "Board" SET "snapshotRevision" = "revision", "historyStartRevision" = "revision";
@@ -0,0 +1,12 @@
+-- Full-text search over the text of sticky notes and text elements.
+-- The vector is a generated column, so every insert and update keeps it current.
+ALTER TABLE "BoardElement" ADD COLUMN "searchVector" tsvector GENERATED ALWAYS AS (
+  CASE WHEN "type" IN ('sticky-note', 'text')
+       THEN to_tsvector('english'::regconfig, COALESCE("content"->>'text', ''))
+  END
+) STORED;
+
+-- boardId first so a user's search only walks the posting lists of their own boards
+-- (see SearchService.search); btree_gin adds GIN support for the text column
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+CREATE INDEX "BoardElement_boardId_searchVector_idx" ON "BoardElement" USING gin ("boardId", "searchVector");
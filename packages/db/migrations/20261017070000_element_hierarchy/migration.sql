@@ -0,0 +1,10 @@
+-- Elements can belong to a group or frame; their position is then relative to it
+ALTER TABLE "BoardElement" ADD COLUMN "parentId" TEXT;
+
+CREATE INDEX "BoardElement_parentId_idx" ON "BoardElement"("parentId");
+
+-- Deferred, so a subtree can be inserted in any order within one transaction
+-- (import chunks, undo restoring a deleted frame with its children)
+ALTER TABLE "BoardElement" ADD CONSTRAINT "BoardElement_parentId_fkey"
+  FOREIGN KEY ("parentId") REFERENCES "BoardElement"("id") ON DELETE CASCADE ON UPDATE CASCADE
+  DEFERRABLE INITIALLY DEFERRED;